@@ -0,0 +1 @@
+"""Benchmarks of the schema generation on synthetic config trees (see `python -m benchmarks`)."""
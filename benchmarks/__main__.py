@@ -0,0 +1,103 @@
+"""Command-line of the benchmarks.
+
+```console
+python -m benchmarks generate /tmp/corpus --scale medium
+python -m benchmarks run --scales small medium --output results.json
+python -m benchmarks compare baseline.json results.json
+python -m benchmarks merge
+```
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.corpus import SCALES, generate_corpus
+from benchmarks.suite import compare, measure, run_suite
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = subparsers.add_parser(
+        "generate", help="Generate a synthetic config tree."
+    )
+    generate_parser.add_argument("repo_root", type=Path)
+    generate_parser.add_argument("--scale", choices=list(SCALES), default="small")
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmarks.")
+    run_parser.add_argument(
+        "--scales", nargs="+", choices=list(SCALES), default=["small", "medium"]
+    )
+    run_parser.add_argument("-j", "--jobs", type=int, default=1)
+    run_parser.add_argument("--repeat", type=int, default=1)
+    run_parser.add_argument(
+        "--workdir",
+        type=Path,
+        default=None,
+        help="Where to generate the corpora. Defaults to a temporary directory.",
+    )
+    run_parser.add_argument(
+        "--output", type=Path, default=None, help="JSON file to write the results to."
+    )
+    run_parser.add_argument(
+        "--baseline", type=Path, default=None, help="Results to compare with."
+    )
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="Compare the wall times of two sets of results."
+    )
+    compare_parser.add_argument("baseline", type=Path)
+    compare_parser.add_argument("results", type=Path)
+
+    measure_parser = subparsers.add_parser(
+        "measure", help="Measure a single run on a corpus (used by `run`)."
+    )
+    measure_parser.add_argument("repo_root", type=Path)
+    measure_parser.add_argument("-j", "--jobs", type=int, default=1)
+
+    merge_parser = subparsers.add_parser(
+        "merge",
+        help="Compare the memory allocated by `merge_dicts` with deep copies and without.",
+    )
+    merge_parser.add_argument("--repeat", type=int, default=100)
+
+    args = parser.parse_args(argv if argv is not None else sys.argv[1:])
+
+    if args.command == "generate":
+        configs_dir = generate_corpus(args.repo_root, SCALES[args.scale])
+        print(f"Generated {SCALES[args.scale].num_configs} configs in {configs_dir}")
+    elif args.command == "measure":
+        print(json.dumps(measure(args.repo_root, jobs=args.jobs)))
+    elif args.command == "merge":
+        from benchmarks.merge import format_results, run_merge_benchmark
+
+        print("\n".join(format_results(run_merge_benchmark(repeat=args.repeat))))
+    elif args.command == "compare":
+        baseline = json.loads(args.baseline.read_text())
+        results = json.loads(args.results.read_text())
+        print("\n".join(compare(baseline, results)))
+    else:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            results = run_suite(
+                args.scales,
+                workdir=args.workdir or Path(temp_dir),
+                jobs=args.jobs,
+                repeat=args.repeat,
+            )
+        text = json.dumps(results, indent=2) + "\n"
+        if args.output:
+            args.output.parent.mkdir(exist_ok=True, parents=True)
+            args.output.write_text(text)
+        else:
+            print(text)
+        if args.baseline:
+            baseline = json.loads(args.baseline.read_text())
+            print("\n".join(compare(baseline, results)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""Generates synthetic Hydra config trees, to benchmark the schema generation on large repos.
+
+A generated repo looks like this:
+
+```
+<repo_root>/
+    bench_targets/__init__.py   # Classes used as `_target_`s, and `register_configs()`
+    configs/
+        config.yaml             # Primary config, with an option of each group in its defaults.
+        group_<i>/option_<j>.yaml
+        group_<i>/structured_<k>.yaml  # Options based on structured configs of the ConfigStore.
+        experiment/experiment_<k>.yaml  # `@package _global_` overlays.
+```
+
+The options of a group form chains of defaults (`option_2` has `option_1` in its defaults, which
+has `option_0`, etc.), and each option has nested `_target_`s.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import shutil
+import textwrap
+from pathlib import Path
+
+TARGETS_MODULE = "bench_targets"
+
+
+@dataclasses.dataclass(frozen=True)
+class CorpusSpec:
+    """Size and shape of a synthetic config tree."""
+
+    groups: int = 10
+    """Number of config groups."""
+    options: int = 10
+    """Number of options (config files) in each group."""
+    depth: int = 3
+    """Length of the chains of defaults between the options of a group."""
+    nesting: int = 2
+    """Depth of the nested `_target_`s in each option."""
+    targets: int = 10
+    """Number of distinct classes used as `_target_`s."""
+    overlays: int = 5
+    """Number of `@package _global_` configs in the `experiment` group."""
+    structured_configs: int = 2
+    """Number of structured configs stored in the ConfigStore for each group (with a yaml option
+    that uses it as a default)."""
+
+    @property
+    def num_configs(self) -> int:
+        return (
+            1 + self.groups * (self.options + self.structured_configs) + self.overlays
+        )
+
+
+SCALES: dict[str, CorpusSpec] = {
+    "tiny": CorpusSpec(
+        groups=2, options=3, depth=2, targets=2, overlays=1, structured_configs=1
+    ),
+    "small": CorpusSpec(groups=5, options=5, targets=5, overlays=2),
+    "medium": CorpusSpec(groups=20, options=10, targets=20, overlays=10),
+    "large": CorpusSpec(groups=50, options=20, depth=5, targets=50, overlays=20),
+}
+"""Predefined corpus sizes."""
+
+
+def generate_corpus(repo_root: Path, spec: CorpusSpec) -> Path:
+    """Writes a synthetic repo with Hydra configs in `repo_root`, replacing any existing one.
+
+    The `bench_targets` module of the repo needs to be importable (e.g. by adding `repo_root` to
+    `sys.path`), and its `register_configs` function called to populate the ConfigStore.
+
+    Returns:
+        The configs directory.
+    """
+    configs_dir = repo_root / "configs"
+    shutil.rmtree(configs_dir, ignore_errors=True)
+    shutil.rmtree(repo_root / TARGETS_MODULE, ignore_errors=True)
+    configs_dir.mkdir(parents=True)
+    (repo_root / TARGETS_MODULE).mkdir()
+    (repo_root / TARGETS_MODULE / "__init__.py").write_text(_targets_module(spec))
+
+    defaults = "".join(f"  - group_{i}: option_0\n" for i in range(spec.groups))
+    # Like in the lightning-hydra-template, so the experiments can be selected without a `+`.
+    defaults += "  - experiment: null\n"
+    (configs_dir / "config.yaml").write_text(
+        f"defaults:\n{defaults}  - _self_\nseed: 123\ndebug: false\n"
+    )
+    for i in range(spec.groups):
+        group_dir = configs_dir / f"group_{i}"
+        group_dir.mkdir()
+        for j in range(spec.options):
+            (group_dir / f"option_{j}.yaml").write_text(_option(spec, i, j))
+        for k in range(spec.structured_configs):
+            (group_dir / f"structured_{k}.yaml").write_text(
+                f"defaults:\n  - base_structured_{k}\n  - _self_\nname: structured_{k}\n"
+            )
+    experiment_dir = configs_dir / "experiment"
+    experiment_dir.mkdir()
+    for k in range(spec.overlays):
+        (experiment_dir / f"experiment_{k}.yaml").write_text(_overlay(spec, k))
+    return configs_dir
+
+
+def get_leaf_option(configs_dir: Path, spec: CorpusSpec) -> Path:
+    """Returns an option at the start of a defaults chain, which many other configs depend on."""
+    return configs_dir / "group_0" / "option_0.yaml"
+
+
+def _option(spec: CorpusSpec, group: int, option: int) -> str:
+    lines = []
+    if option % spec.depth != 0:
+        lines += ["defaults:", f"  - option_{option - 1}", "  - _self_"]
+    lines += [
+        f"_target_: {TARGETS_MODULE}.{_target_name(spec, group + option)}",
+        f"size: {option + 1}",
+        f"name: group_{group}_option_{option}",
+    ]
+    indent = ""
+    for level in range(spec.nesting):
+        lines += [
+            f"{indent}child:",
+            f"{indent}  _target_: {TARGETS_MODULE}.{_target_name(spec, group + option + level + 1)}",
+            f"{indent}  size: {level}",
+        ]
+        indent += "  "
+    return "\n".join(lines) + "\n"
+
+
+def _overlay(spec: CorpusSpec, overlay: int) -> str:
+    overrides = "".join(
+        f"  - override /group_{i}: option_{(overlay + i) % spec.options}\n"
+        for i in range(0, spec.groups, 2)
+    )
+    return (
+        "# @package _global_\n"
+        f"defaults:\n{overrides}  - _self_\n"
+        f"seed: {overlay}\n"
+        "debug: true\n"
+    )
+
+
+def _target_name(spec: CorpusSpec, index: int) -> str:
+    return f"Target{index % spec.targets}"
+
+
+def _targets_module(spec: CorpusSpec) -> str:
+    classes = "\n\n".join(
+        textwrap.dedent(
+            f'''\
+            class Target{t}:
+                """Synthetic target number {t}.
+
+                Parameters:
+                    size: The size.
+                    name: The name.
+                    rate: The rate.
+                    mode: The mode.
+                    layers: The sizes of the layers.
+                    child: A nested object.
+                """
+
+                def __init__(
+                    self,
+                    size: int = {t},
+                    name: str = "target_{t}",
+                    rate: float = 0.1,
+                    mode: Literal["a", "b", "c"] = "a",
+                    layers: list[int] | None = None,
+                    weights: dict[str, float] | None = None,
+                    enabled: bool = True,
+                    child: Any = None,
+                ):
+                    self.size = size
+                    self.child = child
+            '''
+        )
+        for t in range(spec.targets)
+    )
+    structured = "\n\n".join(
+        textwrap.dedent(
+            f"""\
+            @dataclasses.dataclass
+            class Structured{k}:
+                name: str = "structured_{k}"
+                size: int = {k}
+                rate: float = 0.5
+            """
+        )
+        for k in range(spec.structured_configs)
+    )
+    stores = "".join(
+        f'    cs.store(group="group_{i}", name="base_structured_{k}", node=Structured{k})\n'
+        for i in range(spec.groups)
+        for k in range(spec.structured_configs)
+    )
+    return (
+        '"""Generated by `benchmarks/corpus.py`."""\n\n'
+        "import dataclasses\n"
+        "from typing import Any, Literal\n\n"
+        "from hydra.core.config_store import ConfigStore\n\n\n"
+        f"{classes}\n\n{structured}\n\n"
+        "def register_configs() -> None:\n"
+        "    cs = ConfigStore.instance()\n"
+        f"{stores or '    pass'}\n"
+    )
@@ -0,0 +1,211 @@
+"""Micro-benchmarks of `merge_dicts` on the schema of a target with as many parameters as a
+`lightning.Trainer`.
+
+The memory allocated by each merge is measured with `tracemalloc`, and compared with that of the
+previous implementation of `merge_dicts`, which deep-copied its inputs. The scenarios mirror the
+calls made while creating the schema of a config:
+
+- target: Merging the schema of the `_target_` of a config into the base schema of Hydra configs.
+- override: Merging the schema of a config into the schema of a config in its defaults, with the
+  same target (every property conflicts).
+- nested: Adding the schema of a nested target to the properties of the schema of its parent.
+"""
+
+from __future__ import annotations
+
+import copy
+import inspect
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Literal, Mapping
+
+from hydra_auto_schema.auto_schema import _create_schema_from_target, _overwrite
+from hydra_auto_schema.customize import schema_conflict_handlers
+from hydra_auto_schema.hydra_schema import new_hydra_config_schema
+from hydra_auto_schema.utils import merge_dicts
+
+TRAINER_PARAMETER_TYPES: list[Any] = [
+    int | None,
+    float,
+    bool,
+    str | Path | None,
+    Literal["auto", "gpu", "cpu", "tpu"],
+    list[int] | str | int,
+    dict[str, Any] | None,
+    list[str] | None,
+]
+"""The annotations of the parameters of the `Trainer` class, used in turn."""
+
+
+def _make_trainer_class(num_params: int) -> type:
+    """Returns a class with `num_params` documented parameters of various types."""
+    parameters = [
+        inspect.Parameter(
+            f"param_{i}",
+            inspect.Parameter.KEYWORD_ONLY,
+            annotation=TRAINER_PARAMETER_TYPES[i % len(TRAINER_PARAMETER_TYPES)],
+            default=None,
+        )
+        for i in range(num_params)
+    ]
+    docstring = "A trainer.\n\nParameters:\n" + "".join(
+        f"    param_{i}: Description of parameter number {i}, which controls some aspect of "
+        f"the training loop.\n"
+        for i in range(num_params)
+    )
+
+    def __init__(self, **kwargs):
+        pass
+
+    __init__.__signature__ = inspect.Signature(  # type: ignore
+        [inspect.Parameter("self", inspect.Parameter.POSITIONAL_OR_KEYWORD)]
+        + parameters
+    )
+    __init__.__doc__ = docstring
+    return type(
+        "Trainer",
+        (),
+        {"__doc__": docstring, "__init__": __init__, "__module__": __name__},
+    )
+
+
+Trainer = _make_trainer_class(num_params=50)
+"""A class with as many parameters as a `lightning.Trainer`."""
+
+
+def make_trainer_schema() -> dict[str, Any]:
+    """Creates the schema of the `Trainer` class."""
+    return _create_schema_from_target({"_target_": f"{__name__}.Trainer"})  # type: ignore
+
+
+def merge_dicts_with_copies(
+    a: Mapping,
+    b: Mapping,
+    conflict_handler: Callable[[Any, Any], Any] | None = None,
+    conflict_handlers: dict[str, Callable[[Any, Any], Any]] | None = None,
+    _path: list[str] = [],
+) -> dict:
+    """The previous implementation of `merge_dicts`, which deep-copies `a` and the values of `b`."""
+    conflict_handlers = conflict_handlers or {}
+    out = copy.deepcopy(a)
+    for key in b:
+        b_val = b[key]
+        if key not in a:
+            out[key] = copy.deepcopy(b_val)
+            continue
+        a_val = a[key]
+        if isinstance(a_val, Mapping) and isinstance(b_val, Mapping):
+            out[key] = merge_dicts_with_copies(
+                a_val,
+                b_val,
+                conflict_handlers={
+                    k.removeprefix(f"{key}."): v for k, v in conflict_handlers.items()
+                },
+                conflict_handler=conflict_handler,
+                _path=_path + [str(key)],
+            )
+        elif a_val != b_val:
+            if specific_conflict_handler := conflict_handlers.get(str(key)):
+                out[key] = specific_conflict_handler(a_val, b_val)
+            elif conflict_handler:
+                out[key] = conflict_handler(a_val, b_val)
+            else:
+                raise Exception("Conflict at " + ".".join(_path + [str(key)]))
+    return out
+
+
+def get_scenarios() -> dict[str, tuple[dict, dict]]:
+    """Returns the (a, b) arguments of `merge_dicts` in each scenario."""
+    trainer_schema = make_trainer_schema()
+    overriding_schema = copy.deepcopy(trainer_schema)
+    for name, property_schema in overriding_schema["properties"].items():
+        property_schema["default"] = f"{name}_override"
+    parent_schema = new_hydra_config_schema()
+    parent_schema["properties"]["trainer"] = copy.deepcopy(trainer_schema)
+    return {
+        "target": (new_hydra_config_schema(), trainer_schema),  # type: ignore
+        "override": (trainer_schema, overriding_schema),
+        "nested": (
+            parent_schema["properties"],  # type: ignore
+            {"trainer": overriding_schema},
+        ),
+    }
+
+
+def run_merge_benchmark(repeat: int = 100) -> list[dict[str, Any]]:
+    """Measures the time and the memory allocated by `merge_dicts` in each scenario.
+
+    NOTE: `tracemalloc` doesn't see the memory reused from the free lists of CPython. The dicts
+    that the previous implementation builds one key at a time often reuse a freed key table,
+    while `dict.copy()` always allocates one. Its retained memory is therefore under-reported
+    when both implementations create the same dicts (e.g. in the "override" scenario).
+
+    Returns:
+        One result per scenario and implementation, with the mean time of a merge, the peak
+        memory allocated during a merge, and the memory still held by its result.
+    """
+    results = []
+    for scenario, (a, b) in get_scenarios().items():
+        for implementation, merge in [
+            ("copy", merge_dicts_with_copies),
+            ("shared", merge_dicts),
+        ]:
+
+            def _merge() -> dict:
+                return merge(
+                    a,
+                    b,
+                    conflict_handler=_overwrite,
+                    conflict_handlers=schema_conflict_handlers,
+                )
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                _merge()
+            mean_time = (time.perf_counter() - start) / repeat
+
+            tracemalloc.start()
+            try:
+                before, _ = tracemalloc.get_traced_memory()
+                result = _merge()
+                after, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            assert result == merge_dicts_with_copies(
+                a,
+                b,
+                conflict_handler=_overwrite,
+                conflict_handlers=schema_conflict_handlers,
+            )
+            results.append(
+                {
+                    "scenario": scenario,
+                    "implementation": implementation,
+                    "mean_time": mean_time,
+                    "peak_bytes": peak - before,
+                    "retained_bytes": after - before,
+                }
+            )
+    return results
+
+
+def format_results(results: list[dict[str, Any]]) -> list[str]:
+    """Returns lines comparing the implementations in each scenario."""
+    lines = []
+    by_scenario: dict[str, dict[str, dict[str, Any]]] = {}
+    for result in results:
+        by_scenario.setdefault(result["scenario"], {})[
+            result["implementation"]
+        ] = result
+    for scenario, implementations in by_scenario.items():
+        copy_result, shared_result = implementations["copy"], implementations["shared"]
+        lines.append(
+            f"{scenario:>10}: "
+            f"{copy_result['mean_time'] * 1e6:8.1f}us -> {shared_result['mean_time'] * 1e6:8.1f}us, "
+            f"peak {copy_result['peak_bytes'] / 1024:7.1f}KiB -> "
+            f"{shared_result['peak_bytes'] / 1024:7.1f}KiB, "
+            f"retained {copy_result['retained_bytes'] / 1024:7.1f}KiB -> "
+            f"{shared_result['retained_bytes'] / 1024:7.1f}KiB"
+        )
+    return lines
@@ -0,0 +1,189 @@
+"""End-to-end benchmarks of `add_schemas_to_all_hydra_configs` on synthetic config trees.
+
+For each scale, a corpus is generated (see `benchmarks.corpus`), and these scenarios are run in
+order, each in a fresh Python process:
+
+- cold: No schemas and an empty target schema cache.
+- warm: Nothing changed since the previous run.
+- incremental: A config file that many other configs depend on was modified.
+
+The wall time of the call, the wall time of the whole process (including the imports) and the
+peak RSS of the process (and of its worker processes) are measured.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+from benchmarks.corpus import SCALES, CorpusSpec, generate_corpus, get_leaf_option
+
+SCENARIOS = ("cold", "warm", "incremental")
+
+
+def run_suite(
+    scales: list[str], workdir: Path, jobs: int = 1, repeat: int = 1
+) -> dict[str, Any]:
+    """Runs the benchmarks at each scale, and returns the results.
+
+    Parameters:
+        scales: Names of the scales to run (keys of `benchmarks.corpus.SCALES`).
+        workdir: Directory in which the corpora are generated.
+        jobs: Value of the `jobs` argument of `add_schemas_to_all_hydra_configs`.
+        repeat: Number of times to run the scenarios at each scale.
+    """
+    results: list[dict[str, Any]] = []
+    for scale in scales:
+        spec = SCALES[scale]
+        for iteration in range(repeat):
+            repo_root = workdir / scale
+            configs_dir = generate_corpus(repo_root, spec)
+            for scenario in SCENARIOS:
+                if scenario == "cold":
+                    shutil.rmtree(repo_root / ".schemas", ignore_errors=True)
+                    shutil.rmtree(repo_root / "cache", ignore_errors=True)
+                elif scenario == "incremental":
+                    leaf = get_leaf_option(configs_dir, spec)
+                    leaf.write_text(leaf.read_text() + "extra: 1\n")
+                measurement = _measure_in_subprocess(repo_root, jobs=jobs)
+                results.append(
+                    {
+                        "scale": scale,
+                        "scenario": scenario,
+                        "iteration": iteration,
+                        "num_configs": spec.num_configs,
+                        "jobs": jobs,
+                        **measurement,
+                    }
+                )
+                print(
+                    f"{scale:>8} {scenario:>12}: {measurement['wall_time']:8.3f}s "
+                    f"(process: {measurement['process_wall_time']:.3f}s, "
+                    f"peak RSS: {measurement['peak_rss_mb']:.0f} MB)",
+                    file=sys.stderr,
+                )
+    return {
+        "metadata": _get_metadata(),
+        "scales": {scale: _spec_to_dict(SCALES[scale]) for scale in scales},
+        "results": results,
+    }
+
+
+def compare(baseline: dict[str, Any], results: dict[str, Any]) -> list[str]:
+    """Returns lines comparing the mean wall times of two sets of results."""
+    base_times = _mean_wall_times(baseline)
+    lines = []
+    for (scale, scenario), wall_time in _mean_wall_times(results).items():
+        base_time = base_times.get((scale, scenario))
+        if base_time is None:
+            continue
+        lines.append(
+            f"{scale:>8} {scenario:>12}: {base_time:8.3f}s -> {wall_time:8.3f}s "
+            f"({wall_time / base_time:.2f}x)"
+        )
+    return lines
+
+
+def measure(repo_root: Path, jobs: int = 1) -> dict[str, Any]:
+    """Runs `add_schemas_to_all_hydra_configs` on a corpus, in this process."""
+    import resource
+
+    sys.path.insert(0, str(repo_root))
+    import bench_targets  # type: ignore
+
+    from hydra_auto_schema.auto_schema import add_schemas_to_all_hydra_configs
+    from hydra_auto_schema.manifest import Manifest
+
+    bench_targets.register_configs()
+    schemas_dir = repo_root / ".schemas"
+    start = time.perf_counter()
+    add_schemas_to_all_hydra_configs(
+        repo_root=repo_root,
+        configs_dir=repo_root / "configs",
+        schemas_dir=schemas_dir,
+        quiet=True,
+        add_headers=True,
+        jobs=jobs,
+    )
+    wall_time = time.perf_counter() - start
+
+    # `ru_maxrss` is in kilobytes on Linux, and in bytes on macOS.
+    unit = 1 if sys.platform == "darwin" else 1024
+    peak_rss = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    entries = Manifest.load(schemas_dir).entries.values()
+    return {
+        "wall_time": wall_time,
+        "peak_rss_mb": peak_rss * unit / 2**20,
+        "num_partial_schemas": sum(entry.status == "partial" for entry in entries),
+    }
+
+
+def _measure_in_subprocess(repo_root: Path, jobs: int) -> dict[str, Any]:
+    env = os.environ | {
+        "HYDRA_AUTO_SCHEMA_CACHE_DIR": str(repo_root / "cache"),
+        "PYTHONPATH": os.pathsep.join(
+            [str(Path(__file__).parent.parent), os.environ.get("PYTHONPATH", "")]
+        ),
+    }
+    start = time.perf_counter()
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks",
+            "measure",
+            str(repo_root),
+            f"--jobs={jobs}",
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+        env=env,
+    ).stdout
+    process_wall_time = time.perf_counter() - start
+    return json.loads(output) | {"process_wall_time": process_wall_time}
+
+
+def _mean_wall_times(results: dict[str, Any]) -> dict[tuple[str, str], float]:
+    times: dict[tuple[str, str], list[float]] = {}
+    for result in results["results"]:
+        times.setdefault((result["scale"], result["scenario"]), []).append(
+            result["wall_time"]
+        )
+    return {key: sum(values) / len(values) for key, values in times.items()}
+
+
+def _get_metadata() -> dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=Path(__file__).parent,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def _spec_to_dict(spec: CorpusSpec) -> dict[str, Any]:
+    return dataclasses.asdict(spec) | {"num_configs": spec.num_configs}
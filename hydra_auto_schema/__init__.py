@@ -2,11 +2,15 @@
 #     AutoSchemaPlugin,
 #     register_auto_schema_plugin,
 # )
-from .auto_schema import (
-    add_schemas_to_all_hydra_configs,
-)
-from .customize import custom_enum_schemas, custom_hydra_zen_builds_args
-from .filewatcher import AutoSchemaEventHandler
+import importlib
+import typing
+
+if typing.TYPE_CHECKING:
+    from .auto_schema import (
+        add_schemas_to_all_hydra_configs,
+    )
+    from .customize import custom_enum_schemas, custom_hydra_zen_builds_args
+    from .filewatcher import AutoSchemaEventHandler
 
 __all__ = [
     "add_schemas_to_all_hydra_configs",
@@ -16,3 +20,18 @@ __all__ = [
     "custom_hydra_zen_builds_args",
     "custom_enum_schemas",
 ]
+
+# NOTE: These are imported lazily, so that the command-line doesn't need to import Hydra, pydantic,
+# etc. when the daemon does the work.
+_LAZY_IMPORTS = {
+    "add_schemas_to_all_hydra_configs": ".auto_schema",
+    "AutoSchemaEventHandler": ".filewatcher",
+    "custom_hydra_zen_builds_args": ".customize",
+    "custom_enum_schemas": ".customize",
+}
+
+
+def __getattr__(name: str) -> typing.Any:
+    if (module_name := _LAZY_IMPORTS.get(name)) is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module_name, __name__), name)
@@ -1,34 +1,34 @@
 import argparse
+import importlib
+import json
 import logging
+import os
+import signal
+import subprocess
 import sys
 import time
 from pathlib import Path
+from typing import Literal
 
+import rich.console
 import rich.logging
-from watchdog.observers import Observer
 
-from hydra_auto_schema.auto_schema import add_schemas_to_all_hydra_configs, logger
-from hydra_auto_schema.filewatcher import AutoSchemaEventHandler
+from hydra_auto_schema import client
+
+# NOTE: `hydra_auto_schema.auto_schema` (and Hydra, pydantic, etc.) are only imported once we know
+# that the daemon isn't going to do the work, since they take a while to import.
+logger = logging.getLogger("hydra_auto_schema.auto_schema")
 
 
 def main(argv: list[str] | None = None):
-    logging.basicConfig(
-        level=logging.ERROR,
-        # format="%(asctime)s - %(levelname)s - %(message)s",
-        format="%(message)s",
-        datefmt="[%X]",
-        force=True,
-        handlers=[
-            rich.logging.RichHandler(
-                markup=True,
-                rich_tracebacks=True,
-                tracebacks_width=100,
-                tracebacks_show_locals=False,
-            )
-        ],
-    )
+    _configure_logging()
 
-    parser = argparse.ArgumentParser()
+    parser = argparse.ArgumentParser(
+        epilog=(
+            "See also `hydra-auto-schema-serve` to keep the schema generation warm in a daemon, "
+            "and `hydra-auto-schema-for` to print the schema of a single config file."
+        ),
+    )
     parser.add_argument("repo_root", nargs="?", type=Path, default=Path.cwd())
     parser.add_argument(
         "--configs_dir",
@@ -54,6 +54,91 @@ def main(argv: list[str] | None = None):
             "settings.json file."
         ),
     )
+    parser.add_argument(
+        "--vscode-associations",
+        choices=["files", "globs"],
+        default="files",
+        help=(
+            "How to associate the schemas with the config files in the vscode settings: with the "
+            "path of each config file, or with a glob per config group when possible."
+        ),
+    )
+    parser.add_argument(
+        "--shared-target-schemas",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help=(
+            "Write the schema of each target once in the 'targets' subdirectory of the schemas "
+            "directory, and refer to it with '$ref' from the schemas of the configs."
+        ),
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=_jobs,
+        default=1,
+        help=(
+            "Number of worker processes used to create the schemas, or 'auto' to use all the "
+            "CPUs available to this process."
+        ),
+    )
+    changed_files_group = parser.add_mutually_exclusive_group()
+    changed_files_group.add_argument(
+        "--since",
+        metavar="REF",
+        default=None,
+        help=(
+            "Only regenerate the schemas of the config files that changed since this git ref "
+            "(including uncommitted and untracked files), and of the configs that depend on them."
+        ),
+    )
+    changed_files_group.add_argument(
+        "--files",
+        action="append",
+        metavar="FILE",
+        default=None,
+        help=(
+            "Only regenerate the schema of this config file, and of the configs that depend on "
+            "it. Can be passed multiple times. Use '-' to read a NUL-separated list of files "
+            "from stdin."
+        ),
+    )
+    profile_group = parser.add_argument_group("profiling")
+    profile_group.add_argument(
+        "--profile",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help=(
+            "Time each phase of the run (finding the configs, composing them with Hydra, "
+            "hydra_zen.builds, pydantic, docstrings, merging and writing the schemas), and print "
+            "a summary with the slowest configs and targets."
+        ),
+    )
+    profile_group.add_argument(
+        "--profile-top",
+        type=_positive_int,
+        default=10,
+        metavar="N",
+        help="Number of configs and targets in the lists of the slowest ones.",
+    )
+    profile_group.add_argument(
+        "--profile-json",
+        type=Path,
+        default=None,
+        metavar="FILE",
+        help="Also write the timings to this JSON file. Implies --profile.",
+    )
+    profile_group.add_argument(
+        "--profile-cprofile-dir",
+        type=Path,
+        default=None,
+        metavar="DIR",
+        help=(
+            "Run cProfile on each config, and write the stats of the slowest configs (see "
+            "--profile-top) in this directory, to be read with pstats or snakeviz. "
+            "Implies --profile."
+        ),
+    )
     verbosity_group = parser.add_mutually_exclusive_group()
     verbosity_group.add_argument(
         "-q", "--quiet", dest="quiet", action=argparse.BooleanOptionalAction
@@ -62,7 +147,23 @@ def main(argv: list[str] | None = None):
         "-v", "--verbose", dest="verbose", action="count", default=0
     )
 
-    args = parser.parse_args(argv if argv is not None else sys.argv[1:])
+    parser.add_argument(
+        "--daemon",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help=(
+            "Let the daemon of the repo (`hydra-auto-schema-serve`) update the schemas if it is "
+            "running. It keeps the modules, configs and target schemas in memory between runs."
+        ),
+    )
+    parser.add_argument(
+        "--daemon-timeout",
+        type=float,
+        default=client.DEFAULT_TIMEOUT,
+        metavar="SECONDS",
+        help="Update the schemas without the daemon if it doesn't respond within this time.",
+    )
+    args = parser.parse_args(argv)
 
     configs_dir: Path | None = args.configs_dir
     schemas_dir: Path = args.schemas_dir
@@ -73,6 +174,14 @@ def main(argv: list[str] | None = None):
     verbose: int = args.verbose
     add_headers: bool = args.add_headers
     watch: bool = args.watch
+    jobs: int | Literal["auto"] = args.jobs
+    since: str | None = args.since
+    files: list[str] | None = args.files
+    vscode_associations: Literal["files", "globs"] = args.vscode_associations
+    shared_target_schemas: bool = args.shared_target_schemas
+    profile_json: Path | None = args.profile_json
+    profile_cprofile_dir: Path | None = args.profile_cprofile_dir
+    profile: bool = args.profile or bool(profile_json or profile_cprofile_dir)
 
     repo_root = repo_root.resolve()
 
@@ -96,24 +205,58 @@ def main(argv: list[str] | None = None):
 
     configs_dir = configs_dir.resolve()
 
-    if quiet:
-        logger.setLevel(logging.NOTSET)
-    elif verbose:
-        if verbose >= 3:
-            logger.setLevel(logging.DEBUG)
-        elif verbose == 2:
-            logger.setLevel(logging.INFO)
-        else:
-            assert verbose == 1
-            logger.setLevel(logging.WARNING)
-    else:
-        logger.setLevel(logging.ERROR)
+    _set_verbosity(quiet=quiet, verbose=verbose)
     logger.debug(
-        f"{configs_dir=} {schemas_dir=} {repo_root=} {regen_schemas=} {stop_on_error=} {quiet=} {verbose=} {add_headers=} {watch=}"
+        f"{configs_dir=} {schemas_dir=} {repo_root=} {regen_schemas=} {stop_on_error=} {quiet=} {verbose=} {add_headers=} {watch=} {jobs=} {since=} {files=}"
     )
-    # try to find a ConfigStore?
+    changed_files: list[Path] | None = None
+    if watch and (since is not None or files is not None):
+        parser.error("--since and --files can't be used with --watch.")
+    if watch and profile:
+        parser.error("--profile can't be used with --watch.")
+    if since is not None:
+        try:
+            changed_files = _get_changed_files_since(since, repo_root=repo_root)
+        except subprocess.CalledProcessError as exc:
+            parser.error(
+                f"Unable to get the files changed since {since!r}: {exc.stderr}"
+            )
+    elif files is not None:
+        changed_files = [
+            Path(file).absolute()
+            for arg in files
+            for file in (_read_files_from_stdin() if arg == "-" else [arg])
+        ]
+
+    if args.daemon and not watch and not profile:
+        handled, result = client.try_call(
+            repo_root,
+            "add_schemas",
+            timeout=args.daemon_timeout,
+            configs_dir=str(configs_dir),
+            schemas_dir=str(schemas_dir.absolute()),
+            regen_schemas=bool(regen_schemas),
+            stop_on_error=bool(stop_on_error),
+            add_headers=add_headers,
+            jobs=jobs,
+            changed_files=client.to_json(changed_files),
+            vscode_associations=vscode_associations,
+            shared_target_schemas=shared_target_schemas,
+        )
+        if handled:
+            logger.info(
+                f"The schemas were updated by the daemon in {result['elapsed']:.3f}s."
+            )
+            return
 
     from hydra.core.config_store import ConfigStore
+    from watchdog.observers import Observer
+
+    from hydra_auto_schema import profiling
+    from hydra_auto_schema.auto_schema import add_schemas_to_all_hydra_configs
+    from hydra_auto_schema.filewatcher import AutoSchemaEventHandler
+
+    # try to find a ConfigStore?
 
     config_store = ConfigStore.instance()
 
@@ -128,6 +271,9 @@ def main(argv: list[str] | None = None):
             quiet=quiet,
             add_headers=add_headers,
             config_store=config_store,
+            jobs=jobs,
+            vscode_associations=vscode_associations,
+            shared_target_schemas=shared_target_schemas,
         )
         observer.schedule(handler, str(configs_dir), recursive=True)
         observer.start()
@@ -138,20 +284,297 @@ def main(argv: list[str] | None = None):
         except KeyboardInterrupt:
             observer.stop()
         observer.join()
+        handler.stop()
         return
 
-    add_schemas_to_all_hydra_configs(
-        repo_root=repo_root,
-        configs_dir=configs_dir,
-        schemas_dir=schemas_dir,
-        regen_schemas=regen_schemas,
-        stop_on_error=stop_on_error,
-        quiet=quiet,
-        add_headers=add_headers,
-        config_store=config_store,
+    run_profile = (
+        profiling.RunProfile(
+            top=args.profile_top, cprofile=profile_cprofile_dir is not None
+        )
+        if profile
+        else None
     )
+    with profiling.recording(run_profile):
+        add_schemas_to_all_hydra_configs(
+            repo_root=repo_root,
+            configs_dir=configs_dir,
+            schemas_dir=schemas_dir,
+            regen_schemas=regen_schemas,
+            stop_on_error=stop_on_error,
+            quiet=quiet,
+            add_headers=add_headers,
+            config_store=config_store,
+            jobs=jobs,
+            changed_files=changed_files,
+            vscode_associations=vscode_associations,
+            shared_target_schemas=shared_target_schemas,
+        )
     logger.info("Done updating the schemas for the Hydra config files.")
 
+    if run_profile is not None:
+        console = rich.console.Console()
+        run_profile.print_summary(console, configs_dir=configs_dir)
+        if profile_json is not None:
+            run_profile.write_json(profile_json)
+            console.print(f"Wrote the timings to {profile_json}.")
+        if profile_cprofile_dir is not None:
+            stats_files = run_profile.dump_cprofile_stats(profile_cprofile_dir)
+            console.print(
+                f"Wrote the cProfile stats of {len(stats_files)} configs in "
+                f"{profile_cprofile_dir}."
+            )
+
+
+_SERVE_COMMAND = "from hydra_auto_schema.__main__ import serve; serve()"
+"""Python command that runs `serve` with the command-line arguments (used to restart the daemon)."""
+
+
+def serve(argv: list[str] | None = None) -> None:
+    """Runs the daemon that keeps the schema generation warm (see `hydra_auto_schema.server`)."""
+    argv = argv if argv is not None else sys.argv[1:]
+    parser = argparse.ArgumentParser(
+        prog="hydra-auto-schema-serve",
+        description=(
+            "Keep the modules, configs and target schemas in memory, and update the schemas "
+            "when the command-line or the plugin asks for it."
+        ),
+    )
+    parser.add_argument("repo_root", nargs="?", type=Path, default=Path.cwd())
+    parser.add_argument(
+        "--stdio",
+        action="store_true",
+        help=(
+            "Read JSON-RPC requests from stdin and write the responses to stdout, instead of "
+            "listening on the Unix socket of the repo."
+        ),
+    )
+    parser.add_argument(
+        "--import",
+        dest="imports",
+        action="append",
+        default=[],
+        metavar="MODULE",
+        help=(
+            "Import this module when starting, for example to register structured configs in the "
+            "ConfigStore. Can be passed more than once."
+        ),
+    )
+    parser.add_argument("-v", "--verbose", dest="verbose", action="count", default=0)
+    args = parser.parse_args(argv)
+
+    # NOTE: With --stdio, stdout is used for the responses.
+    _configure_logging(console=rich.console.Console(stderr=True))
+    _set_verbosity(quiet=False, verbose=args.verbose)
+    for module in args.imports:
+        importlib.import_module(module)
+
+    from hydra_auto_schema.server import SchemaServer
+    from hydra_auto_schema.server import serve as serve_unix_socket
+    from hydra_auto_schema.server import serve_stdio
+
+    # Exit cleanly (removing the socket) when stopped with `kill`.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    server = SchemaServer(args.repo_root.resolve())
+    if args.stdio:
+        serve_stdio(server)
+    else:
+        serve_unix_socket(server)
+        if server.restart:
+            logger.warning("Some imported modules changed, restarting the daemon.")
+            os.execv(
+                sys.executable,
+                [sys.executable, "-c", _SERVE_COMMAND, *argv],
+            )
+
+
+def schema_for(argv: list[str] | None = None) -> None:
+    """Prints (or writes) the schema of a single config file."""
+    parser = argparse.ArgumentParser(
+        prog="hydra-auto-schema-for",
+        description=(
+            "Create the schema of a single config file, and print it. Only the configs in its "
+            "defaults are loaded, and nothing else is written (e.g. the vscode settings)."
+        ),
+    )
+    parser.add_argument("config_file", type=Path)
+    parser.add_argument("--repo-root", type=Path, default=Path.cwd())
+    parser.add_argument(
+        "--configs-dir",
+        type=Path,
+        default=None,
+        help=(
+            "The directory containing the hydra config files. Defaults to the closest parent "
+            "directory of the config file whose name starts with 'conf'."
+        ),
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        default=None,
+        metavar="FILE",
+        help="Write the schema to this file instead of printing it.",
+    )
+    parser.add_argument(
+        "--stop-on-error",
+        action=argparse.BooleanOptionalAction,
+        help="Fail if the schema can't be fully created, instead of giving a partial schema.",
+    )
+    parser.add_argument(
+        "--daemon",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Get the schema from the daemon of the repo, if it is running.",
+    )
+    parser.add_argument(
+        "--daemon-timeout",
+        type=float,
+        default=client.DEFAULT_TIMEOUT,
+        metavar="SECONDS",
+        help="Create the schema without the daemon if it doesn't respond within this time.",
+    )
+    parser.add_argument("-v", "--verbose", dest="verbose", action="count", default=0)
+    args = parser.parse_args(argv)
+
+    # NOTE: stdout is used for the schema.
+    _configure_logging(console=rich.console.Console(stderr=True))
+    _set_verbosity(quiet=False, verbose=args.verbose)
+    repo_root: Path = args.repo_root.resolve()
+    config_file: Path = args.config_file.resolve()
+    configs_dir: Path | None = args.configs_dir
+    if configs_dir is None:
+        configs_dir = next(
+            (p for p in config_file.parents if p.name.startswith("conf")), None
+        )
+        if configs_dir is None:
+            parser.error(
+                f"--configs-dir was not passed, and none of the parent directories of "
+                f"{config_file} look like a configs directory."
+            )
+    configs_dir = configs_dir.resolve()
+    if not config_file.is_relative_to(configs_dir):
+        parser.error(f"{config_file} is not in the configs directory {configs_dir}.")
+
+    handled, result = False, None
+    if args.daemon:
+        handled, result = client.try_call(
+            repo_root,
+            "schema_for",
+            timeout=args.daemon_timeout,
+            configs_dir=str(configs_dir),
+            config_file=str(config_file),
+        )
+    if handled:
+        schema, error = result["schema"], result["error"]
+    else:
+        from hydra_auto_schema.auto_schema import get_schema_for_config_file
+
+        schema_result = get_schema_for_config_file(
+            config_file, configs_dir=configs_dir, repo_root=repo_root
+        )
+        schema, error = schema_result.schema, schema_result.error
+
+    if error is not None:
+        if args.stop_on_error:
+            raise RuntimeError(f"Unable to create the schema of {config_file}: {error}")
+        logger.error(f"The schema of {config_file} is partial: {error}")
+    schema_text = json.dumps(schema, indent=2) + "\n"
+    if args.output is None:
+        sys.stdout.write(schema_text)
+    else:
+        args.output.parent.mkdir(exist_ok=True, parents=True)
+        args.output.write_text(schema_text)
+
+
+def _configure_logging(console: rich.console.Console | None = None) -> None:
+    logging.basicConfig(
+        level=logging.ERROR,
+        # format="%(asctime)s - %(levelname)s - %(message)s",
+        format="%(message)s",
+        datefmt="[%X]",
+        force=True,
+        handlers=[
+            rich.logging.RichHandler(
+                console=console,
+                markup=True,
+                rich_tracebacks=True,
+                tracebacks_width=100,
+                tracebacks_show_locals=False,
+            )
+        ],
+    )
+
+
+def _set_verbosity(quiet: bool, verbose: int) -> None:
+    if quiet:
+        logger.setLevel(logging.NOTSET)
+    elif verbose:
+        if verbose >= 3:
+            logger.setLevel(logging.DEBUG)
+        elif verbose == 2:
+            logger.setLevel(logging.INFO)
+        else:
+            assert verbose == 1
+            logger.setLevel(logging.WARNING)
+    else:
+        logger.setLevel(logging.ERROR)
+
+
+def _get_changed_files_since(ref: str, repo_root: Path) -> list[Path]:
+    """Returns the files that changed since this git ref, including uncommitted changes."""
+
+    def _git(*args: str) -> str:
+        return subprocess.run(
+            ["git", *args],
+            cwd=repo_root,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+
+    toplevel = Path(_git("rev-parse", "--show-toplevel").strip())
+    changed = _git("diff", "--name-only", "-z", ref, "--").split("\0")
+    untracked = _git("ls-files", "--others", "--exclude-standard", "-z").split("\0")
+    # NOTE: `ls-files` gives paths relative to the current directory, `diff` relative to the
+    # top-level directory of the repo.
+    return [toplevel / file for file in changed if file] + [
+        repo_root / file for file in untracked if file
+    ]
+
+
+def _read_files_from_stdin() -> list[str]:
+    """Reads a NUL-separated list of files (for example from `git diff -z --name-only`).
+
+    A newline-separated list is also accepted if there are no NUL characters in the input.
+    """
+    data = sys.stdin.buffer.read()
+    separator = b"\0" if b"\0" in data else b"\n"
+    return [os.fsdecode(file) for file in data.split(separator) if file]
+
+
+def _positive_int(value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {value!r}")
+    return number
+
+
+def _jobs(value: str) -> int | Literal["auto"]:
+    if value == "auto":
+        return "auto"
+    try:
+        jobs = int(value)
+    except ValueError:
+        jobs = 0
+    if jobs < 1:
+        raise argparse.ArgumentTypeError(
+            f"expected a positive integer or 'auto', got {value!r}"
+        )
+    return jobs
+
 
 if __name__ == "__main__":
     main()
@@ -11,19 +11,33 @@ description and default values, and displays errors if you have config files wit
 
 from __future__ import annotations
 
+import concurrent.futures
+import contextlib
 import copy
 import dataclasses
-import datetime
+import functools
+import hashlib
 import inspect
 import json
-import os.path
+import os
+import shutil
 import subprocess
-import sys
+import threading
+import time
 import typing
 import warnings
+import weakref
 from logging import getLogger as get_logger
 from pathlib import Path
-from typing import Any, TypeVar
+from typing import (
+    Any,
+    Callable,
+    Hashable,
+    Iterable,
+    Iterator,
+    Literal,
+    Sequence,
+)
 
 import docstring_parser as dp
 import hydra.conf
@@ -38,7 +52,7 @@ import tqdm
 from hydra._internal.config_loader_impl import ConfigLoaderImpl
 from hydra._internal.config_search_path_impl import ConfigSearchPathImpl
 from hydra.core.config_search_path import ConfigSearchPath
-from hydra.core.config_store import ConfigNode, ConfigStore
+from hydra.core.config_store import ConfigStore
 from hydra.core.plugins import Plugins
 from hydra.plugins.search_path_plugin import SearchPathPlugin
 from hydra.types import RunMode
@@ -47,36 +61,52 @@ from pydantic.json_schema import GenerateJsonSchema, JsonSchemaValue
 from pydantic_core import core_schema
 from tqdm.rich import tqdm_rich
 
+from hydra_auto_schema import profiling
+from hydra_auto_schema.config_repository import SharedConfigRepository
+from hydra_auto_schema.config_store import _iter_config_store_nodes
 from hydra_auto_schema.customize import (
+    BUILDS_ARGS_ENTRY_POINT_GROUP,
+    ENUM_SCHEMAS_ENTRY_POINT_GROUP,
+    _find_customization,
     custom_enum_schemas,
     custom_hydra_zen_builds_args,
     schema_conflict_handlers,
 )
+from hydra_auto_schema.dependencies import (
+    DependencyGraph,
+    _has_package_global_line,
+    get_config_dependencies,
+)
 from hydra_auto_schema.hydra_schema import (
-    HYDRA_CONFIG_SCHEMA,
     ObjectSchema,
     PropertySchema,
     Schema,
+    new_hydra_config_schema,
+)
+from hydra_auto_schema.manifest import (
+    TARGET_SCHEMAS_DIR,
+    FileFingerprint,
+    Manifest,
+    _yaml_files_in,
+    lock_schemas_dir,
+)
+from hydra_auto_schema.target_cache import (
+    TargetSchemaDiskCache,
+    _get_registries_fingerprint,
+    _qualified_name,
+    get_default_cache_dir,
 )
-from hydra_auto_schema.utils import merge_dicts, pretty_path
+from hydra_auto_schema.utils import (
+    atomic_write_text,
+    get_available_cpus,
+    merge_dicts,
+    pretty_path,
+    write_text_if_changed,
+)
+from hydra_auto_schema.vscode_settings import VscodeSettingsFile
 
 logger = get_logger(__name__)
 
-config = None
-
-K = TypeVar("K")
-V = TypeVar("V")
-PossiblyNestedDict = dict[K, V | "PossiblyNestedDict[K, V]"]
-
-
-def _yaml_files_in(configs_dir: Path) -> list[Path]:
-    # Ignores .venv subfiles if the `configs_dir` isn't itself in a ".venv" directory.
-    if ".venv" in configs_dir.parts:
-        return list(configs_dir.rglob("*.yaml")) + list(configs_dir.rglob("*.yml"))
-    return list(
-        p for p in configs_dir.rglob("*.yaml") if ".venv" not in p.parts
-    ) + list(p for p in configs_dir.rglob("*.yml") if ".venv" not in p.parts)
-
 
 def add_schemas_to_all_hydra_configs(
     repo_root: Path,
@@ -87,6 +117,10 @@ def add_schemas_to_all_hydra_configs(
     quiet: bool = False,
     add_headers: bool | None = False,
     config_store: ConfigStore | None = None,
+    jobs: int | Literal["auto"] = 1,
+    changed_files: Sequence[Path] | None = None,
+    vscode_associations: Literal["files", "globs"] = "files",
+    shared_target_schemas: bool = False,
 ):
     """Adds schemas to all the passed Hydra config files.
 
@@ -102,9 +136,29 @@ def add_schemas_to_all_hydra_configs(
             - If None, try adding to VSCode settings first, then fallback to adding headers.
             - If False, only use VSCode settings.
             - If True, only add headers.
+        config_store: The ConfigStore with the structured configs to use. Defaults to
+            `ConfigStore.instance()`. A copy of it is used while the schemas are created (it is
+            installed as the ConfigStore of Hydra, and of each worker process).
+        jobs: Number of worker processes used to create the schemas. When greater than 1, the
+            config files are spread across a process pool, where each worker has its own copy of
+            the Hydra global state. "auto" uses the number of CPUs available to this process
+            (taking into account the CPU affinity, cgroup quota and SLURM allocation).
+        changed_files: If passed, only the schemas of these config files and of the config files
+            that depend on them (through their defaults list or a `@package _global_` directive)
+            are regenerated. Other files (for example Python files) are ignored.
+        vscode_associations: How the schemas are associated with the config files in the vscode
+            settings.
+
+            - If "files", each schema is associated with the absolute path of its config file.
+            - If "globs", config groups whose config files all have the same schema use a single
+              glob pattern (e.g. `configs/optimizer/*.yaml`), config files with identical schemas
+              share one entry, and paths are relative to the repo root.
+        shared_target_schemas: If True, the schema of each distinct target is written once in
+            `schemas_dir/targets`, and the schemas of the configs refer to it with `$ref` instead
+            of embedding a copy of it.
     """
-    config_store = config_store or ConfigStore.instance()
-    config_files = _yaml_files_in(configs_dir)
+    with profiling.phase("discovery"):
+        config_files = _yaml_files_in(configs_dir)
     if not config_files:
         if stop_on_error:
             raise RuntimeError("No config files were found!")
@@ -118,148 +172,539 @@ def add_schemas_to_all_hydra_configs(
     if schemas_dir.is_relative_to(repo_root):
         _add_schemas_dir_to_gitignore(schemas_dir, repo_root=repo_root)
 
-    config_file_to_schema_file: dict[Path, Path] = {}
+    with lock_schemas_dir(schemas_dir):
+        manifest = Manifest.load(schemas_dir)
+        manifest.prune(config_files, configs_dir=configs_dir)
+
+        affected_config_files: list[Path] | None = None
+        if changed_files is not None:
+            graph = DependencyGraph.build(config_files, configs_dir=configs_dir)
+            affected_config_files = graph.get_affected(changed_files)
+            logger.info(
+                f"{len(affected_config_files)} config files are affected by the "
+                f"{len(changed_files)} changed files."
+            )
+
+        config_files_to_process: list[Path] = []
+        with profiling.phase("manifest"):
+            # Cache of the `stat` results, since config files can be in the defaults of many
+            # others.
+            stats: dict[Path, os.stat_result | None] = {}
+            for config_file in (
+                affected_config_files if affected_config_files is not None else config_files
+            ):
+                pretty_config_file_name = config_file.relative_to(configs_dir)
+                schema_file = get_schema_file_path(config_file, schemas_dir)
+
+                if regen_schemas or affected_config_files is not None:
+                    pass  # regenerate it.
+                elif manifest.is_up_to_date(
+                    config_file,
+                    configs_dir=configs_dir,
+                    schema_file=schema_file,
+                    shared_target_schemas=shared_target_schemas,
+                    _stats=stats,
+                ):
+                    logger.debug(
+                        f"Schema file {pretty_path(schema_file)} is up to date. Skipping."
+                    )
+                    continue
+                elif manifest.is_partial(config_file, configs_dir=configs_dir):
+                    logger.info(
+                        f"Unable to properly create the schema for {pretty_config_file_name} last time. Trying again."
+                    )
+                else:
+                    logger.info(
+                        f"Config file {pretty_config_file_name} (or one of its defaults) was "
+                        f"modified, regenerating the schema."
+                    )
+                config_files_to_process.append(config_file)
+
+        config_file_to_schema_file: dict[Path, Path] = {}
+        num_written = 0
+        run_profile = profiling.get_run_profile()
+        try:
+            for result in _create_schemas_for_config_files(
+                config_files_to_process,
+                configs_dir=configs_dir,
+                repo_root=repo_root,
+                stop_on_error=stop_on_error,
+                quiet=quiet,
+                jobs=jobs,
+                # When regenerating the schemas, don't reuse the target schemas from previous runs.
+                disk_cache=TargetSchemaDiskCache(read=not regen_schemas),
+                shared_target_schemas=shared_target_schemas,
+                config_store=config_store,
+            ):
+                with profiling.recording(result.profile), profiling.phase("write"):
+                    schema_file, written = _write_schema(
+                        result,
+                        configs_dir=configs_dir,
+                        schemas_dir=schemas_dir,
+                        manifest=manifest,
+                        shared_target_schemas=shared_target_schemas,
+                    )
+                if run_profile is not None and result.profile is not None:
+                    run_profile.add(result.profile)
+                config_file_to_schema_file[result.config_file] = schema_file
+                num_written += written
+        finally:
+            manifest.save()
+        _remove_unreferenced_target_schemas(schemas_dir, manifest)
+        logger.info(
+            f"{num_written} schemas written, "
+            f"{len(config_file_to_schema_file) - num_written} unchanged."
+        )
+
+        # Option 1: Add a vscode setting that associates the schema file with the yaml files. (less intrusive perhaps).
+        # Option 2: Add a header to the yaml files that points to the schema file.
+
+        # If add_headers is None, try option 1, then fallback to option 2.
+        # If add_headers is False, only use option 1
+        # If add_headers is True, only use option 2
+
+        with profiling.phase("associate"):
+            if not add_headers:
+                _try_to_install_yaml_vscode_extension(background=True)
+
+                try:
+                    _add_schemas_to_vscode_settings(
+                        config_file_to_schema_file,
+                        repo_root=repo_root,
+                        associations=(
+                            _get_schema_associations(
+                                manifest,
+                                configs_dir=configs_dir,
+                                schemas_dir=schemas_dir,
+                                repo_root=repo_root,
+                            )
+                            if vscode_associations == "globs"
+                            else None
+                        ),
+                        schemas_dir=schemas_dir,
+                    )
+                except Exception as exc:
+                    logger.error(
+                        f"Unable to write schemas in the vscode settings file. "
+                        f"Falling back to adding a header to config files. (exc={exc})"
+                    )
+                    if add_headers is not None:
+                        # Unable to do it. Don't try to add headers, just return.
+                        return
+                else:
+                    # Success. Return.
+                    return
+
+            logger.debug("Adding headers to config files to point to the schemas to use.")
+            for config_file, schema_file in config_file_to_schema_file.items():
+                _add_schema_header(config_file, schema_path=schema_file)
+
+
+def get_schema_for_config_file(
+    config_file: Path,
+    configs_dir: Path,
+    repo_root: Path,
+    shared_target_schemas: bool = False,
+) -> _SchemaResult:
+    """Creates the schema of a single config file, without writing anything.
+
+    Only the config file and the configs in its defaults are loaded (the configs directory isn't
+    scanned), and the schemas of the targets are reused from the persistent cache when possible.
+
+    The returned schema is partial (and the error is set) if the schema couldn't be created.
+    """
+    with (
+        _target_schema_cache_scope(disk_cache=TargetSchemaDiskCache()),
+        _config_loader_scope(),
+    ):
+        result = _create_schema_for_config_file(
+            config_file,
+            configs_dir=configs_dir,
+            repo_root=repo_root,
+            stop_on_error=False,
+            shared_target_schemas=shared_target_schemas,
+        )
+    return result
+
+
+@dataclasses.dataclass
+class _SchemaResult:
+    """The schema created for a config file, as sent back from a worker."""
+
+    config_file: Path
+    schema: Schema | ObjectSchema
+    error: str | None = None
+    """Error message if the schema couldn't be created properly and `schema` is a partial schema."""
+
+    targets: list[str] = dataclasses.field(default_factory=list)
+    """The `_target_`s used in the config."""
+
+    target_schemas: dict[str, ObjectSchema | Schema] = dataclasses.field(
+        default_factory=dict
+    )
+    """Schemas of the targets that `schema` refers to with `$ref`, keyed by their path relative to
+    the schemas directory (see `_target_schema_refs_scope`)."""
+
+    profile: profiling.ConfigProfile | None = None
+    """Timings of the creation of the schema, if a profile is being recorded."""
+
+    dependencies: list[Path] | None = None
+    """The config files in the defaults of the config (recursively), if known."""
+
+    fingerprints: dict[Path, FileFingerprint] = dataclasses.field(default_factory=dict)
+    """Fingerprints of the config file and of its dependencies, taken before they were loaded.
+
+    Changes made to these files while the schema is being created are then seen in the next run.
+    """
+
+
+def _write_schema(
+    result: _SchemaResult,
+    configs_dir: Path,
+    schemas_dir: Path,
+    manifest: Manifest,
+    shared_target_schemas: bool = False,
+) -> tuple[Path, bool]:
+    """Writes the schema to its file in the schemas directory and records it in the manifest.
+
+    The file is left untouched if it already has the same contents (so that editors don't reload
+    it for nothing).
+
+    Returns:
+        The schema file, and whether it was written.
+    """
+    config_file = result.config_file
+    schema_file = get_schema_file_path(config_file, schemas_dir)
+    schema_file.parent.mkdir(exist_ok=True, parents=True)
+    if result.error is None:
+        schema_text = json.dumps(result.schema, indent=2).rstrip() + "\n\n"
+    else:
+        schema_text = json.dumps(result.schema, indent=2) + "\n"
+    written = write_text_if_changed(schema_file, schema_text)
+    target_schemas: dict[str, FileFingerprint] = {}
+    for target_schema_path, target_schema in result.target_schemas.items():
+        target_schema_file = schemas_dir / target_schema_path
+        target_schema_file.parent.mkdir(exist_ok=True, parents=True)
+        target_schema_text = json.dumps(target_schema, indent=2) + "\n"
+        write_text_if_changed(target_schema_file, target_schema_text)
+        target_schemas[target_schema_path] = FileFingerprint.of_text(
+            target_schema_file, target_schema_text
+        )
+    manifest.update(
+        config_file,
+        configs_dir=configs_dir,
+        dependencies=(
+            result.dependencies
+            if result.dependencies is not None
+            else get_config_dependencies(config_file, configs_dir, recursive=True)
+        ),
+        targets=result.targets,
+        status="complete" if result.error is None else "partial",
+        schema=FileFingerprint.of_text(schema_file, schema_text),
+        target_schemas=target_schemas,
+        fingerprints=result.fingerprints,
+        shared_target_schemas=shared_target_schemas,
+    )
+    return schema_file, written
+
+
+def _remove_unreferenced_target_schemas(schemas_dir: Path, manifest: Manifest) -> None:
+    """Removes the shared target schema files that no schema refers to anymore."""
+    referenced = manifest.get_referenced_target_schemas()
+    for target_schema_file in (schemas_dir / TARGET_SCHEMAS_DIR).glob("*.json"):
+        if target_schema_file.relative_to(schemas_dir).as_posix() not in referenced:
+            logger.debug(
+                f"Removing unused target schema {pretty_path(target_schema_file)}"
+            )
+            target_schema_file.unlink(missing_ok=True)
+
+
+def _sort_definitions(schema: Any) -> Any:
+    """Returns the schema with the entries of its `$defs` (and `definitions`) sorted by name.
+
+    Only the definitions at the root of the schema are sorted: the keys of nested dicts can be
+    anything (for example a property named "definitions"). The order of the other keys is kept,
+    since it is meaningful (e.g. the order of properties).
+    """
+    if not isinstance(schema, dict):
+        return schema
+    return {
+        k: (
+            {name: v[name] for name in sorted(v)}
+            if k in ("$defs", "definitions") and isinstance(v, dict)
+            else v
+        )
+        for k, v in schema.items()
+    }
+
+
+def _create_schemas_for_config_files(
+    config_files: list[Path],
+    configs_dir: Path,
+    repo_root: Path,
+    stop_on_error: bool,
+    quiet: bool,
+    jobs: int | Literal["auto"] = 1,
+    disk_cache: TargetSchemaDiskCache | None = None,
+    is_cancelled: Callable[[Path], bool] | None = None,
+    shared_target_schemas: bool = False,
+    config_store: ConfigStore | None = None,
+) -> Iterator[_SchemaResult]:
+    """Creates the schemas for the given config files, possibly in parallel.
+
+    The results are yielded in the order in which they are completed.
+
+    Parameters:
+        config_store: The ConfigStore to use instead of `ConfigStore.instance()`.
+        shared_target_schemas: Whether the schemas refer to the schemas of the nested targets
+            with `$ref` instead of embedding them (see `_target_schema_refs_scope`).
+        is_cancelled: Function called with a config file before its schema is created. The config
+            files for which it returns True are skipped (nothing is yielded for them).
+    """
+    num_workers = min(_get_num_workers(jobs), len(config_files))
+
     with warnings.catch_warnings():
         warnings.filterwarnings("ignore", category=tqdm.TqdmExperimentalWarning)
         pbar = tqdm_rich(
-            config_files,
-            desc="Creating schemas for Hydra config files...",
             total=len(config_files),
+            desc="Creating schemas for Hydra config files...",
             leave=False,
             disable=quiet,
         )
 
-    for config_file in pbar:
-        pretty_config_file_name = config_file.relative_to(configs_dir)
-        schema_file = get_schema_file_path(config_file, schemas_dir)
-
-        # Check the modification time. If the config file was modified after the schema file,
-        # regen the schema file.
-
-        if schema_file.exists():
-            schema_file_modified_time = datetime.datetime.fromtimestamp(
-                schema_file.stat().st_mtime
-            )
-            config_file_modified_time = datetime.datetime.fromtimestamp(
-                config_file.stat().st_mtime
-            )
-            # Add a delay to account for the time it takes to modify the the config file at the end
-            # to remove a header.
-            if (
-                config_file_modified_time - schema_file_modified_time
-            ) > datetime.timedelta(seconds=10):
-                logger.info(
-                    f"Config file {pretty_config_file_name} was modified, regenerating the schema."
-                )
-            elif regen_schemas:
-                pass  # regenerate it.
-            elif sys.platform == "linux" and _is_incomplete_schema(schema_file):
-                logger.info(
-                    f"Unable to properly create the schema for {pretty_config_file_name} last time. Trying again."
-                )
-            else:
-                logger.debug(
-                    f"Schema file {pretty_path(schema_file)} was already successfully created. Skipping."
-                )
-                continue
-
-        pbar.set_postfix_str(f"Creating schema for {pretty_config_file_name}")
-
-        # We'll modify the config store so that we treat structured configs as if they
-        # had a _target_ corresponding to the structured class.
-        # This helps us create the schemas.
-        # We later reset this to not affect the config loading in the Hydra application.
-        from hydra.core.singleton import Singleton  # noqa
+    create_schema: Callable[..., _SchemaResult] = _create_schema_for_config_file
+    if (run_profile := profiling.get_run_profile()) is not None:
+        create_schema = functools.partial(
+            _profile_schema_creation, cprofile=run_profile.cprofile
+        )
 
-        state_backup = Singleton.get_state()
+    with pbar:
+        if num_workers <= 1:
+            with (
+                _config_store_scope(config_store),
+                _target_schema_cache_scope(disk_cache=disk_cache),
+                _config_loader_scope(),
+            ):
+                for config_file in config_files:
+                    if is_cancelled is not None and is_cancelled(config_file):
+                        pbar.update(1)
+                        continue
+                    pbar.set_postfix_str(
+                        f"Creating schema for {config_file.relative_to(configs_dir)}"
+                    )
+                    yield create_schema(
+                        config_file,
+                        configs_dir=configs_dir,
+                        repo_root=repo_root,
+                        stop_on_error=stop_on_error,
+                        shared_target_schemas=shared_target_schemas,
+                    )
+                    pbar.update(1)
+            return
 
+        logger.debug(f"Creating schemas with a pool of {num_workers} worker processes.")
+        # Each worker gets its own copy of the Hydra global state (ConfigStore, plugins, etc).
+        executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=num_workers,
+            initializer=_init_worker,
+            initargs=(_get_hydra_state(config_store), logger.level, disk_cache),
+        )
         try:
-            logger.debug(f"Creating a schema for {pretty_config_file_name}")
-
-            with warnings.catch_warnings():
-                warnings.filterwarnings("ignore", category=UserWarning)
-                # TODO: Can we somehow get that the ConfigStore entries should
-                # be used as targets?
-                #     Singleton._instances.pop(ConfigStore)
-                # else:
-                # Maybe using the _convert_ param of Hydra?
-                config = load_config(
+            futures = {
+                executor.submit(
+                    create_schema,
                     config_file,
                     configs_dir=configs_dir,
                     repo_root=repo_root,
-                    config_store=config_store,
+                    stop_on_error=stop_on_error,
+                    shared_target_schemas=shared_target_schemas,
+                ): config_file
+                for config_file in config_files
+            }
+            for future in concurrent.futures.as_completed(futures):
+                if is_cancelled is not None:
+                    for other_future, config_file in futures.items():
+                        if not other_future.done() and is_cancelled(config_file):
+                            other_future.cancel()
+                if future.cancelled():
+                    pbar.update(1)
+                    continue
+                result = future.result()
+                pbar.set_postfix_str(
+                    f"Created schema for {result.config_file.relative_to(configs_dir)}"
                 )
-            schema = _create_schema_for_config(
-                config,
-                config_file=config_file,
-                configs_dir=configs_dir,
-                repo_root=repo_root,
-                config_store=config_store,
-            )
-            schema_file.parent.mkdir(exist_ok=True, parents=True)
-            schema_file.write_text(json.dumps(schema, indent=2).rstrip() + "\n\n")
-            if sys.platform == "linux":
-                _set_is_incomplete_schema(schema_file, False)
-        except (
-            pydantic.errors.PydanticSchemaGenerationError,
-            hydra.errors.MissingConfigException,
-            hydra.errors.ConfigCompositionException,
-            omegaconf.errors.InterpolationResolutionError,
-            Exception,  # todo: remove this to harden the code.
-        ) as exc:
-            logger.warning(
-                RuntimeWarning(
-                    f"Unable to create a schema for config {pretty_config_file_name}: {exc}"
-                )
-            )
-            if stop_on_error:
-                raise
-
-            schema = copy.deepcopy(HYDRA_CONFIG_SCHEMA)
-            schema["additionalProperties"] = True
-            schema["title"] = f"Partial schema for {pretty_config_file_name}"
-            schema[
-                "description"
-            ] = f"(errors occurred while trying to create the schema from the signature:\n{exc}"
-            schemas_dir.mkdir(exist_ok=True, parents=True)
-            schema_file.write_text(json.dumps(schema, indent=2) + "\n")
-            if sys.platform == "linux":
-                _set_is_incomplete_schema(schema_file, True)
+                pbar.update(1)
+                yield result
         finally:
-            # Reset the config store / search path / etc to what they were before.
-            Singleton.set_state(state_backup)
+            executor.shutdown(wait=True, cancel_futures=True)
 
-        config_file_to_schema_file[config_file] = schema_file
 
-    # Option 1: Add a vscode setting that associates the schema file with the yaml files. (less intrusive perhaps).
-    # Option 2: Add a header to the yaml files that points to the schema file.
+def _get_hydra_state(config_store: ConfigStore | None = None) -> Any:
+    """Returns a copy of the Hydra global state, with the given ConfigStore (if any)."""
+    from hydra.core.singleton import Singleton  # noqa
 
-    # If add_headers is None, try option 1, then fallback to option 2.
-    # If add_headers is False, only use option 1
-    # If add_headers is True, only use option 2
+    state = Singleton.get_state()
+    if config_store is not None and config_store is not ConfigStore.instance():
+        state["instances"][ConfigStore] = copy.deepcopy(config_store)
+    return state
 
-    if not add_headers:
-        _try_to_install_yaml_vscode_extension()
 
-        try:
-            _add_schemas_to_vscode_settings(
-                config_file_to_schema_file, repo_root=repo_root
+@contextlib.contextmanager
+def _config_store_scope(config_store: ConfigStore | None):
+    """Uses a copy of the given ConfigStore as the ConfigStore of Hydra within this block."""
+    if config_store is None or config_store is ConfigStore.instance():
+        yield
+        return
+    from hydra.core.singleton import Singleton  # noqa
+
+    state_backup = Singleton.get_state()
+    Singleton.set_state(_get_hydra_state(config_store))
+    try:
+        yield
+    finally:
+        Singleton.set_state(state_backup)
+
+
+def _get_num_workers(jobs: int | Literal["auto"]) -> int:
+    if jobs == "auto":
+        return get_available_cpus()
+    if not isinstance(jobs, int) or jobs < 1:
+        raise ValueError(f"`jobs` should be a positive integer or 'auto', got {jobs!r}")
+    return jobs
+
+
+def _init_worker(
+    singleton_state: Any, log_level: int, disk_cache: TargetSchemaDiskCache | None
+) -> None:
+    """Initializes a worker process with a copy of the Hydra global state of the parent."""
+    from hydra.core.singleton import Singleton  # noqa
+
+    global _target_schema_cache, _target_schema_disk_cache, _customizations_fingerprint
+    global _config_loaders
+    Singleton.set_state(singleton_state)
+    logger.setLevel(log_level)
+    # The worker only lives for the duration of the run, so it can reuse the target schemas and
+    # the loaded configs.
+    _target_schema_cache = {}
+    _target_schema_disk_cache = disk_cache
+    _customizations_fingerprint = _get_registries_fingerprint()
+    _config_loaders = {}
+
+
+def _profile_schema_creation(
+    config_file: Path, cprofile: bool = False, **kwargs
+) -> _SchemaResult:
+    """Creates the schema of the config file, and records the time spent in each phase."""
+    config_profile = profiling.ConfigProfile(config_file)
+    with profiling.recording(config_profile, cprofile=cprofile):
+        result = _create_schema_for_config_file(config_file, **kwargs)
+    result.profile = config_profile
+    return result
+
+
+def _create_schema_for_config_file(
+    config_file: Path,
+    configs_dir: Path,
+    repo_root: Path,
+    stop_on_error: bool,
+    shared_target_schemas: bool = False,
+) -> _SchemaResult:
+    """Loads the given config file and creates its schema.
+
+    If an error occurs and `stop_on_error` is False, a partial schema is returned instead.
+    """
+    pretty_config_file_name = config_file.relative_to(configs_dir)
+
+    # We'll modify the config store so that we treat structured configs as if they
+    # had a _target_ corresponding to the structured class.
+    # This helps us create the schemas.
+    # We later reset this to not affect the config loading in the Hydra application.
+    from hydra.core.singleton import Singleton  # noqa
+
+    state_backup = Singleton.get_state()
+    # NOTE: Resetting the state below replaces the `ConfigStore` instance with a copy, so we can't
+    # hold on to a reference to it across config files: the one used by Hydra's config loader is
+    # always the current `ConfigStore.instance()`.
+    config_store = ConfigStore.instance()
+    dependencies: list[Path] | None = None
+    fingerprints: dict[Path, FileFingerprint] = {}
+
+    try:
+        logger.debug(f"Creating a schema for {pretty_config_file_name}")
+
+        with profiling.phase("manifest"):
+            # NOTE: The files are fingerprinted before they are loaded, so that changes made while
+            # the schema is being created aren't recorded as being part of it.
+            dependencies = get_config_dependencies(config_file, configs_dir, recursive=True)
+            for file in [config_file, *dependencies]:
+                with contextlib.suppress(OSError):
+                    fingerprints[file] = FileFingerprint.of(file)
+
+        with warnings.catch_warnings(), profiling.phase("load_config"):
+            warnings.filterwarnings("ignore", category=UserWarning)
+            # TODO: Can we somehow get that the ConfigStore entries should
+            # be used as targets?
+            #     Singleton._instances.pop(ConfigStore)
+            # else:
+            # Maybe using the _convert_ param of Hydra?
+            config = load_config(
+                config_file,
+                configs_dir=configs_dir,
+                repo_root=repo_root,
+                config_store=config_store,
             )
-        except Exception as exc:
-            logger.error(
-                f"Unable to write schemas in the vscode settings file. "
-                f"Falling back to adding a header to config files. (exc={exc})"
+        with _target_schema_refs_scope(enabled=shared_target_schemas) as target_schemas:
+            schema = _create_schema_for_config(
+                config,
+                config_file=config_file,
+                configs_dir=configs_dir,
+                repo_root=repo_root,
+                config_store=config_store,
             )
-            if add_headers is not None:
-                # Unable to do it. Don't try to add headers, just return.
-                return
-        else:
-            # Success. Return.
-            return
-
-    logger.debug("Adding headers to config files to point to the schemas to use.")
-    for config_file, schema_file in config_file_to_schema_file.items():
-        _add_schema_header(config_file, schema_path=schema_file)
+        # The definitions are sorted by name, so the same schema always gives the same file,
+        # regardless of the order in which the targets were processed.
+        return _SchemaResult(
+            config_file=config_file,
+            schema=_sort_definitions(schema),
+            targets=_get_targets(config),
+            target_schemas={
+                path: _sort_definitions(target_schema)
+                for path, target_schema in target_schemas.items()
+            },
+            dependencies=dependencies,
+            fingerprints=fingerprints,
+        )
+    except (
+        pydantic.errors.PydanticSchemaGenerationError,
+        hydra.errors.MissingConfigException,
+        hydra.errors.ConfigCompositionException,
+        omegaconf.errors.InterpolationResolutionError,
+        Exception,  # todo: remove this to harden the code.
+    ) as exc:
+        logger.warning(
+            RuntimeWarning(
+                f"Unable to create a schema for config {pretty_config_file_name}: {exc}"
+            )
+        )
+        if stop_on_error:
+            raise
+
+        schema = new_hydra_config_schema()
+        schema["additionalProperties"] = True
+        schema["title"] = f"Partial schema for {pretty_config_file_name}"
+        schema[
+            "description"
+        ] = f"(errors occurred while trying to create the schema from the signature:\n{exc}"
+        return _SchemaResult(
+            config_file=config_file,
+            schema=schema,
+            error=str(exc),
+            dependencies=dependencies,
+            fingerprints=fingerprints,
+        )
+    finally:
+        # Reset the config store / search path / etc to what they were before.
+        Singleton.set_state(state_backup)
 
 
 def _get_gitignore_path(repo_root: Path) -> Path:
@@ -289,108 +734,248 @@ def _add_schemas_dir_to_gitignore(schemas_dir: Path, repo_root: Path):
             f.write(f"{_rel}\n")
 
 
-_incomplete_schema_xattr = "user.schema_error"
+def _relative_to_cwd(p: str | Path):
+    return Path(p).relative_to(Path.cwd())
 
 
-def _is_incomplete_schema(schema_file: Path) -> bool:
-    try:
-        return os.getxattr(schema_file, _incomplete_schema_xattr) == bytes(1)
-    except OSError:
-        return False
+_YAML_VSCODE_EXTENSION = "redhat.vscode-yaml"
 
+_YAML_VSCODE_EXTENSION_MARKER_TTL = 7 * 24 * 60 * 60
+"""Seconds during which the marker file saying that the yaml extension is installed is trusted."""
 
-def _set_is_incomplete_schema(schema_file: Path, val: bool):
-    os.setxattr(schema_file, _incomplete_schema_xattr, bytes(val))
+_yaml_vscode_extension_installed: bool = False
+"""Whether the yaml extension was found (or installed) during this run."""
 
+_yaml_vscode_extension_install_thread: threading.Thread | None = None
 
-def _relative_to_cwd(p: str | Path):
-    return Path(p).relative_to(Path.cwd())
 
+def _try_to_install_yaml_vscode_extension(background: bool = False) -> bool:
+    """Makes sure that the yaml extension for vscode is installed.
+
+    Running `code --install-extension` takes a few seconds, so it is only done when the extension
+    isn't found in the vscode extension directories, and when there isn't a recent marker file in
+    the cache directory saying that it was installed.
+
+    Parameters:
+        background: Whether to install the extension in a background thread, instead of waiting for
+            the installation to finish.
 
-def _try_to_install_yaml_vscode_extension() -> bool:
+    Returns:
+        Whether the extension is installed (or is being installed, if `background` is True).
+    """
+    global _yaml_vscode_extension_installed, _yaml_vscode_extension_install_thread
+    if _yaml_vscode_extension_installed:
+        return True
+    if not shutil.which("code"):
+        logger.debug(
+            "The `code` command isn't available, not installing the yaml extension."
+        )
+        return False
+    if _is_yaml_vscode_extension_installed():
+        _yaml_vscode_extension_installed = True
+        return True
+    if not background:
+        return _install_yaml_vscode_extension()
+    if (
+        _yaml_vscode_extension_install_thread is None
+        or not _yaml_vscode_extension_install_thread.is_alive()
+    ):
+        # NOTE: A daemon thread, so that the app or CLI doesn't wait for the installation before
+        # exiting. The `code` process keeps running, and once the extension is installed, it is
+        # found in the vscode extension directories next time, even without the marker file.
+        _yaml_vscode_extension_install_thread = threading.Thread(
+            target=_install_yaml_vscode_extension,
+            name="hydra-auto-schema-vscode-extension",
+            daemon=True,
+        )
+        _yaml_vscode_extension_install_thread.start()
+    return True
+
+
+def _install_yaml_vscode_extension() -> bool:
+    global _yaml_vscode_extension_installed
     logger.debug(
-        "Running `code --install-extension redhat.vscode-yaml` to install the yaml extension for vscode."
+        f"Running `code --install-extension {_YAML_VSCODE_EXTENSION}` to install the yaml extension for vscode."
     )
     exitcode, output = subprocess.getstatusoutput(
-        "code --install-extension redhat.vscode-yaml"
+        f"code --install-extension {_YAML_VSCODE_EXTENSION}"
     )
-
     logger.debug(output)
-    return exitcode == 0
+    if exitcode != 0:
+        return False
+    _yaml_vscode_extension_installed = True
+    marker_file = _get_yaml_vscode_extension_marker_file()
+    try:
+        marker_file.parent.mkdir(exist_ok=True, parents=True)
+        marker_file.touch()
+    except OSError as exc:
+        logger.debug(f"Unable to create the marker file {marker_file}: {exc}")
+    return True
+
+
+def _is_yaml_vscode_extension_installed() -> bool:
+    """Checks if the yaml extension is installed, without running `code`."""
+    marker_file = _get_yaml_vscode_extension_marker_file()
+    with contextlib.suppress(OSError):
+        if (
+            time.time() - marker_file.stat().st_mtime
+            < _YAML_VSCODE_EXTENSION_MARKER_TTL
+        ):
+            return True
+    for extensions_dir in _get_vscode_extensions_dirs():
+        with contextlib.suppress(OSError):
+            if any(
+                p.name.lower().startswith(f"{_YAML_VSCODE_EXTENSION}-")
+                for p in extensions_dir.iterdir()
+            ):
+                return True
+    return False
 
 
-def _read_json(file: Path) -> dict:
-    file_contents = file.read_text()
-    if not file_contents:
-        return {}
-    # Remove any trailing commas from the content:
-    file_contents = (
-        # Remove any trailing "," that would make it invalid JSON.
-        "".join(file_contents.split()).replace(",}", "}").replace(",]", "]")
-    )
-    return json.loads(file_contents)
+def _get_vscode_extensions_dirs() -> list[Path]:
+    if extensions_dir := os.environ.get("VSCODE_EXTENSIONS"):
+        return [Path(extensions_dir)]
+    home = Path.home()
+    return [
+        home / ".vscode" / "extensions",
+        home / ".vscode-insiders" / "extensions",
+        home / ".vscode-server" / "extensions",
+        home / ".vscode-oss" / "extensions",
+    ]
+
+
+def _get_yaml_vscode_extension_marker_file() -> Path:
+    return get_default_cache_dir() / "vscode-yaml-extension-installed"
+
+
+_SCHEMA_HEADER = "# yaml-language-server: $schema="
 
 
 def _add_schemas_to_vscode_settings(
     config_file_to_schema_file: dict[Path, Path],
     repo_root: Path,
+    vscode_settings: VscodeSettingsFile | None = None,
+    associations: dict[Path, list[str]] | None = None,
+    schemas_dir: Path | None = None,
 ) -> None:
-    # Make the vscode settings file if necessary:
-    vscode_dir = repo_root / ".vscode"
-    vscode_dir.mkdir(exist_ok=True, parents=False)
-    vscode_settings_file = vscode_dir / "settings.json"
-    vscode_settings_file.touch(exist_ok=True)
-
-    # TODO: Use Jsonc to load the file and preserve comments?
-    logger.debug(f"Reading the VsCode settings file at {vscode_settings_file}.")
-    vscode_settings: dict[str, Any] = _read_json(vscode_settings_file)
-
-    # logger.debug(f"Vscode settings: {vscode_settings}")
-    # Avoid the popup and do users a favour by disabling telemetry.
-    vscode_settings.setdefault("redhat.telemetry.enabled", False)
-
-    # TODO: Should probably overwrite the schemas entry if we're passed the --regen-schemas flag,
-    # since otherwise we might accumulate schemas for configs that aren't there anymore.
-    yaml_schemas_setting: dict[str, str | list[str]] = vscode_settings.setdefault(
-        "yaml.schemas", {}
-    )
+    """Associates the schema files with their config files in the vscode settings.
+
+    Parameters:
+        config_file_to_schema_file: The schema file to use for each config file.
+        repo_root: The root of the repository, where the `.vscode` directory is.
+        vscode_settings: The settings file to update. Passing the same object in successive calls
+            avoids reading and parsing the file each time.
+        associations: If passed, replaces all the associations of the schemas in `schemas_dir`
+            with these ones (see `_get_schema_associations`), instead of adding the absolute path
+            of each config file in `config_file_to_schema_file`.
+        schemas_dir: The schemas directory. Required when passing `associations`.
+    """
+    if vscode_settings is None:
+        vscode_settings = VscodeSettingsFile.for_repo(repo_root)
+
+    if associations is not None:
+        assert schemas_dir is not None
+        vscode_settings.set_schema_associations(associations, schemas_dir=schemas_dir)
+    else:
+        # TODO: Should probably overwrite the schemas entry if we're passed the --regen-schemas
+        # flag, since otherwise we might accumulate schemas for configs that aren't there anymore.
+        vscode_settings.add_schemas(config_file_to_schema_file)
+    if vscode_settings.flush():
+        logger.debug(
+            f"Updated the yaml schemas in the vscode settings file at {vscode_settings.path}."
+        )
 
-    # Write all the schemas
-    for config_file, schema_file in config_file_to_schema_file.items():
-        assert schema_file.exists()
+    # If this worked, then remove any schema directives from the config files.
+    _remove_schema_headers(config_file_to_schema_file)
 
-        _root = vscode_settings_file.parent.parent
-        schema_key = str(schema_file.relative_to(_root))
-        path_to_add = str(config_file.absolute())
 
-        if schema_key not in yaml_schemas_setting:
-            yaml_schemas_setting[schema_key] = path_to_add
-        elif isinstance(
-            files_associated_with_schema := yaml_schemas_setting[schema_key], str
-        ):
-            files = sorted(set([files_associated_with_schema, path_to_add]))
-            yaml_schemas_setting[schema_key] = files[0] if len(files) == 1 else files
+def _get_schema_associations(
+    manifest: Manifest, configs_dir: Path, schemas_dir: Path, repo_root: Path
+) -> dict[Path, list[str]]:
+    """Returns the paths or glob patterns to associate with each schema file in vscode.
+
+    When all the config files of a config group (with the same extension) have identical schemas,
+    they are associated with one of these schemas using a glob (e.g. `configs/optimizer/*.yaml`).
+    Config files with identical schemas also share a single entry. The other config files are
+    listed individually, relative to the repo root.
+    """
+    config_file_to_sha: dict[Path, str] = {}
+    for config, entry in manifest.entries.items():
+        config_file = configs_dir / config
+        schema_file = get_schema_file_path(config_file, schemas_dir)
+        config_file_to_sha[config_file] = _get_schema_contents_hash(
+            schema_file, entry.schema.sha256
+        )
+
+    def _pattern(path: Path) -> str:
+        return (
+            path.relative_to(repo_root).as_posix()
+            if path.is_relative_to(repo_root)
+            else path.as_posix()
+        )
+
+    groups: dict[tuple[Path, str], list[Path]] = {}
+    for config_file in config_file_to_sha:
+        groups.setdefault((config_file.parent, config_file.suffix), []).append(
+            config_file
+        )
+
+    sha_to_patterns: dict[str, list[str]] = {}
+    sha_to_schema_file: dict[str, Path] = {}
+    for (group_dir, suffix), config_files in sorted(groups.items()):
+        shas = {config_file_to_sha[config_file] for config_file in config_files}
+        # A glob is only valid if it doesn't match other files.
+        if len(shas) == 1 and set(config_files) == set(group_dir.glob(f"*{suffix}")):
+            patterns = [(shas.pop(), _pattern(group_dir / f"*{suffix}"))]
         else:
-            files = sorted(set(files_associated_with_schema + [path_to_add]))
-            yaml_schemas_setting[schema_key] = files[0] if len(files) == 1 else files
+            patterns = [
+                (config_file_to_sha[config_file], _pattern(config_file))
+                for config_file in config_files
+            ]
+        for sha, pattern in patterns:
+            sha_to_patterns.setdefault(sha, []).append(pattern)
+        for config_file in config_files:
+            schema_file = get_schema_file_path(config_file, schemas_dir)
+            sha = config_file_to_sha[config_file]
+            sha_to_schema_file[sha] = min(
+                sha_to_schema_file.get(sha, schema_file), schema_file
+            )
+    return {
+        sha_to_schema_file[sha]: sorted(patterns)
+        for sha, patterns in sha_to_patterns.items()
+    }
 
-    vscode_settings_file.write_text(json.dumps(vscode_settings, indent=2))
-    logger.debug(
-        f"Updated the yaml schemas in the vscode settings file at {vscode_settings_file}."
-    )
 
-    # If this worked, then remove any schema directives from the config files.
-    for config_file, schema_file in config_file_to_schema_file.items():
-        assert schema_file.exists()
-        config_lines = config_file.read_text().splitlines()
-        lines_to_remove: list[int] = []
-        for i, line in enumerate(config_lines):
-            if line.strip().startswith("# yaml-language-server: $schema="):
-                lines_to_remove.append(i)
-        for line_to_remove in reversed(lines_to_remove):
-            config_lines.pop(line_to_remove)
-        config_file.write_text(
-            "\n".join(config_lines).rstrip() + ("\n" if config_lines else "")
+@functools.lru_cache(maxsize=4096)
+def _get_schema_contents_hash(schema_file: Path, sha256: str) -> str:
+    """Returns a hash of the schema, ignoring its title (which contains the config file name).
+
+    The `sha256` of the schema file (from the manifest) is part of the cache key, so that the
+    file is only read again when it changes.
+    """
+    try:
+        schema = json.loads(schema_file.read_text())
+    except (OSError, ValueError):
+        return sha256
+    if isinstance(schema, dict):
+        schema.pop("title", None)
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode()).hexdigest()
+
+
+def _remove_schema_headers(config_files: Iterable[Path]) -> None:
+    """Removes the schema headers from the config files that have one."""
+    for config_file in config_files:
+        config_text = config_file.read_text()
+        if _SCHEMA_HEADER not in config_text:
+            continue
+        config_lines = [
+            line
+            for line in config_text.splitlines()
+            if not line.strip().startswith(_SCHEMA_HEADER)
+        ]
+        atomic_write_text(
+            config_file,
+            "\n".join(config_lines).rstrip() + ("\n" if config_lines else ""),
         )
 
 
@@ -400,6 +985,19 @@ def get_schema_file_path(config_file: Path, schemas_dir: Path):
     return schema_file
 
 
+def _get_targets(config: dict | DictConfig) -> list[str]:
+    """Returns the (sorted) `_target_`s used in the config."""
+    _config_dict = (
+        OmegaConf.to_container(config, resolve=False)
+        if isinstance(config, DictConfig)
+        else config
+    )
+    assert isinstance(_config_dict, dict)
+    return sorted(
+        {str(entry["_target_"]) for entry in _all_subentries_with_target(_config_dict).values()}
+    )
+
+
 def _all_subentries_with_target(config: dict) -> dict[tuple[str, ...], dict]:
     """Iterator that yields all the nested config entries that have a _target_."""
     entries = {}
@@ -429,7 +1027,7 @@ def _create_schema_for_config(
     """
 
     # Start from the base schema for any Hydra configs.
-    schema = copy.deepcopy(HYDRA_CONFIG_SCHEMA)
+    schema = new_hydra_config_schema()
 
     pretty_path = config_file.relative_to(configs_dir) if configs_dir else config_file
     schema["title"] = f"Auto-generated schema for {pretty_path}"
@@ -446,12 +1044,19 @@ def _create_schema_for_config(
         else config
     )
     assert isinstance(_config_dict, dict)
-    for keys, value in _all_subentries_with_target(_config_dict).items():
+    entries_with_target = _all_subentries_with_target(_config_dict)
+    for keys, value in entries_with_target.items():
         is_top_level: bool = not keys
 
         # logger.debug(f"Handling key {'.'.join(keys)} in config at path {config_file}")
 
         nested_value_schema = _get_schema_from_target(value)
+        if (
+            not is_top_level
+            and _target_schema_refs is not None
+            and _can_refer_to_target_schema(keys, entries_with_target, schema)
+        ):
+            nested_value_schema = _get_target_schema_ref(value, nested_value_schema)
 
         if "$defs" in nested_value_schema:
             # note: can't have a $defs key in the schema.
@@ -461,12 +1066,13 @@ def _create_schema_for_config(
             assert "properties" in nested_value_schema
 
         if is_top_level:
-            schema = merge_dicts(
-                schema,
-                nested_value_schema,
-                conflict_handler=_overwrite,
-                conflict_handlers=schema_conflict_handlers,
-            )
+            with profiling.phase("merge_dicts"):
+                schema = merge_dicts(
+                    schema,
+                    nested_value_schema,
+                    conflict_handler=_overwrite,
+                    conflict_handlers=schema_conflict_handlers,
+                )
             continue
 
         parent_keys, last_key = keys[:-1], keys[-1]
@@ -486,12 +1092,13 @@ def _create_schema_for_config(
             assert isinstance(last_key, str)
             where_to_set["properties"][last_key] = nested_value_schema  # type: ignore
         else:
-            where_to_set["properties"] = merge_dicts(  # type: ignore
-                where_to_set["properties"],
-                {last_key: nested_value_schema},  # type: ignore
-                conflict_handler=_overwrite,
-                conflict_handlers=schema_conflict_handlers,
-            )
+            with profiling.phase("merge_dicts"):
+                where_to_set["properties"] = merge_dicts(  # type: ignore
+                    where_to_set["properties"],
+                    {last_key: nested_value_schema},  # type: ignore
+                    conflict_handler=_overwrite,
+                    conflict_handlers=schema_conflict_handlers,
+                )
 
     return schema
 
@@ -664,64 +1271,147 @@ def _keep_previous(val_a: Any, val_b: Any) -> Any:
     return val_a
 
 
-def _has_package_global_line(config_file: Path) -> int | None:
-    """Returns whether the config file contains a `@package _global_` directive of hydra.
-
-    See: https://hydra.cc/docs/advanced/overriding_packages/#overriding-the-package-via-the-package-directive
-    """
-    for line in config_file.read_text().splitlines():
-        line = line.strip()
-        if not line.startswith("#"):
-            continue
-        if line.removeprefix("#").strip().startswith("@package _global_"):
-            return True
-    return False
-
-
 # def _config_is_in_config_store(config_path: Path, config_store: ConfigStore) -> bool:
 #     return config_store._open(str(config_path)) is not None
 
 
 def _try_load_from_config_store(
-    config_path: Path, configs_dir: Path, config_store: ConfigStore
+    config_path: Path,
+    configs_dir: Path,
+    config_store: ConfigStore,
+    config_store_index: _ConfigStoreIndex | None = None,
 ) -> DictConfig | None:
     config_path = config_path.relative_to(configs_dir)
+    config_store_index = config_store_index or _get_config_store_index(config_store)
 
-    def _config_is_in_config_store(config_path: Path) -> bool:
-        return config_store._open(str(config_path)) is not None
+    for suffix in (".yml", ".yaml"):
+        if (
+            path := config_path.with_suffix(suffix).as_posix()
+        ) in config_store_index.nodes:
+            return config_store.load(path).node
 
-    if _config_is_in_config_store(with_yml := config_path.with_suffix(".yml")):
-        return config_store.load(str(with_yml)).node
+    return None
 
-    if _config_is_in_config_store(with_yaml := config_path.with_suffix(".yaml")):
-        return config_store.load(str(with_yaml)).node
 
-    return None
+@dataclasses.dataclass(frozen=True)
+class _ConfigStoreIndex:
+    """Index of the contents of the ConfigStore, so we don't need to walk it for every config."""
+
+    signature: tuple
+    """What the contents of the ConfigStore looked like when this index was created."""
+
+    nodes: frozenset[str]
+    """Paths of the configs in the ConfigStore (for example `db/mysql.yaml`)."""
+
+    targets: dict[str, str]
+    """The `_target_` to set on the structured configs that don't have one, by path."""
+
 
+_config_store_index: _ConfigStoreIndex | None = None
+"""The index of the ConfigStore, which is reused as long as its contents don't change."""
 
-# NOTE: Tried to use `functools.cache` to prevent this from loading the plugins again, doesn't work
-# import hydra._internal.utils
-# hydra._internal.utils.create_config_search_path = functools.cache(
-#     hydra._internal.utils.create_config_search_path
-# )
+_config_stores_with_targets: weakref.WeakKeyDictionary[ConfigStore, tuple] = (
+    weakref.WeakKeyDictionary()
+)
+"""The ConfigStores on which the targets were set, and the signature of the index used."""
+
+
+def _get_config_store_index(config_store: ConfigStore) -> _ConfigStoreIndex:
+    """Returns the index of the contents of the ConfigStore.
+
+    The index is only rebuilt when configs are added to (or removed from) the ConfigStore. Note
+    that a new ConfigStore with the same contents is created each time the state of Hydra is
+    restored, so the index can't be tied to a ConfigStore instance.
+    """
+    global _config_store_index
+    nodes = dict(_iter_config_store_nodes(config_store.repo))
+    # Checking the type of the nodes is cheap, and determines what target they get.
+    # NOTE: Using the names of the types, because the classes of the configs of plugins are
+    # re-created when Hydra scans the plugins again.
+    signature = tuple(
+        (path, node.package, _qualified_name(node.node._metadata.object_type))
+        for path, node in nodes.items()
+    )
+    if _config_store_index is not None and _config_store_index.signature == signature:
+        return _config_store_index
+
+    logger.debug(f"Indexing the {len(nodes)} configs in the ConfigStore.")
+    targets: dict[str, str] = {}
+    for path, node in nodes.items():
+        if "_target_" in node.node:
+            continue
+        target = node.node._metadata.object_type
+        if target is dict:
+            assert node.name == "_dummy_empty_config_.yaml"
+            continue
+        logger.debug(
+            f"Setting target for structured config node {node.name} to {target}"
+        )
+        targets[path] = _qualified_name(target)
+
+    _config_store_index = _ConfigStoreIndex(
+        signature=signature, nodes=frozenset(nodes), targets=targets
+    )
+    return _config_store_index
+
+
+def _set_config_store_targets(
+    config_store: ConfigStore, config_store_index: _ConfigStoreIndex
+) -> None:
+    """Sets the `_target_` of the structured configs in the ConfigStore that don't have one."""
+    if _config_stores_with_targets.get(config_store) == config_store_index.signature:
+        return
+    for path, target in config_store_index.targets.items():
+        node = config_store._load(path).node
+        if "_target_" in node:
+            continue
+        with omegaconf.open_dict(node):
+            node["_target_"] = target
+    _config_stores_with_targets[config_store] = config_store_index.signature
 
 
-# @functools.cache
 def _create_config_search_path(search_path_dir: str | None) -> ConfigSearchPath:
+    """Returns the config search path to use for the given configs directory (or module).
+
+    Creating the search path requires instantiating all the `SearchPathPlugin`s, so the search
+    path is only created once per (configs dir, set of search path plugins). Since the plugin set
+    is part of the key, the cached search path is invalidated when plugins are added or removed.
+
+    A copy is returned, so that modifying it doesn't affect the cached search path.
+    """
+    search_path_plugins = tuple(
+        f"{plugin.__module__}.{plugin.__qualname__}"
+        for plugin in Plugins.instance().discover(SearchPathPlugin)
+    )
+    return copy.deepcopy(
+        _build_config_search_path(search_path_dir, search_path_plugins)
+    )
+
+
+@functools.lru_cache(maxsize=16)
+def _build_config_search_path(
+    search_path_dir: str | None, search_path_plugins: tuple[str, ...]
+) -> ConfigSearchPath:
+    # NOTE: The plugin *names* are used in the cache key rather than the classes, because the
+    # plugin classes are re-created every time the state of Hydra is restored with
+    # `Singleton.set_state`.
     search_path = ConfigSearchPathImpl()
     search_path.append("hydra", "pkg://hydra.conf")
 
     if search_path_dir is not None:
         search_path.append("main", search_path_dir)
 
-    search_path_plugins = Plugins.instance().discover(SearchPathPlugin)
-    for spp in search_path_plugins:
-        # CHANGED this, to avoid the weird re-instantiation of our plugin type.
-        from hydra_plugins.auto_schema import auto_schema_plugin
+    plugin_classes = {
+        f"{plugin.__module__}.{plugin.__qualname__}": plugin
+        for plugin in Plugins.instance().discover(SearchPathPlugin)
+    }
+    # CHANGED this, to avoid the weird re-instantiation of our plugin type.
+    from hydra_plugins.auto_schema import auto_schema_plugin
 
+    for plugin_name in search_path_plugins:
+        spp = plugin_classes[plugin_name]
         if spp is auto_schema_plugin.AutoSchemaPlugin:
             continue
-        # TODO: This will still call all the other plugins once per call to this function!
         plugin = spp()
         assert isinstance(plugin, SearchPathPlugin)
         plugin.manipulate_search_path(search_path)
@@ -731,6 +1421,51 @@ def _create_config_search_path(search_path_dir: str | None) -> ConfigSearchPath:
     return search_path
 
 
+_config_loaders: dict[str, ConfigLoaderImpl] | None = None
+"""Config loaders (one per search path) that are reused, if enabled.
+
+See `_config_loader_scope`.
+"""
+
+
+@contextlib.contextmanager
+def _config_loader_scope(config_loaders: dict[str, ConfigLoaderImpl] | None = None):
+    """Reuses the same config loader (and the configs it loaded) within this block.
+
+    The config files that are loaded are kept in memory, and only loaded again if they change.
+
+    Parameters:
+        config_loaders: The config loaders to use. Passing the same dictionary to different \
+            blocks makes it possible to keep the loaded configs for longer (e.g. in the watcher).
+    """
+    global _config_loaders
+    if _config_loaders is not None:
+        # Already in a (parent) scope.
+        yield
+        return
+    _config_loaders = config_loaders if config_loaders is not None else {}
+    try:
+        yield
+    finally:
+        _config_loaders = None
+
+
+def _get_config_loader(search_path: ConfigSearchPath) -> ConfigLoaderImpl:
+    if _config_loaders is None:
+        return ConfigLoaderImpl(config_search_path=search_path)
+    key = str(search_path)
+    if (config_loader := _config_loaders.get(key)) is None:
+        config_loader = ConfigLoaderImpl(config_search_path=search_path)
+        config_loader.repository = SharedConfigRepository(search_path)
+        _config_loaders[key] = config_loader
+    # The ConfigStore instance is replaced every time the state of Hydra is restored. Make sure
+    # that the structured configs are loaded from the current one.
+    for source in config_loader.repository.get_sources():
+        if source.scheme() == "structured":
+            source.store = ConfigStore.instance()  # type: ignore
+    return config_loader
+
+
 def load_config(
     config_path: Path,
     configs_dir: Path,
@@ -742,31 +1477,14 @@ def load_config(
     This is in large part because Hydra's internal code is *very* complicated.
     """
 
-    def _set_node_target(entry: ConfigNode | PossiblyNestedDict[str, ConfigNode]):
-        if isinstance(entry, dict):
-            for _key, value in entry.items():
-                _set_node_target(value)
-            return
-        if "_target_" in entry.node:
-            return
-
-        target = entry.node._metadata.object_type
-        if target is dict:
-            assert entry.name == "_dummy_empty_config_.yaml"
-            return
-
-        logger.debug(
-            f"Setting target for structured config node {entry.name} to {target}"
-        )
-        with omegaconf.open_dict(entry.node):
-            target = f"{target.__module__}.{target.__qualname__}"
-            entry.node["_target_"] = target
-
-    for _key, entry in config_store.repo.items():
-        _set_node_target(entry)
+    config_store_index = _get_config_store_index(config_store)
+    _set_config_store_targets(config_store, config_store_index)
 
     if config := _try_load_from_config_store(
-        config_path, configs_dir=configs_dir, config_store=config_store
+        config_path,
+        configs_dir=configs_dir,
+        config_store=config_store,
+        config_store_index=config_store_index,
     ):
         return config
 
@@ -792,7 +1510,7 @@ def load_config(
         search_path = _create_config_search_path(str(configs_dir))
         logger.debug(f"Search path for a config dir: {search_path}")
 
-    config_loader = ConfigLoaderImpl(config_search_path=search_path)
+    config_loader = _get_config_loader(search_path)
     from hydra._internal.core_plugins.structured_config_source import (
         StructuredConfigSource,  # noqa
     )
@@ -853,15 +1571,11 @@ def _add_schema_header(config_file: Path, schema_path: Path) -> None:
         relative_path_to_schema = os.path.relpath(schema_path, start=config_file.parent)
 
     # Remove any existing schema lines.
-    lines = [
-        line
-        for line in lines
-        if not line.strip().startswith("# yaml-language-server: $schema=")
-    ]
+    lines = [line for line in lines if not line.strip().startswith(_SCHEMA_HEADER)]
 
     # NOTE: This line can be placed anywhere in the file, not necessarily needs to be at the top,
     # and the yaml vscode extension will pick it up.
-    new_line = f"# yaml-language-server: $schema={relative_path_to_schema}"
+    new_line = f"{_SCHEMA_HEADER}{relative_path_to_schema}"
 
     package_global_line: int | None = None
 
@@ -890,25 +1604,30 @@ def _add_schema_header(config_file: Path, schema_path: Path) -> None:
         config_file.write_text(result)
 
 
+def _get_custom_builds_args(target: Any) -> tuple[type | Callable | str, dict] | None:
+    """Returns the entry of `custom_hydra_zen_builds_args` to use for this target, if any."""
+    return _find_customization(
+        custom_hydra_zen_builds_args,
+        target,
+        entry_point_group=BUILDS_ARGS_ENTRY_POINT_GROUP,
+    )
+
+
 def _get_dataclass_from_target(target: Any, config: dict | DictConfig) -> type:
-    for target_type, special_kwargs in custom_hydra_zen_builds_args.items():
-        if target_type is target or (
-            inspect.isclass(target)
-            and inspect.isclass(target_type)
-            and issubclass(target, target_type)
-        ):
-            kwargs = merge_dicts(
-                dict(
-                    populate_full_signature=True,
-                    hydra_recursive=False,
-                    hydra_convert="all",
-                    zen_dataclass={"cls_name": target.__qualname__},
-                ),
-                special_kwargs,
-                conflict_handler=_overwrite,
-            )
-            # Generate the dataclass dynamically with hydra-zen.
-            return hydra_zen.builds(target, **kwargs)
+    if custom_builds_args := _get_custom_builds_args(target):
+        _target_type, special_kwargs = custom_builds_args
+        kwargs = merge_dicts(
+            dict(
+                populate_full_signature=True,
+                hydra_recursive=False,
+                hydra_convert="all",
+                zen_dataclass={"cls_name": target.__qualname__},
+            ),
+            special_kwargs,
+            conflict_handler=_overwrite,
+        )
+        # Generate the dataclass dynamically with hydra-zen.
+        return hydra_zen.builds(target, **kwargs)
     if dataclasses.is_dataclass(target):
         # The target is a dataclass, so the schema is just the schema of the dataclass.
         assert inspect.isclass(target)
@@ -926,17 +1645,187 @@ def _get_dataclass_from_target(target: Any, config: dict | DictConfig) -> type:
     )
 
 
+_target_schema_cache: dict[Hashable, ObjectSchema | Schema] | None = None
+"""Schemas of the targets that were already seen during the current run, if caching is enabled.
+
+See `_target_schema_cache_scope`.
+"""
+
+_target_schema_disk_cache: TargetSchemaDiskCache | None = None
+"""Persistent cache of the target schemas used in the current run, if enabled."""
+
+_customizations_fingerprint: str | None = None
+"""Fingerprint of the customizations, computed once when entering the caching scope.
+
+It is part of the key of each target schema (see `_get_target_schema_cache_key`).
+"""
+
+
+@contextlib.contextmanager
+def _target_schema_cache_scope(
+    disk_cache: TargetSchemaDiskCache | None = None,
+    cache: dict[Hashable, ObjectSchema | Schema] | None = None,
+):
+    """Reuses the schema of each distinct target within this block.
+
+    The customizations in `hydra_auto_schema.customize` shouldn't change within this block.
+
+    Parameters:
+        disk_cache: Persistent cache in which to look for (and store) the target schemas.
+        cache: The in-memory cache to use. Passing the same dictionary to different blocks makes \
+            it possible to keep the target schemas for longer (e.g. in the daemon).
+    """
+    global _target_schema_cache, _target_schema_disk_cache, _customizations_fingerprint
+    if _target_schema_cache is not None:
+        # Already in a (parent) caching scope.
+        yield
+        return
+    _target_schema_cache = cache if cache is not None else {}
+    _target_schema_disk_cache = disk_cache
+    _customizations_fingerprint = _get_registries_fingerprint()
+    try:
+        yield
+    finally:
+        _target_schema_cache = None
+        _target_schema_disk_cache = None
+        _customizations_fingerprint = None
+
+
+_target_schema_refs: dict[str, ObjectSchema | Schema] | None = None
+"""Schemas of the targets referred to by the schema being created, if enabled.
+
+See `_target_schema_refs_scope`.
+"""
+
+
+@contextlib.contextmanager
+def _target_schema_refs_scope(enabled: bool = True):
+    """Refers to the schemas of nested targets with `$ref` instead of embedding them.
+
+    Each distinct target schema is then written once, in the `targets` subdirectory of the schemas
+    directory, rather than being copied in the schema of every config that uses it. The schema of a
+    target at the top-level of a config is still embedded, since it is merged with the schema of
+    the config, and so is the schema of a target that other schemas are added to (see
+    `_can_refer_to_target_schema`).
+
+    Yields:
+        The schemas of the referenced targets, keyed by their path relative to the schemas
+        directory. This is filled in when exiting the block.
+    """
+    global _target_schema_refs
+    target_schemas: dict[str, ObjectSchema | Schema] = {}
+    if not enabled or _target_schema_refs is not None:
+        yield target_schemas
+        return
+    _target_schema_refs = target_schemas
+    try:
+        yield target_schemas
+    finally:
+        _target_schema_refs = None
+
+
+def _can_refer_to_target_schema(
+    keys: tuple[str, ...],
+    entries_with_target: dict[tuple[str, ...], dict],
+    schema: Schema | ObjectSchema,
+) -> bool:
+    """Returns whether the schema of the target at `keys` can be replaced with a `$ref`.
+
+    Keywords next to a `$ref` are ignored (draft-07), so the schema is embedded instead when
+    something else has to be added to it: the schema of a target nested inside this one, or an
+    existing schema for the same property.
+    """
+    if any(
+        other_keys[: len(keys)] == keys and other_keys != keys
+        for other_keys in entries_with_target
+    ):
+        return False
+    where_to_set: Any = schema
+    for key in keys:
+        where_to_set = where_to_set.get("properties", {}).get(key)
+        if where_to_set is None:
+            return True
+    return False
+
+
+def _get_target_schema_ref(
+    config: dict | DictConfig, schema: ObjectSchema | Schema
+) -> ObjectSchema | Schema:
+    """Returns a `$ref` to the shared schema file for this target (and records its schema)."""
+    assert _target_schema_refs is not None
+    target = config["_target_"]
+    if not isinstance(target, str):
+        return schema
+    name = target
+    if config.get("_partial_"):
+        name += ".partial"
+    if config.get("defaults", None) is not None:
+        digest = hashlib.sha256(repr(config["defaults"]).encode()).hexdigest()
+        name += f".{digest[:8]}"
+    path = f"{TARGET_SCHEMAS_DIR}/{name}.json"
+    _target_schema_refs[path] = schema
+    return {"$ref": path}  # type: ignore
+
+
+def _get_target_schema_cache_key(config: dict | DictConfig) -> Hashable:
+    """Returns the key used to cache the schema of the target of this config.
+
+    This doesn't import the target. The customizations are part of the key, so this covers the
+    entry of `custom_hydra_zen_builds_args` that is used for this target (if any). Their
+    fingerprint is only computed once per caching scope.
+    """
+    return (
+        config["_target_"],
+        bool(config.get("_partial_")),
+        repr(config.get("defaults", None)),
+        _customizations_fingerprint or _get_registries_fingerprint(),
+    )
+
+
 def _get_schema_from_target(config: dict | DictConfig) -> ObjectSchema | Schema:
     assert isinstance(config, dict | DictConfig)
+    if _target_schema_cache is None:
+        with profiling.target(str(config["_target_"])):
+            return _create_schema_from_target(config)
+
+    try:
+        key = _get_target_schema_cache_key(config)
+        cached_schema = _target_schema_cache.get(key)
+    except TypeError:
+        # Unhashable key, for example when the target isn't a string. Don't cache.
+        with profiling.target(str(config["_target_"])):
+            return _create_schema_from_target(config)
+
+    if cached_schema is not None:
+        logger.debug(f"Reusing the schema of target {config['_target_']}.")
+    elif _target_schema_disk_cache and (
+        cached_schema := _target_schema_disk_cache.get(key)
+    ):
+        logger.debug(f"Using the cached schema of target {config['_target_']}.")
+        _target_schema_cache[key] = cached_schema
+    else:
+        with profiling.target(str(config["_target_"])):
+            cached_schema = _create_schema_from_target(config)
+        _target_schema_cache[key] = cached_schema
+        if _target_schema_disk_cache:
+            _target_schema_disk_cache.set(
+                key, hydra.utils.get_object(config["_target_"]), cached_schema
+            )
+    # The schema is modified by the caller, so return a copy.
+    return copy.deepcopy(cached_schema)
+
+
+def _create_schema_from_target(config: dict | DictConfig) -> ObjectSchema | Schema:
     # logger.debug(f"Config: {config}")
     target = hydra.utils.get_object(config["_target_"])
     target_name = getattr(
         target, "__qualname__", getattr(target, "__name__", str(target))
     )
-    object_type = _get_dataclass_from_target(target=target, config=config)
+    with profiling.phase("builds"):
+        object_type = _get_dataclass_from_target(target=target, config=config)
 
     try:
-        with warnings.catch_warnings():
+        with warnings.catch_warnings(), profiling.phase("json_schema"):
             warnings.filterwarnings("ignore", category=UserWarning)
 
             json_schema = pydantic.TypeAdapter(object_type).json_schema(
@@ -957,25 +1846,8 @@ def _get_schema_from_target(config: dict | DictConfig) -> ObjectSchema | Schema:
         + json_schema.get("description", "")
     )
 
-    docs_to_search: list[dp.Docstring] = []
-
-    if inspect.isclass(target):
-        for target_or_base_class in inspect.getmro(target):
-            if class_docstring := inspect.getdoc(target_or_base_class):
-                docs_to_search.append(dp.parse(class_docstring))
-            if init_docstring := inspect.getdoc(target_or_base_class.__init__):
-                docs_to_search.append(dp.parse(init_docstring))
-    else:
-        assert inspect.isfunction(target) or inspect.ismethod(target), target
-        docstring = inspect.getdoc(target)
-        if docstring:
-            docs_to_search = [dp.parse(docstring)]
-
-    param_descriptions: dict[str, str] = {}
-    for doc in docs_to_search:
-        for param in doc.params:
-            if param.description and param.arg_name not in param_descriptions:
-                param_descriptions[param.arg_name] = param.description
+    with profiling.phase("docstrings"):
+        param_descriptions = _get_param_descriptions(target)
 
     # Update the pydantic schema with descriptions:
     for property_name, property_dict in json_schema["properties"].items():
@@ -1016,6 +1888,30 @@ def _get_schema_from_target(config: dict | DictConfig) -> ObjectSchema | Schema:
     return json_schema
 
 
+def _get_param_descriptions(target: Any) -> dict[str, str]:
+    """Returns the descriptions of the parameters of the target, taken from its docstrings."""
+    docs_to_search: list[dp.Docstring] = []
+
+    if inspect.isclass(target):
+        for target_or_base_class in inspect.getmro(target):
+            if class_docstring := inspect.getdoc(target_or_base_class):
+                docs_to_search.append(dp.parse(class_docstring))
+            if init_docstring := inspect.getdoc(target_or_base_class.__init__):
+                docs_to_search.append(dp.parse(init_docstring))
+    else:
+        assert inspect.isfunction(target) or inspect.ismethod(target), target
+        docstring = inspect.getdoc(target)
+        if docstring:
+            docs_to_search = [dp.parse(docstring)]
+
+    param_descriptions: dict[str, str] = {}
+    for doc in docs_to_search:
+        for param in doc.params:
+            if param.description and param.arg_name not in param_descriptions:
+                param_descriptions[param.arg_name] = param.description
+    return param_descriptions
+
+
 def _target_has_var_kwargs(config: DictConfig) -> bool:
     target = hydra_zen.get_target(config)  # type: ignore
     return inspect.getfullargspec(target).varkw is None
@@ -1038,10 +1934,11 @@ class _MyGenerateJsonSchema(GenerateJsonSchema):
         """
         enum_type = schema["cls"]
         logger.debug(f"Getting the schema for Enum of type {enum_type}")
-        for handler_enum_type, custom_handler in custom_enum_schemas.items():
-            if handler_enum_type is enum_type or issubclass(
-                enum_type, handler_enum_type
-            ):
-                schema = custom_handler(enum_type, schema)
-                break
+        if customization := _find_customization(
+            custom_enum_schemas,
+            enum_type,
+            entry_point_group=ENUM_SCHEMAS_ENTRY_POINT_GROUP,
+        ):
+            _, custom_handler = customization
+            schema = custom_handler(enum_type, schema)
         return super().enum_schema(schema)
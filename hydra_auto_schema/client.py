@@ -0,0 +1,193 @@
+"""Client of the schema daemon (`hydra-auto-schema-serve`, see `hydra_auto_schema.server`).
+
+This module is imported by the command-line before anything else, so it must stay cheap to import:
+when the daemon is running, the command-line doesn't need to import Hydra, pydantic, etc. at all.
+
+The protocol is JSON-RPC 2.0, with one JSON message per line.
+"""
+
+from __future__ import annotations
+
+import getpass
+import hashlib
+import json
+import os
+import socket
+import stat
+import tempfile
+from logging import getLogger as get_logger
+from pathlib import Path
+from typing import Any
+
+logger = get_logger(__name__)
+
+PROTOCOL_VERSION = 1
+"""Version of the protocol, returned by the `ping` method of the daemon."""
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+DECLINED = -32000
+"""Error code used when the daemon can't handle a request correctly, for example when its
+modules are outdated. The client should then do the work itself."""
+
+_CONNECT_TIMEOUT = 0.5
+"""Seconds to wait for the daemon to accept the connection."""
+
+_PING_TIMEOUT = 5.0
+"""Seconds to wait for the daemon to respond to a `ping`."""
+
+DEFAULT_TIMEOUT = 60.0
+"""Seconds to wait for the daemon to respond to the other requests, by default (see `try_call`)."""
+
+
+class DaemonError(RuntimeError):
+    """An error returned by the daemon."""
+
+    def __init__(self, message: str, code: int = INTERNAL_ERROR):
+        super().__init__(message)
+        self.code = code
+
+
+def get_socket_path(repo_root: Path) -> Path:
+    """Returns the path of the Unix socket of the daemon for this repo.
+
+    The socket is in `$XDG_RUNTIME_DIR` if set, otherwise in a directory of the user in the
+    temporary directory (see `get_socket_dir`).
+    """
+    digest = hashlib.sha256(str(repo_root.resolve()).encode()).hexdigest()[:16]
+    return get_socket_dir() / f"hydra-auto-schema-{digest}.sock"
+
+
+def get_socket_dir() -> Path:
+    """Returns the directory of the sockets of the daemons of the user.
+
+    This is `$XDG_RUNTIME_DIR` if set, which only the user can access. Otherwise, this is a
+    directory in the temporary directory, which is shared between users: the daemon creates it
+    with permissions that only let the user access it (see `check_socket_dir`).
+    """
+    if runtime_dir := os.environ.get("XDG_RUNTIME_DIR"):
+        return Path(runtime_dir)
+    user = os.getuid() if hasattr(os, "getuid") else getpass.getuser()
+    return Path(tempfile.gettempdir()) / f"hydra-auto-schema-{user}"
+
+
+def check_socket_dir(socket_dir: Path) -> None:
+    """Checks that only the user can access the directory of the sockets.
+
+    Raises:
+        PermissionError: If another user owns the directory, or if other users can access it.
+    """
+    if not hasattr(os, "getuid"):
+        return
+    info = os.stat(socket_dir, follow_symlinks=False)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        raise PermissionError(f"{socket_dir} isn't a directory owned by the user.")
+    if info.st_mode & 0o077:
+        raise PermissionError(f"Other users can access {socket_dir}.")
+
+
+def _is_own_socket(socket_path: Path) -> bool:
+    """Whether the socket exists and was created by the user (rather than by another user)."""
+    try:
+        info = os.stat(socket_path, follow_symlinks=False)
+    except OSError:
+        return False
+    if not stat.S_ISSOCK(info.st_mode):
+        return False
+    return not hasattr(os, "getuid") or info.st_uid == os.getuid()
+
+
+def call(
+    socket_path: Path, method: str, timeout: float | None = None, **params: Any
+) -> Any:
+    """Sends a request to the daemon listening on this socket, and returns the result.
+
+    Parameters:
+        socket_path: The Unix socket of the daemon.
+        method: The method to call (see `hydra_auto_schema.server.SchemaServer`).
+        timeout: Seconds to wait for the response. Waits indefinitely by default.
+        params: The parameters of the method. They must be serializable to JSON.
+
+    Raises:
+        OSError: If no daemon is listening on this socket.
+        DaemonError: If the daemon returned an error.
+    """
+    request = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(_CONNECT_TIMEOUT)
+        sock.connect(str(socket_path))
+        sock.settimeout(timeout)
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        with sock.makefile("rb") as reader:
+            line = reader.readline()
+    if not line:
+        raise ConnectionError("The daemon closed the connection without responding.")
+    response = json.loads(line)
+    if (error := response.get("error")) is not None:
+        raise DaemonError(error["message"], code=error["code"])
+    return response["result"]
+
+
+def try_call(
+    repo_root: Path, method: str, timeout: float | None = None, **params: Any
+) -> tuple[bool, Any]:
+    """Calls a method of the daemon of this repo, if it is running and accepts the request.
+
+    Parameters:
+        repo_root: The root of the repo.
+        method: The method to call.
+        timeout: Seconds to wait for the response. Defaults to a few seconds for `ping`, and to
+            `DEFAULT_TIMEOUT` for the other methods.
+        params: The parameters of the method.
+
+    Returns:
+        Whether the daemon handled the request, and the result. When the daemon isn't running,
+        doesn't respond in time, or declines the request, the caller should do the work itself.
+
+    Raises:
+        DaemonError: If an error occurred in the daemon while handling the request.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return False, None
+    socket_path = get_socket_path(repo_root)
+    if not _is_own_socket(socket_path):
+        # Don't trust a socket created by another user: they could make us skip the work.
+        if socket_path.exists():
+            logger.warning(
+                f"Ignoring the daemon socket at {socket_path}, which wasn't created by this user."
+            )
+        return False, None
+    if timeout is None:
+        timeout = _PING_TIMEOUT if method == "ping" else DEFAULT_TIMEOUT
+    try:
+        return True, call(
+            socket_path, method, timeout=timeout, repo_root=str(repo_root), **params
+        )
+    except socket.timeout:
+        # Don't wait forever for a daemon that is stuck. If it is only slow, the caller waits
+        # until the daemon releases the lock of the schemas directory instead.
+        logger.warning(
+            f"The daemon at {socket_path} didn't respond to {method!r} within {timeout}s."
+        )
+        return False, None
+    except OSError as err:
+        # For example if the daemon was killed, and left its socket behind.
+        logger.debug(f"Unable to reach the daemon at {socket_path}: {err}")
+        return False, None
+    except DaemonError as err:
+        if err.code != DECLINED:
+            raise
+        logger.info(f"The daemon declined the request: {err}")
+        return False, None
+
+
+def to_json(value: Any) -> Any:
+    """Converts the paths in these arguments of a method to strings."""
+    if isinstance(value, Path):
+        return str(value)
+    if isinstance(value, list | tuple):
+        return [to_json(v) for v in value]
+    return value
@@ -0,0 +1,98 @@
+"""Config repository for Hydra that keeps the loaded config files across calls to `load_config`.
+
+Hydra creates a new config repository every time a config is loaded, which means that the config
+files that are shared between configs (the `hydra/*` configs, the options of the config groups,
+etc.) are read and parsed again for every config. The `SharedConfigRepository` here keeps the
+configs that were loaded from files, and only reloads those whose file changed since.
+"""
+
+from __future__ import annotations
+
+import copy
+import os
+from importlib import resources
+from logging import getLogger as get_logger
+from pathlib import Path
+from typing import Any, Optional
+
+from hydra._internal.config_repository import ConfigRepository
+from hydra.core.config_search_path import ConfigSearchPath
+from hydra.core.object_type import ObjectType
+from hydra.plugins.config_source import ConfigResult, ConfigSource
+
+logger = get_logger(__name__)
+
+_FileStamp = tuple[int, int]
+"""Size and modification time of a config file."""
+
+
+class SharedConfigRepository(ConfigRepository):
+    """A `ConfigRepository` that caches the configs it loads from files (or packages).
+
+    The cache is shared with the copies of this repository (Hydra makes a copy of the repository
+    every time a configuration is loaded). Structured configs (from the ConfigStore) are not
+    cached, since the ConfigStore can change between calls.
+    """
+
+    def __init__(
+        self,
+        config_search_path: ConfigSearchPath,
+        cache: (
+            dict[tuple[str, str, str], tuple[_FileStamp | None, ConfigResult]] | None
+        ) = None,
+    ) -> None:
+        super().__init__(config_search_path)
+        self.cache = cache if cache is not None else {}
+
+    def __deepcopy__(self, memo: dict[int, Any]) -> SharedConfigRepository:
+        # NOTE: `initialize_sources` replaces the list of sources, so a shallow copy is enough.
+        # The cache is what we want to share between the copies.
+        new = copy.copy(self)
+        new.sources = list(self.sources)
+        return new
+
+    def load_config(self, config_path: str) -> Optional[ConfigResult]:
+        source = self._find_object_source(
+            config_path=config_path, object_type=ObjectType.CONFIG
+        )
+        # NOTE: Checking the scheme rather than the type of the source, because the classes of
+        # the config sources are re-created when Hydra scans the plugins again.
+        if source is None or source.scheme() not in ("file", "pkg"):
+            return super().load_config(config_path)
+
+        key = (source.scheme(), source.path, config_path)
+        stamp = _get_file_stamp(source, config_path)
+        if (cached := self.cache.get(key)) is not None and cached[0] == stamp:
+            # Hydra modifies the results (e.g. when merging them with a schema).
+            return copy.deepcopy(cached[1])
+
+        if cached is not None:
+            logger.debug(f"Config {config_path} changed, loading it again.")
+        ret = super().load_config(config_path)
+        if ret is not None:
+            self.cache[key] = (stamp, copy.deepcopy(ret))
+        return ret
+
+
+def _get_file_stamp(source: ConfigSource, config_path: str) -> _FileStamp | None:
+    """Returns the size and modification time of the file for this config in the source.
+
+    Returns `None` when the config isn't a file on disk (e.g. in a zipped package), in which case
+    it is assumed not to change.
+    """
+    normalized_config_path = ConfigSource._normalize_file_name(config_path)
+    path: Any
+    if source.scheme() == "file":
+        path = os.path.join(source.path, normalized_config_path)
+    else:
+        try:
+            path = resources.files(source.path).joinpath(normalized_config_path)
+        except (ImportError, TypeError, ValueError):
+            return None
+        if not isinstance(path, Path):
+            return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
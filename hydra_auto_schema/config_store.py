@@ -0,0 +1,26 @@
+"""Helpers for the Hydra ConfigStore.
+
+This module only imports Hydra, so that the plugin can list the contents of the ConfigStore (for
+the daemon) without importing `hydra_auto_schema.auto_schema`, pydantic, hydra-zen, etc.
+"""
+
+from __future__ import annotations
+
+from typing import Iterator, TypeVar
+
+from hydra.core.config_store import ConfigNode
+
+K = TypeVar("K")
+V = TypeVar("V")
+PossiblyNestedDict = dict[K, V | "PossiblyNestedDict[K, V]"]
+
+
+def _iter_config_store_nodes(
+    entries: PossiblyNestedDict[str, ConfigNode], prefix: str = ""
+) -> Iterator[tuple[str, ConfigNode]]:
+    """Yields the path and the node of each config in the ConfigStore (e.g. `db/mysql.yaml`)."""
+    for key, entry in entries.items():
+        if isinstance(entry, dict):
+            yield from _iter_config_store_nodes(entry, prefix=f"{prefix}{key}/")
+        else:
+            yield f"{prefix}{key}", entry
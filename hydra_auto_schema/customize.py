@@ -1,21 +1,64 @@
-"""Global variables that can be used to customize how schemas are generated."""
+"""Global variables that can be used to customize how schemas are generated.
+
+The keys of the `custom_hydra_zen_builds_args` and `custom_enum_schemas` registries can either be
+the classes (or callables) themselves, or their dotted names (e.g. `"flax.linen.Module"`). Using
+names avoids having to import heavy libraries just to register a customization: an entry is only
+used for targets that have a class with that name in their MRO.
+
+Other packages can also register customizations with entry points, which are only loaded when a
+target matches their name:
+
+```toml
+[project.entry-points."hydra_auto_schema.builds_args"]
+"my_package.MyModel" = "my_package.schemas:MY_MODEL_BUILDS_ARGS"
+
+[project.entry-points."hydra_auto_schema.enum_schemas"]
+"my_package.MyEnum" = "my_package.schemas:my_enum_schema"
+```
+"""
+
 import dataclasses
 import enum
-from typing import Any, Callable
+import functools
+import importlib.metadata
+import inspect
+import sys
+from typing import Any, Callable, Mapping, TypeVar
 
 from pydantic.json_schema import JsonSchemaValue
 from pydantic_core import core_schema
 
-custom_hydra_zen_builds_args: dict[type | Callable, dict] = {
-    # flax.linen.Module: {"zen_exclude": ["parent"]},
-    # lightning.pytorch.callbacks.RichProgressBar: {"zen_exclude": ["theme"]},
+V = TypeVar("V")
+
+BUILDS_ARGS_ENTRY_POINT_GROUP = "hydra_auto_schema.builds_args"
+ENUM_SCHEMAS_ENTRY_POINT_GROUP = "hydra_auto_schema.enum_schemas"
+
+
+def _handle_torchvision_weights_enum(
+    enum_type: type[enum.Enum], schema: core_schema.EnumSchema
+) -> JsonSchemaValue:
+    @dataclasses.dataclass
+    class Dummy:
+        value: str
+
+    slightly_changed_schema = schema | {
+        "members": [Dummy(v.name) for v in schema["members"]]
+    }
+    return slightly_changed_schema
+
+
+custom_hydra_zen_builds_args: dict[type | Callable | str, dict] = {
+    "flax.linen.Module": {"zen_exclude": ["parent"]},
+    "lightning.pytorch.callbacks.RichProgressBar": {"zen_exclude": ["theme"]},
 }
 """Keyword arguments that should be passed to `hydra_zen.builds` for a given class or callable.
 
 These arguments overwrite the default values.
 """
 
-custom_enum_schemas: dict[type[enum.Enum], Callable] = {}
+custom_enum_schemas: dict[type[enum.Enum] | str, Callable] = {
+    "torchvision.models.WeightsEnum": _handle_torchvision_weights_enum,
+}
 """Dict of functions to be used by pydantic to generate schemas for enum classes.
 
 TODO: This a bit too specific. We could probably use our `GenerateJsonSchema`
@@ -29,40 +72,62 @@ schema_conflict_handlers: dict[str, Callable[[Any, Any], Any]] = {}
 See the docstring of `merge_dicts` for more info.
 """
 
-# Conditionally add some common fixes?
-# TODO: Should we really import those here? This might make the import pretty slow, no? If not,
-# when / how should we import things here?
-
-try:
-    from flax.linen import Module  # type: ignore
-
-    custom_hydra_zen_builds_args[Module] = {"zen_exclude": ["parent"]}
-except ImportError:
-    pass
-
-try:
-    from lightning.pytorch.callbacks import RichProgressBar  # type: ignore
-
-    custom_hydra_zen_builds_args[RichProgressBar] = {"zen_exclude": ["theme"]}
-except ImportError:
-    pass
-
-
-try:
-    from torchvision.models import WeightsEnum as _WeightsEnum  # type: ignore
-
-    def _handle_torchvision_weights_enum(
-        enum_type: type[_WeightsEnum], schema: core_schema.EnumSchema
-    ) -> JsonSchemaValue:
-        @dataclasses.dataclass
-        class Dummy:
-            value: str
-
-        slightly_changed_schema = schema | {
-            "members": [Dummy(v.name) for v in schema["members"]]
-        }
-        return slightly_changed_schema
 
-    custom_enum_schemas[_WeightsEnum] = _handle_torchvision_weights_enum
-except ImportError:
-    pass
+def _find_customization(
+    registry: Mapping[Any, V], target: Any, entry_point_group: str | None = None
+) -> tuple[Any, V] | None:
+    """Returns the first entry of the registry (or entry point) that applies to this target.
+
+    An entry applies if its key is the target, a base class of the target, or the dotted name of
+    one of these. Entry points of the given group are only loaded if their name matches.
+    """
+    names = _get_names(target)
+    for key, value in registry.items():
+        if isinstance(key, str):
+            if key in names or _is_alias(key, target):
+                return key, value
+        elif key is target or (
+            inspect.isclass(target) and inspect.isclass(key) and issubclass(target, key)
+        ):
+            return key, value
+    if entry_point_group is None:
+        return None
+    for entry_point in _get_entry_points(entry_point_group):
+        if entry_point.name in names or _is_alias(entry_point.name, target):
+            return entry_point.name, entry_point.load()
+    return None
+
+
+def _get_names(target: Any) -> set[str]:
+    """Returns the dotted names of the target, and of its base classes if it is a class."""
+    objects = inspect.getmro(target) if inspect.isclass(target) else (target,)
+    names: set[str] = set()
+    for obj in objects:
+        module = getattr(obj, "__module__", None)
+        name = getattr(obj, "__qualname__", None) or getattr(obj, "__name__", None)
+        if module and name:
+            names.add(f"{module}.{name}")
+    return names
+
+
+def _is_alias(name: str, target: Any) -> bool:
+    """Checks if the name refers to the target (or a base class) through a re-export.
+
+    For example, `torchvision.models.WeightsEnum` is defined in `torchvision.models._api`. This
+    never imports anything: the name can only refer to the target if its module was imported.
+    """
+    module_name, _, attribute = name.rpartition(".")
+    module = sys.modules.get(module_name)
+    if module is None:
+        return False
+    obj = getattr(module, attribute, None)
+    if obj is None:
+        return False
+    return obj is target or (
+        inspect.isclass(target) and inspect.isclass(obj) and issubclass(target, obj)
+    )
+
+
+@functools.cache
+def _get_entry_points(group: str) -> tuple[importlib.metadata.EntryPoint, ...]:
+    return tuple(importlib.metadata.entry_points(group=group))
@@ -0,0 +1,241 @@
+"""Finds the other config files that a Hydra config file depends on.
+
+This only looks at the config files themselves (their defaults list and `@package` directive), so
+it is much cheaper than loading the config with Hydra.
+"""
+
+from __future__ import annotations
+
+from logging import getLogger as get_logger
+from pathlib import Path
+from typing import Any, Iterable
+
+import yaml
+
+logger = get_logger(__name__)
+
+
+def _has_package_global_line(config_file: Path) -> bool:
+    """Returns whether the config file contains a `@package _global_` directive of hydra.
+
+    See: https://hydra.cc/docs/advanced/overriding_packages/#overriding-the-package-via-the-package-directive
+    """
+    for line in config_file.read_text().splitlines():
+        line = line.strip()
+        if not line.startswith("#"):
+            continue
+        if line.removeprefix("#").strip().startswith("@package _global_"):
+            return True
+    return False
+
+
+def get_config_dependencies(
+    config_file: Path, configs_dir: Path, recursive: bool = False
+) -> list[Path]:
+    """Returns the config files that are pulled in by the defaults list of this config file.
+
+    Config files with a `@package _global_` directive are loaded on top of the primary config
+    (`config.yaml`), so they also depend on it.
+
+    Entries of the defaults list that don't correspond to a file in the configs directory (for
+    example structured configs from the ConfigStore) are ignored.
+
+    Parameters:
+        config_file: The config file.
+        configs_dir: The directory containing the Hydra config files.
+        recursive: Whether to also return the dependencies of the dependencies, and so on.
+    """
+    dependencies: list[Path] = []
+    to_visit = [config_file]
+    visited = {config_file}
+    while to_visit:
+        current = to_visit.pop(0)
+        for dependency in _get_direct_dependencies(current, configs_dir=configs_dir):
+            if dependency in visited:
+                continue
+            visited.add(dependency)
+            dependencies.append(dependency)
+            if recursive:
+                to_visit.append(dependency)
+    return dependencies
+
+
+class DependencyGraph:
+    """Graph of the dependencies between the config files of a configs directory.
+
+    A config file depends on the config files in its defaults list (including `override` entries),
+    and config files with a `@package _global_` directive depend on the primary config.
+    """
+
+    def __init__(self, configs_dir: Path):
+        self.configs_dir = configs_dir
+        self.dependencies: dict[Path, list[Path]] = {}
+        """The direct dependencies of each config file."""
+        self.dependents: dict[Path, set[Path]] = {}
+        """The config files that directly depend on each config file (the reverse edges)."""
+
+    @classmethod
+    def build(cls, config_files: Iterable[Path], configs_dir: Path) -> DependencyGraph:
+        graph = cls(configs_dir)
+        for config_file in config_files:
+            graph.update(config_file)
+        return graph
+
+    def update(self, config_file: Path) -> None:
+        """Adds the config file to the graph, or updates its dependencies if it changed."""
+        self._remove_edges(config_file)
+        # Also record the dependencies that don't exist (yet), so that adding or removing a
+        # config file affects the config files that refer to it.
+        dependencies = _get_direct_dependencies(
+            config_file, configs_dir=self.configs_dir, include_missing=True
+        )
+        self.dependencies[config_file] = dependencies
+        for dependency in dependencies:
+            self.dependents.setdefault(dependency, set()).add(config_file)
+
+    def remove(self, config_file: Path) -> None:
+        """Removes a config file (that was deleted) from the graph.
+
+        The edges from config files that depend on this config are kept.
+        """
+        self._remove_edges(config_file)
+        self.dependencies.pop(config_file, None)
+
+    def get_dependents(self, config_files: Iterable[Path]) -> list[Path]:
+        """Returns the config files that depend on any of these, directly or indirectly.
+
+        The config files themselves are not included, unless they depend on each other.
+        """
+        config_files = list(config_files)
+        dependents: list[Path] = []
+        to_visit = list(config_files)
+        visited = set(config_files)
+        while to_visit:
+            current = to_visit.pop(0)
+            for dependent in sorted(self.dependents.get(current, ())):
+                if dependent in visited:
+                    continue
+                visited.add(dependent)
+                dependents.append(dependent)
+                to_visit.append(dependent)
+        return dependents
+
+    def get_affected(self, changed_files: Iterable[Path]) -> list[Path]:
+        """Returns the config files whose schema needs to be updated when these files change.
+
+        These are the changed config files (that still exist) and the config files that depend
+        on them. Files that are not config files are ignored.
+        """
+        resolved = {path.resolve(): path for path in self.dependencies}
+        resolved.update(
+            {path.resolve(): path for path in self.dependents if path not in resolved}
+        )
+        changed = [
+            resolved[path]
+            for path in dict.fromkeys(p.resolve() for p in changed_files)
+            if path in resolved
+        ]
+        affected = set(changed) | set(self.get_dependents(changed))
+        return [
+            config_file for config_file in self.dependencies if config_file in affected
+        ]
+
+    def _remove_edges(self, config_file: Path) -> None:
+        for dependency in self.dependencies.get(config_file, ()):
+            if dependents := self.dependents.get(dependency):
+                dependents.discard(config_file)
+                if not dependents:
+                    self.dependents.pop(dependency)
+
+
+def _get_direct_dependencies(
+    config_file: Path, configs_dir: Path, include_missing: bool = False
+) -> list[Path]:
+    try:
+        config = yaml.safe_load(config_file.read_text())
+    except (OSError, yaml.YAMLError) as exc:
+        logger.debug(f"Unable to read the defaults list of {config_file}: {exc}")
+        return []
+
+    dependencies: list[Path] = []
+    if _has_package_global_line(config_file):
+        primary_config = _find_config_file(configs_dir / "config", include_missing)
+        if primary_config is not None and primary_config != config_file:
+            dependencies.append(primary_config)
+
+    defaults = config.get("defaults") if isinstance(config, dict) else None
+    if not isinstance(defaults, list):
+        return dependencies
+
+    for default in defaults:
+        for option_path in _get_default_option_paths(
+            default, config_file=config_file, configs_dir=configs_dir
+        ):
+            if (option_file := _find_config_file(option_path, include_missing)) and (
+                option_file not in dependencies
+            ):
+                dependencies.append(option_file)
+    return dependencies
+
+
+def _get_default_option_paths(
+    default: Any, config_file: Path, configs_dir: Path
+) -> list[Path]:
+    """Returns the paths (without extension) of the config files for an entry in a defaults list.
+
+    See https://hydra.cc/docs/advanced/defaults_list/
+    """
+    if isinstance(default, str):
+        if default == "_self_" or _is_interpolation(default):
+            return []
+        name = default.partition("@")[0].strip()
+        return [
+            _resolve_config_path(name, config_file=config_file, configs_dir=configs_dir)
+        ]
+
+    if not isinstance(default, dict) or len(default) != 1:
+        return []
+
+    key, value = next(iter(default.items()))
+    if not isinstance(key, str):
+        return []
+    group = key.strip()
+    for prefix in ("override ", "optional "):
+        group = group.removeprefix(prefix).strip()
+    group = group.partition("@")[0].strip()
+    if not group or _is_interpolation(group):
+        return []
+
+    options = value if isinstance(value, list) else [value]
+    return [
+        _resolve_config_path(
+            f"{group}/{option}", config_file=config_file, configs_dir=configs_dir
+        )
+        for option in options
+        if isinstance(option, str) and option != "???" and not _is_interpolation(option)
+    ]
+
+
+def _resolve_config_path(name: str, config_file: Path, configs_dir: Path) -> Path:
+    if name.startswith("/"):
+        return configs_dir / name.removeprefix("/")
+    return config_file.parent / name
+
+
+def _find_config_file(path: Path, include_missing: bool = False) -> Path | None:
+    if path.suffix in (".yaml", ".yml") and path.is_file():
+        return path
+    for suffix in (".yaml", ".yml"):
+        if (with_suffix := path.with_name(path.name + suffix)).is_file():
+            return with_suffix
+    if include_missing:
+        return (
+            path
+            if path.suffix in (".yaml", ".yml")
+            else path.with_name(path.name + ".yaml")
+        )
+    return None
+
+
+def _is_interpolation(value: str) -> bool:
+    return "${" in value
@@ -1,8 +1,9 @@
-import datetime
-import json
+import collections
 import logging
-import warnings
+import threading
+import time
 from pathlib import Path
+from typing import Literal
 
 import rich
 from hydra.core.config_store import ConfigStore
@@ -21,20 +22,37 @@ from watchdog.events import (
 from hydra_auto_schema.auto_schema import (
     _add_schema_header,
     _add_schemas_to_vscode_settings,
-    _create_schema_for_config,
+    _config_loader_scope,
+    _create_schemas_for_config_files,
+    _get_schema_associations,
     _try_to_install_yaml_vscode_extension,
-    _read_json,
+    _target_schema_cache_scope,
+    _write_schema,
     add_schemas_to_all_hydra_configs,
     get_schema_file_path,
-    load_config,
     logger,
 )
+from hydra_auto_schema.dependencies import DependencyGraph
+from hydra_auto_schema.manifest import Manifest, _yaml_files_in, lock_schemas_dir
+from hydra_auto_schema.target_cache import TargetSchemaDiskCache
+from hydra_auto_schema.vscode_settings import VscodeSettingsFile
 
 from .utils import pretty_path
 
 
 class AutoSchemaEventHandler(PatternMatchingEventHandler):
-    debounce_interval: datetime.timedelta = datetime.timedelta(seconds=3)
+    """Updates the schemas of the config files when they change.
+
+    The events are only queued when they are received. The schemas are updated in a background
+    thread, so that the delivery of events is never blocked. Bursts of events (for example when an
+    editor saves a file, or when doing a `git checkout`) are merged and processed as one batch.
+    """
+
+    coalesce_interval: float = 0.2
+    """Seconds to wait for more events before updating the schemas."""
+
+    max_delay: float = 2.0
+    """Maximum number of seconds by which new events can delay the processing of older ones."""
 
     def __init__(
         self,
@@ -46,6 +64,9 @@ class AutoSchemaEventHandler(PatternMatchingEventHandler):
         quiet: bool,
         add_headers: bool | None,
         config_store: ConfigStore | None = None,
+        jobs: int | Literal["auto"] = 1,
+        vscode_associations: Literal["files", "globs"] = "files",
+        shared_target_schemas: bool = False,
     ):
         self.configs_dir = configs_dir
         super().__init__(
@@ -65,8 +86,33 @@ class AutoSchemaEventHandler(PatternMatchingEventHandler):
         self.stop_on_error = stop_on_error
         self.quiet = quiet
         self.add_headers = add_headers
+        self.jobs = jobs
+        self.vscode_associations = vscode_associations
+        self.shared_target_schemas = shared_target_schemas
+        self.config_store = config_store
+
+        # Keep the loaded config files for as long as the watcher runs (they are reloaded when
+        # they change).
+        self._config_loaders: dict = {}
+        # Kept for as long as the watcher runs, so the settings are only read again when the file
+        # is modified.
+        self._vscode_settings = VscodeSettingsFile.for_repo(repo_root)
+        # Reverse-dependency index, used to also update the schemas of the configs that depend on
+        # a config that changed. It is only used (and updated) in the worker thread.
+        self._dependency_graph = DependencyGraph.build(
+            _yaml_files_in(configs_dir), configs_dir=configs_dir
+        )
+
+        self._condition = threading.Condition()
+        # The paths that changed and haven't been processed yet, with the time of the first event.
+        self._pending: dict[Path, float] = {}
+        self._last_event_time = 0.0
+        # Incremented with each event for a path, to detect when a job was superseded.
+        self._generations: collections.Counter[Path] = collections.Counter()
+        self._busy = False
+        self._stopped = False
+        self._error: Exception | None = None
 
-        self._last_updated: dict[Path, datetime.datetime] = {}
         # On startup, we could make a schema for every config file, right?
         add_schemas_to_all_hydra_configs(
             repo_root=repo_root,
@@ -77,8 +123,15 @@ class AutoSchemaEventHandler(PatternMatchingEventHandler):
             quiet=quiet,
             add_headers=add_headers,
             config_store=config_store or ConfigStore.instance(),
+            jobs=jobs,
+            vscode_associations=vscode_associations,
+            shared_target_schemas=shared_target_schemas,
         )
         self.console = rich.console.Console()
+        self._worker = threading.Thread(
+            target=self._work, name="hydra-auto-schema-watcher", daemon=True
+        )
+        self._worker.start()
         self.console.log(
             f"Watching for changes in config files in the {pretty_path(configs_dir)} directory."
         )
@@ -87,37 +140,27 @@ class AutoSchemaEventHandler(PatternMatchingEventHandler):
         logger.debug(f"on_created event: {event.src_path}")
         if config_file := self._filter_config_file(event.src_path):
             logger.info(f"Config file was created: {config_file}")
-            self.run(config_file)
+            self.schedule(config_file)
 
     def on_deleted(self, event: DirDeletedEvent | FileDeletedEvent) -> None:
         logger.debug(f"on_deleted event: {event.src_path}")
-
-        # TODO: Remove the schema from the vscode settings.
         if config_file := self._filter_config_file(event.src_path):
             logger.info(f"Config file was deleted: {config_file}")
-            self._remove_schema_file(config_file)
+            self.schedule(config_file)
 
     def on_modified(self, event: DirModifiedEvent | FileModifiedEvent) -> None:
         logger.debug(f"on_modified event: {event.src_path}")
-
         if config_file := self._filter_config_file(event.src_path):
-            if self._debounce(config_file):
-                return
             logger.info(f"Config file was modified: {config_file}")
-            self.run(config_file)
+            self.schedule(config_file)
 
     def on_moved(self, event: DirMovedEvent | FileMovedEvent) -> None:
         logger.debug(f"on_moved event: {event.src_path}")
-
         source_file = self._filter_config_file(event.src_path)
         dest_file = self._filter_config_file(event.dest_path)
         if source_file and dest_file:
             logger.info(f"Config file was moved from {source_file} --> {dest_file}")
-            self._remove_schema_file(source_file)
-            self.run(dest_file)
-
-        if dest_file:
-            self.run(dest_file)
+        self.schedule(*(f for f in (source_file, dest_file) if f))
 
     def _filter_config_file(self, p: str | bytes) -> Path | None:
         config_file = Path(str(p))
@@ -127,78 +170,194 @@ class AutoSchemaEventHandler(PatternMatchingEventHandler):
             return None
         return config_file
 
-    def _debounce(self, config_file: Path) -> bool:
-        """Debouncing to prevent a loop caused by us modifying the config file to add a header(?).
+    def schedule(self, *config_files: Path) -> None:
+        """Queues these (created, modified, moved or deleted) config files to be processed."""
+        now = time.monotonic()
+        with self._condition:
+            for config_file in config_files:
+                self._pending.setdefault(config_file, now)
+                self._generations[config_file] += 1
+            self._last_event_time = now
+            self._condition.notify_all()
 
-        TODO: Also seems to be necessary when `self.add_header` is False! Why?
+    def wait(self, timeout: float | None = None) -> bool:
+        """Waits until all the queued changes have been processed.
 
         Returns:
-            `True` if the file was modified recently (by us), `False` otherwise.
-        """
-        if config_file not in self._last_updated:
-            self._last_updated[config_file] = datetime.datetime.now()
-            return False
+            `False` if the timeout expired before that, `True` otherwise.
 
-        if (
-            datetime.datetime.now() - self._last_updated[config_file]
-        ) < self.debounce_interval:
-            logger.debug(
-                f"Config file {config_file} was modified very recently; not regenerating the schema."
+        Raises:
+            The error that stopped the worker thread, if `stop_on_error` is set.
+        """
+        with self._condition:
+            done = self._condition.wait_for(
+                lambda: self._stopped or (not self._pending and not self._busy),
+                timeout=timeout,
             )
-            return True
-        self._last_updated[config_file] = datetime.datetime.now()
-        return False
+            if self._error is not None:
+                raise self._error
+            return done
 
-    def run(self, config_file: Path) -> None:
-        p = pretty_path(config_file)
-        try:
-            self._run(config_file)
-        except Exception as exc:
-            logger.warning(f"Error while processing config at {config_file}:\n{exc}")
-            if self.stop_on_error:
-                raise
-            sees_warning = logger.getEffectiveLevel() <= logging.WARNING
-            self.console.log(
-                f"Unable to generate the schema for {p}."
-                + ("" if sees_warning else " (use -v for more info).")
-            )
-        else:
-            self.console.log(f"Schema updated for {p}.")
+    def stop(self) -> None:
+        """Stops the worker thread (once it is done with the current batch)."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._worker.join()
 
-    def _run(self, config_file: Path) -> None:
-        pretty_config_file_name = config_file.relative_to(self.configs_dir)
-        schema_file = get_schema_file_path(config_file, self.schemas_dir)
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                batch = self._next_batch()
+                if batch is None:
+                    return
+                self._busy = True
+            try:
+                with lock_schemas_dir(self.schemas_dir):
+                    self._process(batch)
+            except Exception as exc:
+                logger.error(f"Error while updating the schemas: {exc}")
+                if self.stop_on_error:
+                    with self._condition:
+                        self._error = exc
+                        self._stopped = True
+                    return
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
 
-        logger.debug(f"Creating a schema for {pretty_config_file_name}")
-        from hydra.core.config_store import ConfigStore
+    def _next_batch(self) -> list[Path] | None:
+        """Waits until the pending changes are ready to be processed and returns them.
 
-        config_store = ConfigStore.instance()
+        Must be called while holding the lock of `self._condition`.
+        """
+        while not self._stopped:
+            if not self._pending:
+                self._condition.wait()
+                continue
+            ready_at = min(
+                self._last_event_time + self.coalesce_interval,
+                min(self._pending.values()) + self.max_delay,
+            )
+            if (now := time.monotonic()) < ready_at:
+                self._condition.wait(timeout=ready_at - now)
+                continue
+            batch = list(self._pending)
+            self._pending.clear()
+            return batch
+        return None
 
-        with warnings.catch_warnings():
-            warnings.filterwarnings("ignore", category=UserWarning)
-            config = load_config(
+    def _process(self, changed_files: list[Path]) -> None:
+        manifest = Manifest.load(self.schemas_dir)
+        really_changed: list[Path] = []
+        for config_file in changed_files:
+            if not config_file.exists():
+                self._dependency_graph.remove(config_file)
+                self._remove_schema_file(config_file, manifest=manifest)
+            elif manifest.is_up_to_date(
                 config_file,
                 configs_dir=self.configs_dir,
-                repo_root=self.repo_root,
-                config_store=config_store,
+                schema_file=get_schema_file_path(config_file, self.schemas_dir),
+                shared_target_schemas=self.shared_target_schemas,
+            ):
+                # For example when we just added a schema header to the file.
+                logger.debug(f"Contents of {config_file} didn't change, skipping it.")
+                continue
+            else:
+                # The defaults list of the config might have changed.
+                self._dependency_graph.update(config_file)
+            really_changed.append(config_file)
+
+        affected = self._dependency_graph.get_affected(really_changed)
+        if dependents := [f for f in affected if f not in really_changed]:
+            logger.info(
+                f"Also updating the schemas of {len(dependents)} configs that depend on "
+                + ", ".join(str(pretty_path(f)) for f in really_changed)
             )
-        schema = _create_schema_for_config(
-            config,
-            config_file=config_file,
-            configs_dir=self.configs_dir,
-            repo_root=self.repo_root,
-            config_store=config_store,
-        )
-        schema_file.parent.mkdir(exist_ok=True, parents=True)
-        schema_file.write_text(json.dumps(schema, indent=2).rstrip() + "\n\n")
-        # _set_is_incomplete_schema(schema_file, False)
+        with self._condition:
+            generations = {f: self._generations[f] for f in affected}
+
+        def _is_superseded(config_file: Path) -> bool:
+            # The config file changed again since this batch started. It will be processed again
+            # in the next batch.
+            with self._condition:
+                return self._generations[config_file] != generations[config_file]
+
+        config_file_to_schema_file: dict[Path, Path] = {}
+        try:
+            with (
+                _target_schema_cache_scope(disk_cache=TargetSchemaDiskCache()),
+                _config_loader_scope(self._config_loaders),
+            ):
+                for result in _create_schemas_for_config_files(
+                    affected,
+                    configs_dir=self.configs_dir,
+                    repo_root=self.repo_root,
+                    stop_on_error=False,
+                    quiet=self.quiet or len(affected) == 1,
+                    jobs=self.jobs,
+                    is_cancelled=_is_superseded,
+                    shared_target_schemas=self.shared_target_schemas,
+                    config_store=self.config_store,
+                ):
+                    p = pretty_path(result.config_file)
+                    if _is_superseded(result.config_file):
+                        logger.debug(f"Discarding outdated schema for {p}.")
+                        continue
+                    if result.error is not None:
+                        # Keep the previous schema, rather than replacing it with a partial one.
+                        if self.stop_on_error:
+                            raise RuntimeError(
+                                f"Unable to generate the schema for {p}: {result.error}"
+                            )
+                        sees_warning = logger.getEffectiveLevel() <= logging.WARNING
+                        self.console.log(
+                            f"Unable to generate the schema for {p}."
+                            + ("" if sees_warning else " (use -v for more info).")
+                        )
+                        continue
+                    schema_file, written = _write_schema(
+                        result,
+                        configs_dir=self.configs_dir,
+                        schemas_dir=self.schemas_dir,
+                        manifest=manifest,
+                        shared_target_schemas=self.shared_target_schemas,
+                    )
+                    config_file_to_schema_file[result.config_file] = schema_file
+                    if written:
+                        self.console.log(f"Schema updated for {p}.")
+                    else:
+                        logger.info(f"Schema for {p} is unchanged.")
+        finally:
+            manifest.save()
+        self._associate_schemas(config_file_to_schema_file, manifest=manifest)
 
+    def _associate_schemas(
+        self, config_file_to_schema_file: dict[Path, Path], manifest: Manifest
+    ) -> None:
+        # NOTE: With glob associations, removed config files also change the associations.
+        if not config_file_to_schema_file and self.vscode_associations != "globs":
+            return
         if not self.add_headers:
-            _try_to_install_yaml_vscode_extension()
+            _try_to_install_yaml_vscode_extension(background=True)
 
             try:
                 _add_schemas_to_vscode_settings(
-                    {config_file: schema_file}, repo_root=self.repo_root
+                    config_file_to_schema_file,
+                    repo_root=self.repo_root,
+                    vscode_settings=self._vscode_settings,
+                    associations=(
+                        _get_schema_associations(
+                            manifest,
+                            configs_dir=self.configs_dir,
+                            schemas_dir=self.schemas_dir,
+                            repo_root=self.repo_root,
+                        )
+                        if self.vscode_associations == "globs"
+                        else None
+                    ),
+                    schemas_dir=self.schemas_dir,
                 )
             except Exception as exc:
                 logger.error(
@@ -213,42 +372,20 @@ class AutoSchemaEventHandler(PatternMatchingEventHandler):
                 return
 
         logger.debug(
-            "Adding a header to the config file to point to the schema to use."
+            "Adding headers to the config files to point to the schemas to use."
         )
-        _add_schema_header(config_file, schema_path=schema_file)
+        for config_file, schema_file in config_file_to_schema_file.items():
+            _add_schema_header(config_file, schema_path=schema_file)
 
-    def _remove_schema_file(self, config_file: Path) -> None:
+    def _remove_schema_file(self, config_file: Path, manifest: Manifest) -> None:
         schema_file = get_schema_file_path(config_file, self.schemas_dir)
+        manifest.remove(config_file, configs_dir=self.configs_dir)
         if self.add_headers:
             # Could also remove the schema file for this config file.
             logger.debug(
                 f"Removing schema file associated with config {config_file}: {schema_file}"
             )
-            schema_file.unlink()
-        else:
-            vscode_settings_file = self.repo_root / ".vscode" / "settings.json"
-            if not vscode_settings_file.exists():
-                # Weird.
-                return
-            vscode_settings = _read_json(vscode_settings_file)
-            yaml_schemas = vscode_settings.get("yaml.schemas", {})
-            assert isinstance(yaml_schemas, dict)
-            if not yaml_schemas:
-                # Weird also!
-                return
-            if (
-                schema_key := str(schema_file.relative_to(self.repo_root))
-            ) not in yaml_schemas:
-                # Weird also!
-                return
-            config_file_value = str(config_file)
-            configs_with_schema: str | list[str] = yaml_schemas[schema_key]
-            if isinstance(configs_with_schema, str):
-                assert configs_with_schema == config_file_value
-                # Weird!
-                # Remove the schema from the dict.
-                yaml_schemas.pop(schema_key)
-            else:
-                yaml_schemas[schema_key].remove(config_file_value)
-            # NOTE: This doesn't work with comments.
-            vscode_settings_file.write_text(json.dumps(vscode_settings, indent=4))
+            schema_file.unlink(missing_ok=True)
+        elif self.vscode_associations != "globs":
+            self._vscode_settings.remove_schemas({config_file: schema_file})
+            self._vscode_settings.flush()
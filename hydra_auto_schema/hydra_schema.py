@@ -154,3 +154,31 @@ HYDRA_CONFIG_SCHEMA = Schema(
         "_recursive_": ["_target_"],
     },
 )
+"""The base schema of any Hydra config.
+
+This is a template, and must not be modified: use `new_hydra_config_schema` to get a schema that
+can be modified.
+"""
+
+
+def new_hydra_config_schema() -> Schema:
+    """Returns a copy of `HYDRA_CONFIG_SCHEMA`, to which properties can be added.
+
+    Only the schema, its `properties` and the schemas of these properties are copied, since these
+    are the only parts that are modified when creating the schema of a config (or by `merge_dicts`,
+    which copies what it merges). The rest is shared with the template.
+
+    >>> schema = new_hydra_config_schema()
+    >>> schema["properties"]["_target_"]["const"] = "foo.Bar"
+    >>> "const" in HYDRA_CONFIG_SCHEMA["properties"]["_target_"]
+    False
+    >>> defaults_schema = HYDRA_CONFIG_SCHEMA["properties"]["defaults"]
+    >>> schema["properties"]["defaults"]["items"] is defaults_schema["items"]
+    True
+    """
+    schema = HYDRA_CONFIG_SCHEMA.copy()
+    schema["properties"] = {
+        name: property_schema.copy()  # type: ignore
+        for name, property_schema in HYDRA_CONFIG_SCHEMA["properties"].items()
+    }
+    return schema
@@ -0,0 +1,491 @@
+"""Manifest of the schemas that were generated, used to decide which schemas are up to date.
+
+The manifest is stored in a `manifest` file in the schemas directory. For each config file, it
+records a fingerprint of the config file, of the config files pulled in by its defaults list, of
+the generated schema and of the shared target schemas it refers to, along with the targets used in
+the config and whether the schema is complete or only partial (because an error occurred while
+creating it).
+
+A `tree_fingerprint` file in the schemas directory also stores a fingerprint of the whole configs
+directory that only uses `stat`s (see `get_tree_fingerprint`). It is used to skip a run entirely
+when nothing changed since the last one, without even checking the manifest.
+
+A `lock` file in the schemas directory is locked while the schemas are being generated (see
+`lock_schemas_dir`), so that runs in different processes (e.g. the daemon and a CLI that stopped
+waiting for it) don't write the same files at the same time.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import dataclasses
+import hashlib
+import json
+import os
+from logging import getLogger as get_logger
+from pathlib import Path
+from typing import Any, Iterator, Literal
+
+from hydra_auto_schema.utils import atomic_write_text, write_text_if_changed
+
+logger = get_logger(__name__)
+
+MANIFEST_FILE_NAME = "manifest"
+_MANIFEST_VERSION = 2
+TREE_FINGERPRINT_FILE_NAME = "tree_fingerprint"
+LOCK_FILE_NAME = "lock"
+TARGET_SCHEMAS_DIR = "targets"
+"""Subdirectory of the schemas directory where the shared schemas of the targets are written."""
+
+
+@dataclasses.dataclass(frozen=True)
+class FileFingerprint:
+    """Fingerprint of the contents of a file.
+
+    The schema headers that are added to (or removed from) config files are ignored when hashing
+    the contents, so that associating a schema with a config file doesn't make it look modified.
+    """
+
+    sha256: str
+    size: int
+    mtime_ns: int
+
+    @classmethod
+    def of(cls, path: Path) -> FileFingerprint:
+        stat = path.stat()
+        return cls(
+            sha256=_hash_contents(path.read_bytes()),
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+        )
+
+    @classmethod
+    def of_text(cls, path: Path, text: str) -> FileFingerprint:
+        """Fingerprint of a file that was just written with the given text."""
+        stat = path.stat()
+        return cls(
+            sha256=_hash_contents(text.encode()),
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+        )
+
+    def check(self, path: Path, stat: os.stat_result | None) -> FileFingerprint | None:
+        """Checks whether the file still has the same contents.
+
+        The contents of the file are only hashed if the size or modification time changed.
+
+        Returns:
+            `None` if the contents changed (or if the file doesn't exist anymore), otherwise the
+            (possibly refreshed) fingerprint of the file.
+        """
+        if stat is None:
+            return None
+        if stat.st_size == self.size and stat.st_mtime_ns == self.mtime_ns:
+            return self
+        try:
+            sha256 = _hash_contents(path.read_bytes())
+        except OSError:
+            return None
+        if sha256 != self.sha256:
+            return None
+        return FileFingerprint(
+            sha256=sha256, size=stat.st_size, mtime_ns=stat.st_mtime_ns
+        )
+
+
+@dataclasses.dataclass(frozen=True)
+class ManifestEntry:
+    """What the schema of a config file was generated from."""
+
+    config: FileFingerprint
+    """Fingerprint of the config file."""
+
+    dependencies: dict[str, FileFingerprint]
+    """Fingerprints of the config files pulled in by the defaults list of the config.
+
+    The keys are the paths of the config files, relative to the configs directory.
+    """
+
+    targets: list[str]
+    """The `_target_`s used in the config."""
+
+    status: Literal["complete", "partial"]
+    """Whether the schema is complete, or a partial schema (an error occurred while creating it)."""
+
+    schema: FileFingerprint
+    """Fingerprint of the schema file."""
+
+    target_schemas: dict[str, FileFingerprint] = dataclasses.field(default_factory=dict)
+    """Fingerprints of the shared target schema files that the schema refers to with `$ref`.
+
+    The keys are the paths of the files, relative to the schemas directory.
+    """
+
+    shared_target_schemas: bool = False
+    """Whether the schema was created with `shared_target_schemas`, i.e. refers to the schemas of
+    the targets with `$ref` instead of including them."""
+
+
+class Manifest:
+    """Records what the schemas in the schemas directory were generated from."""
+
+    def __init__(
+        self, schemas_dir: Path, entries: dict[str, ManifestEntry] | None = None
+    ):
+        self.schemas_dir = schemas_dir
+        self.entries: dict[str, ManifestEntry] = entries or {}
+        self._changed = False
+
+    @property
+    def path(self) -> Path:
+        return self.schemas_dir / MANIFEST_FILE_NAME
+
+    @classmethod
+    def load(cls, schemas_dir: Path) -> Manifest:
+        """Loads the manifest from the schemas directory.
+
+        An empty manifest is returned if the file doesn't exist or can't be read.
+        """
+        manifest_file = schemas_dir / MANIFEST_FILE_NAME
+        try:
+            data = json.loads(manifest_file.read_text())
+            if data.get("version") != _MANIFEST_VERSION:
+                raise ValueError(f"Unsupported manifest version: {data.get('version')}")
+            entries = {
+                config: _entry_from_dict(entry)
+                for config, entry in data["configs"].items()
+            }
+        except FileNotFoundError:
+            entries = {}
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            logger.info(f"Ignoring the invalid manifest file at {manifest_file}: {exc}")
+            entries = {}
+        return cls(schemas_dir, entries)
+
+    def save(self) -> None:
+        """Writes the manifest to the schemas directory, if anything changed."""
+        if not self._changed:
+            return
+        data = {
+            "version": _MANIFEST_VERSION,
+            "configs": {
+                config: dataclasses.asdict(entry)
+                for config, entry in sorted(self.entries.items())
+            },
+        }
+        self.schemas_dir.mkdir(exist_ok=True, parents=True)
+        atomic_write_text(self.path, json.dumps(data, indent=1) + "\n")
+        self._changed = False
+
+    def is_up_to_date(
+        self,
+        config_file: Path,
+        configs_dir: Path,
+        schema_file: Path,
+        shared_target_schemas: bool = False,
+        _stats: dict[Path, os.stat_result | None] | None = None,
+    ) -> bool:
+        """Returns whether the schema of this config file is complete and up to date.
+
+        This is the case if the config file, the config files in its defaults list, the schema
+        file and the target schema files it refers to have not changed since the schema was
+        generated, and if it was generated with the same `shared_target_schemas` option.
+        """
+        key = _key(config_file, configs_dir)
+        entry = self.entries.get(key)
+        if entry is None or entry.status != "complete":
+            return False
+        if entry.shared_target_schemas != shared_target_schemas:
+            return False
+        stats = _stats if _stats is not None else {}
+        config = entry.config.check(config_file, _cached_stat(config_file, stats))
+        if config is None:
+            return False
+        dependencies: dict[str, FileFingerprint] = {}
+        for dependency, fingerprint in entry.dependencies.items():
+            dependency_file = configs_dir / dependency
+            dependency_fingerprint = fingerprint.check(
+                dependency_file, _cached_stat(dependency_file, stats)
+            )
+            if dependency_fingerprint is None:
+                return False
+            dependencies[dependency] = dependency_fingerprint
+        schema = entry.schema.check(schema_file, _cached_stat(schema_file, stats))
+        if schema is None:
+            return False
+        target_schemas: dict[str, FileFingerprint] = {}
+        for target_schema, fingerprint in entry.target_schemas.items():
+            target_schema_file = self.schemas_dir / target_schema
+            target_schema_fingerprint = fingerprint.check(
+                target_schema_file, _cached_stat(target_schema_file, stats)
+            )
+            if target_schema_fingerprint is None:
+                return False
+            target_schemas[target_schema] = target_schema_fingerprint
+        refreshed_entry = dataclasses.replace(
+            entry,
+            config=config,
+            dependencies=dependencies,
+            schema=schema,
+            target_schemas=target_schemas,
+        )
+        if refreshed_entry != entry:
+            # Same contents, but the files were touched. Store the new stats so we don't need to
+            # hash the files again next time.
+            self.entries[key] = refreshed_entry
+            self._changed = True
+        return True
+
+    def is_partial(self, config_file: Path, configs_dir: Path) -> bool:
+        """Returns whether a partial schema was created for this config file last time."""
+        entry = self.entries.get(_key(config_file, configs_dir))
+        return entry is not None and entry.status == "partial"
+
+    def update(
+        self,
+        config_file: Path,
+        configs_dir: Path,
+        dependencies: list[Path],
+        targets: list[str],
+        status: Literal["complete", "partial"],
+        schema: FileFingerprint,
+        target_schemas: dict[str, FileFingerprint] | None = None,
+        fingerprints: dict[Path, FileFingerprint] | None = None,
+        shared_target_schemas: bool = False,
+    ) -> None:
+        """Records that the schema of this config file was just generated.
+
+        Parameters:
+            fingerprints: Fingerprints of the config file and its dependencies, taken before they
+                were loaded to create the schema. The files that aren't in it are fingerprinted
+                now.
+            shared_target_schemas: Whether the schema was created with `shared_target_schemas`.
+        """
+        fingerprints = fingerprints or {}
+
+        def _fingerprint(file: Path) -> FileFingerprint:
+            return fingerprints.get(file) or FileFingerprint.of(file)
+
+        self.entries[_key(config_file, configs_dir)] = ManifestEntry(
+            config=_fingerprint(config_file),
+            dependencies={
+                _key(dependency, configs_dir): _fingerprint(dependency)
+                for dependency in dependencies
+                if dependency.is_relative_to(configs_dir)
+            },
+            targets=targets,
+            status=status,
+            schema=schema,
+            target_schemas=target_schemas or {},
+            shared_target_schemas=shared_target_schemas,
+        )
+        self._changed = True
+
+    def remove(self, config_file: Path, configs_dir: Path) -> None:
+        if self.entries.pop(_key(config_file, configs_dir), None) is not None:
+            self._changed = True
+
+    def prune(self, config_files: list[Path], configs_dir: Path) -> None:
+        """Removes the entries for config files that are not in `config_files` anymore."""
+        keys = {_key(config_file, configs_dir) for config_file in config_files}
+        for key in list(self.entries):
+            if key not in keys:
+                self.entries.pop(key)
+                self._changed = True
+
+    def matches_config_files(self, configs_dir: Path) -> bool:
+        """Returns whether the entries were created from the current contents of the config files.
+
+        This is not the case if a config file was added, removed or modified since its schema was
+        generated (for example while the schemas were being generated). The headers added to the
+        config files are ignored.
+        """
+        config_files = _yaml_files_in(configs_dir)
+        if {_key(config_file, configs_dir) for config_file in config_files} != set(
+            self.entries
+        ):
+            return False
+        stats: dict[Path, os.stat_result | None] = {}
+        for key, entry in self.entries.items():
+            fingerprints = {key: entry.config, **entry.dependencies}
+            for file_key, fingerprint in fingerprints.items():
+                file = configs_dir / file_key
+                if fingerprint.check(file, _cached_stat(file, stats)) is None:
+                    return False
+        return True
+
+    def get_referenced_target_schemas(self) -> set[str]:
+        """Returns the target schema files referred to by the schemas (relative to `schemas_dir`)."""
+        return {
+            target_schema
+            for entry in self.entries.values()
+            for target_schema in entry.target_schemas
+        }
+
+
+def get_tree_fingerprint(
+    configs_dir: Path, schemas_dir: Path, repo_root: Path, options: str = ""
+) -> str:
+    """Returns a fingerprint of the config files and schemas, computed only with `stat` calls.
+
+    The fingerprint changes when a config file is added, removed, renamed or modified (through the
+    modification times of the directories, and the sizes and modification times of the config
+    files), when a file is added to or removed from the schemas directory, when a shared target
+    schema file changes, when the vscode settings file changes, or when the `options` change. The
+    contents of the files are never read.
+
+    Parameters:
+        configs_dir: The directory containing the Hydra config files.
+        schemas_dir: The directory with the schema files.
+        repo_root: The root directory of the repository.
+        options: Anything else that the schemas depend on (e.g. the options of the run).
+    """
+    hasher = hashlib.sha256(options.encode())
+    _hash_tree(
+        configs_dir,
+        configs_dir,
+        hasher,
+        skip_venv=".venv" not in configs_dir.parts,
+    )
+    try:
+        with os.scandir(schemas_dir) as entries:
+            schema_files = sorted(entry.name for entry in entries)
+    except OSError:
+        schema_files = []
+    for name in schema_files:
+        if name not in (TREE_FINGERPRINT_FILE_NAME, LOCK_FILE_NAME):
+            hasher.update(f"s {name}\n".encode())
+    try:
+        with os.scandir(schemas_dir / TARGET_SCHEMAS_DIR) as entries:
+            target_schema_files = sorted(
+                (entry.name, entry.stat()) for entry in entries if entry.is_file()
+            )
+    except OSError:
+        target_schema_files = []
+    for name, stat in target_schema_files:
+        hasher.update(f"t {name} {stat.st_size} {stat.st_mtime_ns}\n".encode())
+    vscode_settings_file = repo_root / ".vscode" / "settings.json"
+    if (stat := _cached_stat(vscode_settings_file, {})) is not None:
+        hasher.update(f"v {stat.st_size} {stat.st_mtime_ns}\n".encode())
+    return hasher.hexdigest()
+
+
+def load_tree_fingerprint(schemas_dir: Path) -> str | None:
+    """Returns the tree fingerprint saved at the end of the last run, if there is one."""
+    try:
+        return (schemas_dir / TREE_FINGERPRINT_FILE_NAME).read_text().strip()
+    except OSError:
+        return None
+
+
+def save_tree_fingerprint(schemas_dir: Path, fingerprint: str) -> None:
+    schemas_dir.mkdir(exist_ok=True, parents=True)
+    write_text_if_changed(schemas_dir / TREE_FINGERPRINT_FILE_NAME, fingerprint + "\n")
+
+
+@contextlib.contextmanager
+def lock_schemas_dir(schemas_dir: Path) -> Iterator[None]:
+    """Holds an exclusive lock on the schemas directory while in the context.
+
+    Other processes (or threads) that lock the same schemas directory wait until it is released.
+    The lock isn't reentrant. Nothing is locked on platforms without `fcntl` (e.g. Windows).
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    schemas_dir.mkdir(exist_ok=True, parents=True)
+    with open(schemas_dir / LOCK_FILE_NAME, "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            logger.info(
+                f"Waiting for another process that is generating the schemas in {schemas_dir}."
+            )
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _hash_tree(
+    directory: Path, configs_dir: Path, hasher: Any, skip_venv: bool
+) -> None:
+    try:
+        stat = directory.stat()
+        with os.scandir(directory) as entries:
+            entries = sorted(entries, key=lambda entry: entry.name)
+    except OSError:
+        return
+    relative_path = directory.relative_to(configs_dir).as_posix()
+    hasher.update(f"d {relative_path} {stat.st_mtime_ns}\n".encode())
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            if not (skip_venv and entry.name == ".venv"):
+                _hash_tree(Path(entry.path), configs_dir, hasher, skip_venv=skip_venv)
+        elif entry.name.endswith((".yaml", ".yml")):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            hasher.update(
+                f"f {entry.name} {stat.st_size} {stat.st_mtime_ns}\n".encode()
+            )
+
+
+def _yaml_files_in(configs_dir: Path) -> list[Path]:
+    # Ignores .venv subfiles if the `configs_dir` isn't itself in a ".venv" directory.
+    if ".venv" in configs_dir.parts:
+        return list(configs_dir.rglob("*.yaml")) + list(configs_dir.rglob("*.yml"))
+    return list(
+        p for p in configs_dir.rglob("*.yaml") if ".venv" not in p.parts
+    ) + list(p for p in configs_dir.rglob("*.yml") if ".venv" not in p.parts)
+
+
+def _key(config_file: Path, configs_dir: Path) -> str:
+    return config_file.relative_to(configs_dir).as_posix()
+
+
+def _cached_stat(
+    path: Path, stats: dict[Path, os.stat_result | None]
+) -> os.stat_result | None:
+    if path not in stats:
+        try:
+            stats[path] = path.stat()
+        except OSError:
+            stats[path] = None
+    return stats[path]
+
+
+_SCHEMA_HEADER = b"# yaml-language-server: $schema="
+
+
+def _hash_contents(contents: bytes) -> str:
+    # Ignore the schema header lines in config files, as well as the leading/trailing whitespace
+    # that can change when adding or removing them.
+    contents = b"\n".join(
+        line
+        for line in contents.splitlines()
+        if not line.strip().startswith(_SCHEMA_HEADER)
+    ).strip()
+    return hashlib.sha256(contents).hexdigest()
+
+
+def _entry_from_dict(entry: dict[str, Any]) -> ManifestEntry:
+    return ManifestEntry(
+        config=FileFingerprint(**entry["config"]),
+        dependencies={
+            dependency: FileFingerprint(**fingerprint)
+            for dependency, fingerprint in entry["dependencies"].items()
+        },
+        targets=list(entry["targets"]),
+        status=entry["status"],
+        schema=FileFingerprint(**entry["schema"]),
+        target_schemas={
+            target_schema: FileFingerprint(**fingerprint)
+            for target_schema, fingerprint in entry["target_schemas"].items()
+        },
+        shared_target_schemas=bool(entry.get("shared_target_schemas", False)),
+    )
@@ -0,0 +1,273 @@
+"""Timings of the different phases of a run, used by the `--profile` option of the command-line.
+
+The phases are timed with the `phase` context manager, which does nothing unless a profile is
+being recorded (see `recording`). The time spent in nested phases is only counted in the innermost
+one, so the times of the phases of a config add up to (at most) the total time of the config.
+
+The schemas can be created in worker processes: the profile of each config is then recorded in
+the worker and sent back to the main process along with the schema.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import contextlib
+import dataclasses
+import json
+import marshal
+import time
+from pathlib import Path
+from typing import Any
+
+import rich.console
+import rich.table
+
+PHASES: dict[str, str] = {
+    "discovery": "Finding the config files",
+    "manifest": "Checking which schemas are up to date",
+    "load_config": "Composing the configs with Hydra",
+    "builds": "Creating dataclasses with hydra_zen.builds",
+    "json_schema": "Creating the schemas of the targets with pydantic",
+    "docstrings": "Parsing docstrings",
+    "merge_dicts": "Merging schemas",
+    "write": "Writing the schema files",
+    "associate": "Associating the schemas with the config files",
+}
+"""The phases that are timed, with their description."""
+
+
+@dataclasses.dataclass
+class ConfigProfile:
+    """Time spent on the schema of a config file."""
+
+    config_file: Path
+    total: float = 0.0
+    phases: dict[str, float] = dataclasses.field(default_factory=dict)
+    targets: dict[str, float] = dataclasses.field(default_factory=dict)
+    """Time spent creating the schema of each target (when it wasn't already cached)."""
+    cprofile_stats: bytes | None = None
+    """The `cProfile` stats, marshalled like in the files written by `cProfile`, if enabled."""
+
+
+@dataclasses.dataclass
+class RunProfile:
+    """Timings of a run, with those of each config file."""
+
+    top: int = 10
+    """Number of configs and targets to show in the lists of the slowest ones."""
+    cprofile: bool = False
+    """Whether to also run `cProfile` on each config. Only the stats of the `top` slowest configs
+    are kept."""
+
+    total: float = 0.0
+    phases: dict[str, float] = dataclasses.field(default_factory=dict)
+    """The time spent in each phase, outside of the configs (e.g. finding the config files)."""
+    configs: list[ConfigProfile] = dataclasses.field(default_factory=list)
+
+    def add(self, config_profile: ConfigProfile) -> None:
+        self.configs.append(config_profile)
+        with_stats = [c for c in self.configs if c.cprofile_stats is not None]
+        if len(with_stats) > self.top:
+            min(with_stats, key=lambda c: c.total).cprofile_stats = None
+
+    def get_phase_totals(self) -> dict[str, float]:
+        """Returns the total time of each phase, including the time of "other" work in configs."""
+        totals = dict(self.phases)
+        for config_profile in self.configs:
+            for name, seconds in config_profile.phases.items():
+                totals[name] = totals.get(name, 0.0) + seconds
+            totals["other"] = totals.get("other", 0.0) + max(
+                0.0, config_profile.total - sum(config_profile.phases.values())
+            )
+        order = list(PHASES) + ["other"]
+        return dict(
+            sorted(
+                totals.items(),
+                key=lambda item: (
+                    order.index(item[0]) if item[0] in order else len(order)
+                ),
+            )
+        )
+
+    def get_slowest_configs(self) -> list[ConfigProfile]:
+        return sorted(self.configs, key=lambda c: c.total, reverse=True)[: self.top]
+
+    def get_slowest_targets(self) -> list[tuple[str, float, int]]:
+        """Returns the targets that took the longest, with their total time and number of uses."""
+        totals: dict[str, float] = {}
+        counts: dict[str, int] = {}
+        for config_profile in self.configs:
+            for target, seconds in config_profile.targets.items():
+                totals[target] = totals.get(target, 0.0) + seconds
+                counts[target] = counts.get(target, 0) + 1
+        slowest = sorted(totals, key=totals.__getitem__, reverse=True)[: self.top]
+        return [(target, totals[target], counts[target]) for target in slowest]
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "total": self.total,
+            "phases": self.get_phase_totals(),
+            "configs": [
+                {
+                    "config_file": str(c.config_file),
+                    "total": c.total,
+                    "phases": c.phases,
+                    "targets": c.targets,
+                }
+                for c in sorted(self.configs, key=lambda c: c.total, reverse=True)
+            ],
+            "slowest_targets": [
+                {"target": target, "total": seconds, "count": count}
+                for target, seconds, count in self.get_slowest_targets()
+            ],
+        }
+
+    def write_json(self, path: Path) -> None:
+        path.parent.mkdir(exist_ok=True, parents=True)
+        path.write_text(json.dumps(self.to_json(), indent=2) + "\n")
+
+    def dump_cprofile_stats(self, directory: Path) -> list[Path]:
+        """Writes the `cProfile` stats of the slowest configs, to be opened with `pstats`.
+
+        Returns:
+            The paths of the files that were written.
+        """
+        directory.mkdir(exist_ok=True, parents=True)
+        files: list[Path] = []
+        for config_profile in self.get_slowest_configs():
+            if config_profile.cprofile_stats is None:
+                continue
+            config_file = config_profile.config_file
+            stats_file = (
+                directory / f"{config_file.parent.name}_{config_file.stem}.prof"
+            )
+            stats_file.write_bytes(config_profile.cprofile_stats)
+            files.append(stats_file)
+        return files
+
+    def print_summary(
+        self,
+        console: rich.console.Console | None = None,
+        configs_dir: Path | None = None,
+    ) -> None:
+        console = console or rich.console.Console()
+
+        def _name(config_file: Path) -> str:
+            if configs_dir is not None and config_file.is_relative_to(configs_dir):
+                return str(config_file.relative_to(configs_dir))
+            return str(config_file)
+
+        phase_totals = self.get_phase_totals()
+        total = sum(phase_totals.values())
+        table = rich.table.Table(title=f"Phases ({len(self.configs)} configs)")
+        table.add_column("Phase")
+        table.add_column("Time (s)", justify="right")
+        table.add_column("%", justify="right")
+        table.add_column("Description")
+        for name, seconds in phase_totals.items():
+            table.add_row(
+                name,
+                f"{seconds:.3f}",
+                f"{100 * seconds / total:.1f}" if total else "-",
+                PHASES.get(name, ""),
+            )
+        table.add_row("total", f"{total:.3f}", "", f"Wall time: {self.total:.3f}s")
+        console.print(table)
+
+        table = rich.table.Table(title=f"Slowest configs (top {self.top})")
+        table.add_column("Config")
+        table.add_column("Time (s)", justify="right")
+        table.add_column("Slowest phase")
+        for config_profile in self.get_slowest_configs():
+            slowest_phase = max(
+                config_profile.phases, key=config_profile.phases.__getitem__, default=""
+            )
+            table.add_row(
+                _name(config_profile.config_file),
+                f"{config_profile.total:.3f}",
+                slowest_phase,
+            )
+        console.print(table)
+
+        table = rich.table.Table(title=f"Slowest targets (top {self.top})")
+        table.add_column("Target")
+        table.add_column("Time (s)", justify="right")
+        table.add_column("Configs", justify="right")
+        for target, seconds, count in self.get_slowest_targets():
+            table.add_row(target, f"{seconds:.3f}", str(count))
+        console.print(table)
+
+
+_current: ConfigProfile | RunProfile | None = None
+"""The profile being recorded, if any."""
+
+_stack: list[list[float]] = []
+"""The start time of the current phases, along with the time spent in their nested phases."""
+
+
+def get_run_profile() -> RunProfile | None:
+    """Returns the profile of the run being recorded, if any."""
+    return _current if isinstance(_current, RunProfile) else None
+
+
+@contextlib.contextmanager
+def recording(profile: ConfigProfile | RunProfile | None, cprofile: bool = False):
+    """Records the time of the phases in this block in the given profile (if not None).
+
+    Parameters:
+        profile: The profile to record into.
+        cprofile: Whether to also run `cProfile` in this block, and store its stats in the
+            (config) profile.
+    """
+    global _current, _stack
+    if profile is None:
+        yield
+        return
+    previous = (_current, _stack)
+    _current, _stack = profile, []
+    profiler = cProfile.Profile() if cprofile else None
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        profile.total += time.perf_counter() - start
+        _current, _stack = previous
+        if profiler is not None and isinstance(profile, ConfigProfile):
+            profiler.create_stats()
+            profile.cprofile_stats = marshal.dumps(profiler.stats)  # type: ignore
+
+
+@contextlib.contextmanager
+def phase(name: str):
+    """Times this block as part of the given phase of the current profile (if any)."""
+    if _current is None:
+        yield
+        return
+    frame = [time.perf_counter(), 0.0]
+    _stack.append(frame)
+    try:
+        yield
+    finally:
+        _stack.pop()
+        elapsed = time.perf_counter() - frame[0]
+        _current.phases[name] = _current.phases.get(name, 0.0) + elapsed - frame[1]
+        if _stack:
+            _stack[-1][1] += elapsed
+
+
+@contextlib.contextmanager
+def target(name: str):
+    """Adds the time of this block to the time of the target in the current config profile."""
+    if not isinstance(_current, ConfigProfile):
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _current.targets[name] = _current.targets.get(name, 0.0) + elapsed
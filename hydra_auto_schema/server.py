@@ -0,0 +1,367 @@
+"""A long-lived process that keeps the schema generation warm (`hydra-auto-schema-serve`).
+
+Each run of the command-line or of the plugin otherwise starts from scratch. Importing Hydra,
+pydantic, hydra-zen and the modules of the targets, and loading the config files, takes much longer
+than creating the schemas of the few config files that changed. The daemon keeps the imported
+modules, the loaded config files and the schemas of the targets in memory between requests.
+
+Requests are JSON-RPC 2.0 messages, one per line, received on a Unix socket (one per repo, see
+`hydra_auto_schema.client.get_socket_path`) or on stdin (`--stdio`, for editors that start the
+daemon themselves). See `SchemaServer` for the methods. The command-line and the plugin use the
+daemon of the repo automatically when it is running.
+
+The daemon can't use modules that changed since it imported them. When a request comes in after
+one of them changed, the daemon declines it (so the client does the work itself) and restarts.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import inspect
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+from logging import getLogger as get_logger
+from pathlib import Path
+from typing import IO, Any, Callable, Literal
+
+from hydra.core.config_store import ConfigStore
+
+from hydra_auto_schema.auto_schema import (
+    _config_loader_scope,
+    _target_schema_cache_scope,
+    add_schemas_to_all_hydra_configs,
+    get_schema_for_config_file,
+)
+from hydra_auto_schema.client import (
+    DECLINED,
+    INTERNAL_ERROR,
+    INVALID_PARAMS,
+    INVALID_REQUEST,
+    METHOD_NOT_FOUND,
+    PARSE_ERROR,
+    PROTOCOL_VERSION,
+    call,
+    check_socket_dir,
+    get_socket_path,
+)
+from hydra_auto_schema.config_store import _iter_config_store_nodes
+from hydra_auto_schema.target_cache import TargetSchemaDiskCache
+
+logger = get_logger(__name__)
+
+_FileStamp = tuple[int, int]
+"""Size and modification time of a file."""
+
+
+class _Declined(Exception):
+    """Raised when the daemon can't handle a request correctly."""
+
+
+class SchemaServer:
+    """Handles the requests made to the daemon, with the state that is kept between them.
+
+    The methods that can be called are `ping`, `add_schemas`, `schema_for` and `shutdown`. The
+    requests are handled one at a time.
+    """
+
+    def __init__(self, repo_root: Path):
+        self.repo_root = repo_root
+        self.stopped = False
+        """Whether the daemon should stop, after responding to the current request."""
+        self.restart = False
+        """Whether the daemon should restart, because some of its modules changed."""
+
+        self._lock = threading.Lock()
+        self._config_loaders: dict = {}
+        self._target_schemas: dict = {}
+        self._disk_cache = TargetSchemaDiskCache()
+        self._module_stamps: dict[str, _FileStamp] = {}
+        self._update_module_stamps()
+        self._methods: dict[str, Callable[..., Any]] = {
+            "ping": self.ping,
+            "add_schemas": self.add_schemas,
+            "schema_for": self.schema_for,
+            "shutdown": self.shutdown,
+        }
+
+    def handle(self, message: str | bytes) -> dict[str, Any] | None:
+        """Returns the response to a request (or `None` if the request is a notification)."""
+        try:
+            request = json.loads(message)
+        except ValueError as err:
+            return _error_response(None, PARSE_ERROR, f"Invalid JSON: {err}")
+        if not (isinstance(request, dict) and isinstance(request.get("method"), str)):
+            return _error_response(None, INVALID_REQUEST, "Invalid request.")
+        request_id = request.get("id")
+        response = self._call(request["method"], request.get("params", {}))
+        if "id" not in request:
+            return None
+        return {"jsonrpc": "2.0", "id": request_id, **response}
+
+    def _call(self, method_name: str, params: Any) -> dict[str, Any]:
+        if (method := self._methods.get(method_name)) is None:
+            return _error(METHOD_NOT_FOUND, f"Unknown method: {method_name!r}")
+        try:
+            if isinstance(params, list):
+                inspect.signature(method).bind(*params)
+                args, kwargs = params, {}
+            else:
+                inspect.signature(method).bind(**params)
+                args, kwargs = [], params
+        except TypeError as err:
+            return _error(INVALID_PARAMS, f"Invalid params for {method_name!r}: {err}")
+
+        with self._lock:
+            logger.debug(f"Handling a request: {method_name}({params})")
+            start = time.perf_counter()
+            try:
+                result = method(*args, **kwargs)
+            except _Declined as err:
+                return _error(DECLINED, str(err))
+            except Exception as err:
+                logger.error(f"Error while handling a {method_name!r} request: {err}")
+                return _error(INTERNAL_ERROR, str(err))
+            finally:
+                logger.debug(
+                    f"Handled the request in {time.perf_counter() - start:.3f}s."
+                )
+                # Also keep track of the modules that were imported by this request.
+                self._update_module_stamps()
+        return {"result": result}
+
+    def ping(self, repo_root: str | None = None) -> dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "repo_root": str(self.repo_root),
+            "protocol": PROTOCOL_VERSION,
+        }
+
+    def add_schemas(
+        self,
+        repo_root: str,
+        configs_dir: str,
+        schemas_dir: str | None = None,
+        regen_schemas: bool = False,
+        stop_on_error: bool = False,
+        add_headers: bool | None = False,
+        jobs: int | Literal["auto"] = 1,
+        changed_files: list[str] | None = None,
+        vscode_associations: Literal["files", "globs"] = "files",
+        shared_target_schemas: bool = False,
+        config_store_nodes: list[str] | None = None,
+    ) -> dict[str, Any]:
+        """Calls `add_schemas_to_all_hydra_configs` with these arguments.
+
+        Parameters:
+            config_store_nodes: The configs in the ConfigStore of the client. The request is
+                declined if some of them aren't in the ConfigStore of the daemon.
+        """
+        self._check_can_handle(config_store_nodes)
+        start = time.perf_counter()
+        if regen_schemas:
+            self._target_schemas.clear()
+        with self._warm_scope(regen_schemas=regen_schemas):
+            add_schemas_to_all_hydra_configs(
+                repo_root=Path(repo_root),
+                configs_dir=Path(configs_dir),
+                schemas_dir=Path(schemas_dir) if schemas_dir is not None else None,
+                regen_schemas=regen_schemas,
+                stop_on_error=stop_on_error,
+                quiet=True,
+                add_headers=add_headers,
+                config_store=ConfigStore.instance(),
+                jobs=jobs,
+                changed_files=(
+                    [Path(f) for f in changed_files]
+                    if changed_files is not None
+                    else None
+                ),
+                vscode_associations=vscode_associations,
+                shared_target_schemas=shared_target_schemas,
+            )
+        return {"elapsed": time.perf_counter() - start}
+
+    def schema_for(
+        self,
+        repo_root: str,
+        configs_dir: str,
+        config_file: str,
+        shared_target_schemas: bool = False,
+        config_store_nodes: list[str] | None = None,
+    ) -> dict[str, Any]:
+        """Returns the schema of a config file, without writing anything.
+
+        Returns:
+            A dictionary with the `schema`, the `error` that occurred if the schema is partial,
+            and the `target_schemas` that the schema refers to (with `shared_target_schemas`).
+        """
+        self._check_can_handle(config_store_nodes)
+        with self._warm_scope():
+            result = get_schema_for_config_file(
+                Path(config_file),
+                configs_dir=Path(configs_dir),
+                repo_root=Path(repo_root),
+                shared_target_schemas=shared_target_schemas,
+            )
+        return {
+            "schema": result.schema,
+            "error": result.error,
+            "target_schemas": result.target_schemas,
+        }
+
+    def shutdown(self, repo_root: str | None = None) -> None:
+        self.stopped = True
+
+    @contextlib.contextmanager
+    def _warm_scope(self, regen_schemas: bool = False):
+        with (
+            _target_schema_cache_scope(
+                disk_cache=(
+                    TargetSchemaDiskCache(read=False)
+                    if regen_schemas
+                    else self._disk_cache
+                ),
+                cache=self._target_schemas,
+            ),
+            _config_loader_scope(self._config_loaders),
+        ):
+            yield
+
+    def _check_can_handle(self, config_store_nodes: list[str] | None) -> None:
+        if changed_modules := self._get_changed_modules():
+            self.restart = True
+            raise _Declined(
+                f"{len(changed_modules)} modules changed since they were imported by the daemon "
+                f"(e.g. {changed_modules[0]}). Restarting."
+            )
+        if config_store_nodes is not None:
+            nodes = {
+                path
+                for path, _ in _iter_config_store_nodes(ConfigStore.instance().repo)
+            }
+            if missing := sorted(set(config_store_nodes) - nodes):
+                raise _Declined(
+                    f"The ConfigStore of the daemon doesn't have {len(missing)} configs of the "
+                    f"client (e.g. {missing[0]}). Use `--import` to import the modules that "
+                    f"register them when starting the daemon."
+                )
+
+    def _get_changed_modules(self) -> list[str]:
+        return [
+            file
+            for file, stamp in self._module_stamps.items()
+            if _get_file_stamp(file) != stamp
+        ]
+
+    def _update_module_stamps(self) -> None:
+        for file in _get_module_files():
+            if file not in self._module_stamps and (stamp := _get_file_stamp(file)):
+                self._module_stamps[file] = stamp
+
+
+def serve(server: SchemaServer, socket_path: Path | None = None) -> None:
+    """Handles the requests sent to the Unix socket of the repo, until the daemon is stopped.
+
+    Raises:
+        RuntimeError: If a daemon is already listening on this socket.
+        PermissionError: If other users can access the directory of the socket.
+    """
+    socket_path = socket_path or get_socket_path(server.repo_root)
+    # Only the user can access the directory of the socket, so other users can't send requests to
+    # the daemon, or replace its socket with their own.
+    socket_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    check_socket_dir(socket_path.parent)
+    if socket_path.exists():
+        try:
+            info = call(socket_path, "ping", timeout=5)
+        except OSError:
+            # Left behind by a daemon that didn't exit cleanly.
+            socket_path.unlink()
+        else:
+            raise RuntimeError(
+                f"A daemon (pid {info['pid']}) is already running for {server.repo_root}."
+            )
+
+    class _Handler(socketserver.StreamRequestHandler):
+        def handle(self) -> None:
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                if (response := server.handle(line)) is not None:
+                    self.wfile.write(json.dumps(response).encode() + b"\n")
+                    self.wfile.flush()
+                if server.stopped or server.restart:
+                    # NOTE: `shutdown` waits for `serve_forever` to return, so it has to be
+                    # called from another thread than the one running `serve_forever`.
+                    threading.Thread(target=unix_server.shutdown).start()
+                    return
+
+    # Only the user can send requests to the daemon: the socket is created with these permissions,
+    # rather than changing them after it was created.
+    umask = os.umask(0o177)
+    try:
+        unix_server = socketserver.ThreadingUnixStreamServer(str(socket_path), _Handler)
+    finally:
+        os.umask(umask)
+    unix_server.daemon_threads = True
+    try:
+        logger.info(f"Listening for requests on {socket_path}")
+        unix_server.serve_forever()
+    finally:
+        unix_server.server_close()
+        socket_path.unlink(missing_ok=True)
+
+
+def serve_stdio(
+    server: SchemaServer,
+    stdin: IO[bytes] | None = None,
+    stdout: IO[bytes] | None = None,
+) -> None:
+    """Handles the requests read from stdin, and writes the responses to stdout.
+
+    Stops at the end of the input, when the daemon is stopped, or when it needs to restart (the
+    process that started it should then start a new one).
+    """
+    stdin = stdin or sys.stdin.buffer
+    stdout = stdout or sys.stdout.buffer
+    # Anything else that would be printed (e.g. logs) would corrupt the responses.
+    with contextlib.redirect_stdout(sys.stderr):
+        for line in stdin:
+            if not line.strip():
+                continue
+            if (response := server.handle(line)) is not None:
+                stdout.write(json.dumps(response).encode() + b"\n")
+                stdout.flush()
+            if server.stopped or server.restart:
+                return
+
+
+def _error(code: int, message: str) -> dict[str, Any]:
+    return {"error": {"code": code, "message": message}}
+
+
+def _error_response(request_id: Any, code: int, message: str) -> dict[str, Any]:
+    return {"jsonrpc": "2.0", "id": request_id, **_error(code, message)}
+
+
+def _get_module_files() -> list[str]:
+    """Returns the source files of the imported modules that aren't part of the Python install."""
+    prefixes = tuple({sys.prefix, sys.base_prefix, sys.exec_prefix})
+    files = []
+    for module in list(sys.modules.values()):
+        file = getattr(module, "__file__", None)
+        if isinstance(file, str) and not file.startswith(prefixes):
+            files.append(file)
+    return files
+
+
+def _get_file_stamp(file: str) -> _FileStamp | None:
+    try:
+        stat = os.stat(file)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
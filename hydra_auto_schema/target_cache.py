@@ -0,0 +1,295 @@
+"""Persistent on-disk cache of the schemas of `_target_`s, shared across runs.
+
+Each entry records the source files of the target, of its base classes and of the classes in its
+annotations (whose schemas are part of the schema of the target). An entry is only used if these
+files are unchanged, and if the installed versions of the libraries used to create the schemas are
+the same as when the entry was created. The customizations in `hydra_auto_schema.customize` are
+part of the key of the entries (see `_get_registries_fingerprint`). This makes it possible to
+reuse the schema of a target without even importing it.
+
+The cache is stored in `$HYDRA_AUTO_SCHEMA_CACHE_DIR` if set, otherwise in
+`$XDG_CACHE_HOME/hydra-auto-schema` (`~/.cache/hydra-auto-schema` by default).
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import functools
+import hashlib
+import importlib.metadata
+import inspect
+import json
+import os
+import typing
+from logging import getLogger as get_logger
+from pathlib import Path
+from typing import Any
+
+from hydra_auto_schema import customize
+from hydra_auto_schema.hydra_schema import ObjectSchema, Schema
+from hydra_auto_schema.manifest import FileFingerprint
+from hydra_auto_schema.utils import atomic_write_text
+
+logger = get_logger(__name__)
+
+_CACHE_FORMAT_VERSION = 2
+"""Version of the format of the cache entries and of the way the schemas are created.
+
+Bump this when changing how the target schemas are generated, to invalidate existing entries.
+"""
+
+
+def get_default_cache_dir() -> Path:
+    if cache_dir := os.environ.get("HYDRA_AUTO_SCHEMA_CACHE_DIR"):
+        return Path(cache_dir)
+    xdg_cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(xdg_cache_home) / "hydra-auto-schema"
+
+
+class TargetSchemaDiskCache:
+    """Stores the schemas of targets on disk, one file per target."""
+
+    def __init__(self, cache_dir: Path | None = None, read: bool = True):
+        """
+        Parameters:
+            cache_dir: The cache directory. Defaults to `get_default_cache_dir()`.
+            read: Whether to use the existing entries. If False, entries are only written.
+        """
+        self.cache_dir = cache_dir or get_default_cache_dir()
+        self.read = read
+        # Fingerprint of the environment, computed once since it doesn't change during a run.
+        self._environment = _get_environment_fingerprint()
+
+    def get(self, key: Any) -> ObjectSchema | Schema | None:
+        """Returns the cached schema for this key, if there is a valid entry."""
+        if not self.read:
+            return None
+        entry_file = self._entry_file(key)
+        try:
+            entry = json.loads(entry_file.read_text())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as exc:
+            logger.debug(
+                f"Ignoring invalid target schema cache entry {entry_file}: {exc}"
+            )
+            return None
+
+        if entry.get("environment") != self._environment:
+            return None
+        try:
+            for source_file, fingerprint in entry["sources"].items():
+                source_path = Path(source_file)
+                try:
+                    stat = source_path.stat()
+                except OSError:
+                    return None
+                if FileFingerprint(**fingerprint).check(source_path, stat) is None:
+                    logger.debug(
+                        f"Source file {source_file} of {entry['target']} changed."
+                    )
+                    return None
+            return entry["schema"]
+        except (KeyError, TypeError) as exc:
+            logger.debug(
+                f"Ignoring invalid target schema cache entry {entry_file}: {exc}"
+            )
+            return None
+
+    def set(self, key: Any, target: Any, schema: ObjectSchema | Schema) -> None:
+        """Stores the schema of the given target (the imported object) in the cache."""
+        sources: dict[str, Any] = {}
+        for source_file in _get_source_files(target):
+            try:
+                fingerprint = FileFingerprint.of(source_file)
+            except OSError:
+                continue
+            sources[str(source_file)] = {
+                "sha256": fingerprint.sha256,
+                "size": fingerprint.size,
+                "mtime_ns": fingerprint.mtime_ns,
+            }
+        entry = {
+            "target": str(key[0]) if isinstance(key, tuple) else str(key),
+            "environment": self._environment,
+            "sources": sources,
+            "schema": schema,
+        }
+        entry_file = self._entry_file(key)
+        try:
+            entry_file.parent.mkdir(exist_ok=True, parents=True)
+            atomic_write_text(entry_file, json.dumps(entry))
+        except (OSError, TypeError, ValueError) as exc:
+            logger.debug(
+                f"Unable to write the target schema cache entry {entry_file}: {exc}"
+            )
+
+    def _entry_file(self, key: Any) -> Path:
+        digest = hashlib.sha256(repr(key).encode()).hexdigest()
+        return self.cache_dir / "targets" / digest[:2] / f"{digest}.json"
+
+
+def _get_source_files(target: Any) -> list[Path]:
+    """Returns the source files of the target, and of the classes used in its schema.
+
+    The schema of a target also includes the schemas of the types in its annotations (for example
+    a dataclass parameter defined in another module ends up in `$defs`), so these classes, their
+    base classes and the types in their own annotations are also included.
+    """
+    source_files: list[Path] = []
+    for obj in _get_schema_objects(target):
+        try:
+            source_file = inspect.getsourcefile(obj)
+        except TypeError:
+            # Builtin class or function.
+            continue
+        if source_file and (path := Path(source_file).resolve()) not in source_files:
+            source_files.append(path)
+    return source_files
+
+
+def _get_schema_objects(target: Any) -> list[Any]:
+    """Returns the target, its base classes and the classes that can appear in its schema."""
+    objects: list[Any] = []
+    seen: set[int] = set()
+    to_visit = [target]
+    while to_visit:
+        obj = to_visit.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        objects.append(obj)
+        if inspect.isclass(obj):
+            to_visit.extend(inspect.getmro(obj)[1:])
+        if obj is target or _has_fields_in_schema(obj):
+            to_visit.extend(_get_annotated_classes(obj))
+    return objects
+
+
+def _has_fields_in_schema(cls: Any) -> bool:
+    """Whether pydantic includes the schemas of the fields of this class in the schema."""
+    return inspect.isclass(cls) and (
+        dataclasses.is_dataclass(cls)
+        or typing.is_typeddict(cls)
+        or hasattr(cls, "model_fields")  # pydantic models.
+        or (issubclass(cls, tuple) and hasattr(cls, "_fields"))  # named tuples.
+    )
+
+
+def _get_annotated_classes(obj: Any) -> list[type]:
+    """Returns the classes in the annotations of the object (or of its `__init__`)."""
+    annotated = [obj, obj.__init__] if inspect.isclass(obj) else [obj]
+    classes: list[type] = []
+    for annotated_obj in annotated:
+        try:
+            hints = typing.get_type_hints(annotated_obj)
+        except Exception:
+            # Unresolvable forward references, or an object that can't have annotations.
+            continue
+        to_visit = list(hints.values())
+        while to_visit:
+            hint = to_visit.pop()
+            if inspect.isclass(hint):
+                classes.append(hint)
+            to_visit.extend(typing.get_args(hint))
+            if (origin := typing.get_origin(hint)) is not None:
+                to_visit.append(origin)
+    return classes
+
+
+@functools.cache
+def _get_library_versions() -> dict[str, str]:
+    versions: dict[str, str] = {}
+    for distribution in [
+        "pydantic",
+        "hydra-zen",
+        "docstring-parser",
+        "hydra-auto-schema",
+    ]:
+        try:
+            versions[distribution] = importlib.metadata.version(distribution)
+        except importlib.metadata.PackageNotFoundError:
+            versions[distribution] = "unknown"
+    return versions
+
+
+def _get_registries_fingerprint() -> str:
+    """Returns a fingerprint of the customizations in `hydra_auto_schema.customize`."""
+    return hashlib.sha256(
+        repr(
+            [
+                sorted(
+                    (_qualified_name(k), _stable_repr(v))
+                    for k, v in customize.custom_hydra_zen_builds_args.items()
+                ),
+                sorted(
+                    (_qualified_name(k), _qualified_name(v))
+                    for k, v in customize.custom_enum_schemas.items()
+                ),
+                sorted(
+                    (k, _qualified_name(v))
+                    for k, v in customize.schema_conflict_handlers.items()
+                ),
+                sorted(
+                    (entry_point.group, entry_point.name, entry_point.value)
+                    for group in (
+                        customize.BUILDS_ARGS_ENTRY_POINT_GROUP,
+                        customize.ENUM_SCHEMAS_ENTRY_POINT_GROUP,
+                    )
+                    for entry_point in customize._get_entry_points(group)
+                ),
+            ]
+        ).encode()
+    ).hexdigest()
+
+
+def _get_environment_fingerprint() -> dict[str, Any]:
+    # NOTE: The customizations aren't included, since they are already part of the key.
+    return {
+        "format": _CACHE_FORMAT_VERSION,
+        "versions": _get_library_versions(),
+    }
+
+
+def _stable_repr(value: Any) -> str:
+    """Returns a representation of the value that is the same in every process.
+
+    Classes and functions are represented by their qualified names, since their `repr` contains
+    their address in memory. This also applies to the classes and functions in containers.
+
+    >>> _stable_repr({"zen_exclude": ["a"], "builds_bases": (Path,), "zen_wrappers": print})
+    "{'builds_bases': (pathlib.Path,), 'zen_exclude': ['a'], 'zen_wrappers': builtins.print}"
+    """
+    if isinstance(value, dict):
+        items = sorted(
+            f"{_stable_repr(k)}: {_stable_repr(v)}" for k, v in value.items()
+        )
+        return "{" + ", ".join(items) + "}"
+    if isinstance(value, list):
+        return "[" + ", ".join(_stable_repr(v) for v in value) + "]"
+    if isinstance(value, tuple):
+        trailing_comma = "," if len(value) == 1 else ""
+        return "(" + ", ".join(_stable_repr(v) for v in value) + trailing_comma + ")"
+    if isinstance(value, set | frozenset):
+        return "{" + ", ".join(sorted(_stable_repr(v) for v in value)) + "}"
+    if isinstance(value, functools.partial):
+        return (
+            f"functools.partial({_stable_repr(value.func)}, {_stable_repr(value.args)}, "
+            f"{_stable_repr(value.keywords)})"
+        )
+    if inspect.isclass(value) or inspect.isroutine(value):
+        return _qualified_name(value)
+    if callable(value):
+        # Some other callable object, whose repr probably contains its address.
+        return _qualified_name(type(value))
+    return repr(value)
+
+
+def _qualified_name(obj: Any) -> str:
+    if isinstance(obj, str):
+        return obj
+    module = getattr(obj, "__module__", None)
+    name = getattr(obj, "__qualname__", None) or getattr(obj, "__name__", None)
+    if module and name:
+        return f"{module}.{name}"
+    return repr(obj)
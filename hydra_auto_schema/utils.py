@@ -1,5 +1,11 @@
+import contextlib
 import copy
+import functools
 import inspect
+import math
+import os
+import stat
+import tempfile
 from pathlib import Path
 from typing import Callable, Mapping, MutableMapping, TypeVar, cast
 
@@ -41,16 +47,99 @@ def pretty_path(path: Path) -> str:
     )
 
 
+def atomic_write_text(path: Path, text: str) -> None:
+    """Writes the text to the file atomically, by writing to a temporary file and renaming it.
+
+    This way, readers of the file (e.g. the editor) never see a partially written file.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        # Keep the permissions of the existing file (the temporary file is only readable by us).
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            mode = 0o644
+        os.chmod(temp_path, mode)
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(temp_path)
+        raise
+
+
+def write_text_if_changed(path: Path, text: str) -> bool:
+    """Writes the text to the file atomically, unless the file already has these contents.
+
+    Returns:
+        Whether the file was written.
+    """
+    data = text.encode()
+    try:
+        # Only read the file if it has the same size.
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except OSError:
+        pass
+    atomic_write_text(path, text)
+    return True
+
+
+def get_available_cpus() -> int:
+    """Returns the number of CPUs that this process is allowed to use.
+
+    This takes into account the CPU affinity of the process (e.g. set by `taskset` or SLURM), the
+    CPU quota of the cgroup (e.g. in containers), and the `SLURM_CPUS_PER_TASK` environment
+    variable.
+
+    >>> get_available_cpus() >= 1
+    True
+    """
+    if hasattr(os, "sched_getaffinity"):
+        num_cpus = len(os.sched_getaffinity(0))
+    else:
+        num_cpus = os.cpu_count() or 1
+
+    if slurm_cpus_per_task := os.environ.get("SLURM_CPUS_PER_TASK"):
+        with contextlib.suppress(ValueError):
+            num_cpus = min(num_cpus, int(slurm_cpus_per_task))
+
+    if (cgroup_cpu_quota := _get_cgroup_cpu_quota()) is not None:
+        num_cpus = min(num_cpus, math.ceil(cgroup_cpu_quota))
+
+    return max(1, num_cpus)
+
+
+def _get_cgroup_cpu_quota() -> float | None:
+    """Returns the CPU quota of the current cgroup (as a number of CPUs), if there is one."""
+    # cgroup v2: "<quota> <period>" or "max <period>"
+    with contextlib.suppress(OSError, ValueError):
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota == "max":
+            return None
+        return int(quota) / int(period)
+    # cgroup v1: quota of -1 means no limit.
+    with contextlib.suppress(OSError, ValueError):
+        quota = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read_text())
+        period = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read_text())
+        if quota <= 0 or period <= 0:
+            return None
+        return quota / period
+    return None
+
+
 def merge_dicts(
     a: NestedMapping[K1, V1],
     b: NestedMapping[K2, V2],
     conflict_handler: Callable[[V1, V2], V1 | V2] | None = None,
     conflict_handlers: dict[str, Callable[[V1, V2], V1 | V2]] | None = None,
-    _path: list[str] = [],
 ) -> NestedMapping[K1 | K2, V1 | V2]:
     """Merge two nested dictionaries.
 
-    NOTE: performs a deep copy of `a` and of values in `b`.
+    NOTE: Nothing is copied, except the dictionaries in which values are merged (including the
+    result itself). The other values, including nested dictionaries, are shared with `a` and `b`:
+    modifying them in the result also modifies them in `a` or `b`.
 
     >>> x = dict(b=1, c=dict(d=2, e=3))
     >>> y = dict(d=3, c=dict(z=2, f=4))
@@ -61,6 +150,11 @@ def merge_dicts(
     >>> y
     {'d': 3, 'c': {'z': 2, 'f': 4}}
 
+    The nested dictionaries that don't need to be merged are shared with the inputs:
+
+    >>> merge_dicts(x, {'g': y})['g'] is y, merge_dicts(x, {'g': y})['c'] is x['c']
+    (True, True)
+
     If keys are in both dicts and no conflict handler is passed, an error is raised:
     >>> merge_dicts({'a': {'b': 1, 'c': 5}}, {'a': {'b': 2}})
     Traceback (most recent call last):
@@ -86,13 +180,82 @@ def merge_dicts(
     ... )
     {'a': {'b': 3, 'c': -1, 'd': 12}}
     """
-    conflict_handlers = conflict_handlers or {}
-    out: NestedMapping[K1 | K2, V1 | V2] = copy.deepcopy(a)  # type: ignore
+    handlers = tuple((conflict_handlers or {}).items())
+    try:
+        compiled_handlers = _compile_conflict_handlers(handlers)
+    except TypeError:
+        # Some handlers aren't hashable.
+        compiled_handlers = _ConflictHandlers(dict(handlers))
+    try:
+        return _merge_dicts(
+            a,
+            b,
+            conflict_handler=conflict_handler,
+            conflict_handlers=compiled_handlers,
+        )
+    except _MergeConflict as conflict:
+        raise Exception("Conflict at " + ".".join(conflict.path)) from None
+
+
+class _MergeConflict(Exception):
+    """Raised by `_merge_dicts` when values conflict and there is no handler for them."""
+
+    def __init__(self, key: str):
+        super().__init__(key)
+        self.path = [key]
+        """The keys leading to the conflicting values, filled in as the error propagates."""
+
+
+class _ConflictHandlers:
+    """The conflict handlers that apply to the values of a dictionary in `merge_dicts`.
+
+    Keys of `handlers` are either a key or a dotted path, relative to this dictionary. The handlers
+    of the nested dictionaries are computed once per key, then reused (`child`), instead of being
+    recomputed every time `merge_dicts` recurses. When no path starts with a key, the nested
+    dictionary has the same handlers as its parent.
+    """
+
+    __slots__ = ("handlers", "_first_keys", "_children")
+
+    def __init__(self, handlers: dict[str, Callable]):
+        self.handlers = handlers
+        self._first_keys = {k.partition(".")[0] for k in handlers if "." in k}
+        self._children: dict[str, _ConflictHandlers] = {}
+
+    def child(self, key: str) -> "_ConflictHandlers":
+        """Returns the conflict handlers of the dictionary at `key`."""
+        if key not in self._first_keys and "." not in key:
+            return self
+        if (child := self._children.get(key)) is None:
+            prefix = f"{key}."
+            child = self._children[key] = _ConflictHandlers(
+                {k.removeprefix(prefix): v for k, v in self.handlers.items()}
+            )
+        return child
+
+
+@functools.lru_cache(maxsize=16)
+def _compile_conflict_handlers(
+    handlers: tuple[tuple[str, Callable], ...],
+) -> _ConflictHandlers:
+    """Returns the compiled handlers, which are reused by the calls to `merge_dicts` with the same
+    handlers (usually `schema_conflict_handlers`)."""
+    return _ConflictHandlers(dict(handlers))
+
+
+def _merge_dicts(
+    a: NestedMapping[K1, V1],
+    b: NestedMapping[K2, V2],
+    conflict_handler: Callable[[V1, V2], V1 | V2] | None,
+    conflict_handlers: _ConflictHandlers,
+) -> NestedMapping[K1 | K2, V1 | V2]:
+    # Only a shallow copy: the values that aren't merged are shared with `a` and `b`.
+    out: NestedMapping[K1 | K2, V1 | V2] = copy.copy(a)  # type: ignore
     for key in b:
         b_val: V2 | NestedMapping[K2, V2] = b[key]
 
         if key not in a:
-            out[key] = copy.deepcopy(b_val)  # type: ignore
+            out[key] = b_val  # type: ignore
             continue
 
         # Type checker doesn't get that `key in a` := `isinstance(key, V1)` yet.
@@ -103,25 +266,24 @@ def merge_dicts(
             # Type checker doesn't narrow `a_val` or `b_val` to `NestedMapping` yet.
             a_val = cast(NestedMapping[K1, V1], a_val)
             b_val = cast(NestedMapping[K2, V2], b_val)
-            out[key] = merge_dicts(
-                a_val,
-                b_val,
-                conflict_handlers={
-                    # k: v
-                    k.removeprefix(f"{key}."): v
-                    for k, v in (conflict_handlers or {}).items()
-                },
-                conflict_handler=conflict_handler,
-                _path=_path + [str(key)],
-            )
+            try:
+                out[key] = _merge_dicts(
+                    a_val,
+                    b_val,
+                    conflict_handler=conflict_handler,
+                    conflict_handlers=conflict_handlers.child(str(key)),
+                )
+            except _MergeConflict as conflict:
+                conflict.path.insert(0, str(key))
+                raise
         elif a_val != b_val:
             # Type checker doesn't narrow `a_val` to `V1` or `b_val` to `V2` yet.
             a_val = cast(V1, a_val)
             b_val = cast(V2, b_val)
-            if specific_conflict_handler := conflict_handlers.get(str(key)):
+            if specific_conflict_handler := conflict_handlers.handlers.get(str(key)):
                 out[key] = specific_conflict_handler(a_val, b_val)
             elif conflict_handler:
                 out[key] = conflict_handler(a_val, b_val)
             else:
-                raise Exception("Conflict at " + ".".join(_path + [str(key)]))
+                raise _MergeConflict(str(key))
     return out
@@ -0,0 +1,329 @@
+"""Reads and updates the `.vscode/settings.json` file of a repository.
+
+VsCode settings files are JSON with comments (JSONC) and may contain trailing commas. The settings
+are parsed once and kept in memory. Changes to the schema associations are batched and applied to
+the text of the file with targeted edits, so the comments and formatting of the rest of the file
+are preserved. The file is only written (atomically) when its contents actually change.
+"""
+
+from __future__ import annotations
+
+import copy
+import dataclasses
+import json
+from logging import getLogger as get_logger
+from pathlib import Path
+from typing import Any
+
+from hydra_auto_schema.utils import atomic_write_text
+
+logger = get_logger(__name__)
+
+YAML_SCHEMAS_SETTING = "yaml.schemas"
+
+
+class VscodeSettingsFile:
+    """The VsCode settings file of a repository, with pending changes to the `yaml.schemas`.
+
+    The file is only read again if it was modified since it was last read or written.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._text: str | None = None
+        self._stamp: tuple[int, int] | None = None
+        self._settings: dict[str, Any] = {}
+        self._changes: dict[str, Any] = {}
+
+    @classmethod
+    def for_repo(cls, repo_root: Path) -> VscodeSettingsFile:
+        return cls(repo_root / ".vscode" / "settings.json")
+
+    @property
+    def settings(self) -> dict[str, Any]:
+        """The settings, including the pending changes."""
+        self._load()
+        return {**self._settings, **self._changes}
+
+    def add_schemas(self, config_file_to_schema_file: dict[Path, Path]) -> None:
+        """Associates each schema file with its config file (applied on the next `flush`)."""
+        if not config_file_to_schema_file:
+            return
+        self._setdefault("redhat.telemetry.enabled", False)
+        yaml_schemas = self._get_yaml_schemas()
+        for config_file, schema_file in config_file_to_schema_file.items():
+            schema_key = self._schema_key(schema_file)
+            files = _as_list(yaml_schemas.get(schema_key))
+            yaml_schemas[schema_key] = _from_list(
+                sorted(set(files + [str(config_file.absolute())]))
+            )
+        self._set(YAML_SCHEMAS_SETTING, yaml_schemas)
+
+    def remove_schemas(self, config_file_to_schema_file: dict[Path, Path]) -> None:
+        """Removes the associations of these config files with their schema files."""
+        yaml_schemas = self._get_yaml_schemas()
+        for config_file, schema_file in config_file_to_schema_file.items():
+            schema_key = self._schema_key(schema_file)
+            files = [
+                f
+                for f in _as_list(yaml_schemas.get(schema_key))
+                if f not in (str(config_file), str(config_file.absolute()))
+            ]
+            if files:
+                yaml_schemas[schema_key] = _from_list(files)
+            else:
+                yaml_schemas.pop(schema_key, None)
+        self._set(YAML_SCHEMAS_SETTING, yaml_schemas)
+
+    def set_schema_associations(
+        self, associations: dict[Path, list[str]], schemas_dir: Path
+    ) -> None:
+        """Replaces the associations of all the schema files in `schemas_dir`.
+
+        Parameters:
+            associations: The file paths or glob patterns to associate with each schema file.
+            schemas_dir: The directory with the schema files. The existing associations of other
+                schema files are kept.
+        """
+        self._setdefault("redhat.telemetry.enabled", False)
+        yaml_schemas = self._get_yaml_schemas()
+        for schema_key in list(yaml_schemas):
+            schema_file = self.path.parent.parent / schema_key
+            if schema_file.parent.resolve() == schemas_dir.resolve():
+                yaml_schemas.pop(schema_key)
+        for schema_file, patterns in sorted(associations.items()):
+            yaml_schemas[self._schema_key(schema_file)] = _from_list(sorted(patterns))
+        self._set(YAML_SCHEMAS_SETTING, yaml_schemas)
+
+    def flush(self) -> bool:
+        """Writes the pending changes to the file.
+
+        Returns:
+            Whether the file was written (False when there was nothing to change).
+        """
+        self._load()
+        changes, self._changes = self._changes, {}
+        assert self._text is not None
+        text = self._text
+        for key, value in changes.items():
+            text = _set_member(text, key, value)
+        self._settings.update(changes)
+        if text == self._text:
+            return False
+        logger.debug(f"Updating the vscode settings file at {self.path}.")
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        atomic_write_text(self.path, text)
+        self._text = text
+        self._stamp = _get_stamp(self.path)
+        return True
+
+    def _load(self) -> None:
+        stamp = _get_stamp(self.path)
+        if self._text is not None and stamp == self._stamp:
+            return
+        logger.debug(f"Reading the vscode settings file at {self.path}.")
+        text = self.path.read_text() if stamp is not None else ""
+        settings = loads_jsonc(text) if text.strip() else {}
+        if not isinstance(settings, dict):
+            raise TypeError(f"The vscode settings in {self.path} are not an object.")
+        self._text, self._stamp, self._settings = text, stamp, settings
+
+    def _get_yaml_schemas(self) -> dict[str, str | list[str]]:
+        yaml_schemas = self.settings.get(YAML_SCHEMAS_SETTING) or {}
+        if not isinstance(yaml_schemas, dict):
+            raise TypeError(
+                f"The {YAML_SCHEMAS_SETTING!r} setting in {self.path} is not an object."
+            )
+        return copy.deepcopy(yaml_schemas)
+
+    def _schema_key(self, schema_file: Path) -> str:
+        return str(schema_file.relative_to(self.path.parent.parent))
+
+    def _set(self, key: str, value: Any) -> None:
+        if key in self._settings and self._settings[key] == value:
+            self._changes.pop(key, None)
+        else:
+            self._changes[key] = value
+
+    def _setdefault(self, key: str, value: Any) -> None:
+        if key not in self.settings:
+            self._changes[key] = value
+
+
+def _as_list(files: str | list[str] | None) -> list[str]:
+    if files is None:
+        return []
+    return [files] if isinstance(files, str) else list(files)
+
+
+def _from_list(files: list[str]) -> str | list[str]:
+    return files[0] if len(files) == 1 else files
+
+
+def _get_stamp(path: Path) -> tuple[int, int] | None:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def loads_jsonc(text: str) -> Any:
+    """Parses JSON with comments and trailing commas (the format of the vscode settings files)."""
+    parts: list[str] = []
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char == '"':
+            end = _string_end(text, i)
+            parts.append(text[i:end])
+            i = end
+        elif text.startswith("//", i) or text.startswith("/*", i):
+            i = _comment_end(text, i)
+        elif (
+            char == ","
+            and _skip_ignored(text, i + 1) < len(text)
+            and (text[_skip_ignored(text, i + 1)] in "}]")
+        ):
+            # Trailing comma.
+            i += 1
+        else:
+            parts.append(char)
+            i += 1
+    return json.loads("".join(parts))
+
+
+@dataclasses.dataclass(frozen=True)
+class _Member:
+    key: str
+    value_start: int
+    value_end: int
+    comma: int | None
+    """Position of the comma after the value, if there is one."""
+
+
+def _set_member(text: str, key: str, value: Any) -> str:
+    """Sets the value of a member of the top-level object, preserving the rest of the text."""
+    if not text.strip():
+        text = "{}\n"
+    _, root_end, members = _scan_members(text)
+    indent = _detect_indent(text)
+    rendered_value = json.dumps(value, indent=indent).replace("\n", "\n" + indent)
+    for member in members:
+        if member.key == key:
+            return (
+                text[: member.value_start] + rendered_value + text[member.value_end :]
+            )
+
+    new_member = f"{json.dumps(key)}: {rendered_value}"
+    if not members:
+        before = text[:root_end].rstrip()
+        return before + "\n" + indent + new_member + "\n" + text[root_end:]
+    last = members[-1]
+    if last.comma is not None:
+        # Keep the trailing comma style of the file.
+        position = last.comma + 1
+        return text[:position] + "\n" + indent + new_member + "," + text[position:]
+    position = last.value_end
+    return text[:position] + ",\n" + indent + new_member + text[position:]
+
+
+def _scan_members(text: str) -> tuple[int, int, list[_Member]]:
+    """Finds the members of the top-level object in the JSONC text.
+
+    Returns:
+        The positions of the opening and closing braces of the object, and its members.
+    """
+    root_start = _skip_ignored(text, 0)
+    if root_start >= len(text) or text[root_start] != "{":
+        raise ValueError("Expected a JSON object.")
+    members: list[_Member] = []
+    i = _skip_ignored(text, root_start + 1)
+    while i < len(text) and text[i] != "}":
+        if text[i] != '"':
+            raise ValueError(f"Expected a string at position {i}.")
+        key_end = _string_end(text, i)
+        key = json.loads(text[i:key_end])
+        i = _skip_ignored(text, key_end)
+        if i >= len(text) or text[i] != ":":
+            raise ValueError(f"Expected ':' at position {i}.")
+        value_start = _skip_ignored(text, i + 1)
+        value_end = _value_end(text, value_start)
+        i = _skip_ignored(text, value_end)
+        comma = None
+        if i < len(text) and text[i] == ",":
+            comma = i
+            i = _skip_ignored(text, i + 1)
+        members.append(_Member(key, value_start, value_end, comma))
+    if i >= len(text):
+        raise ValueError("Unterminated JSON object.")
+    return root_start, i, members
+
+
+def _value_end(text: str, i: int) -> int:
+    if i >= len(text):
+        raise ValueError("Expected a value.")
+    if text[i] == '"':
+        return _string_end(text, i)
+    if text[i] not in "{[":
+        end = i
+        while end < len(text) and text[end] not in ",}] \t\r\n/":
+            end += 1
+        return end
+    depth = 0
+    while i < len(text):
+        char = text[i]
+        if char == '"':
+            i = _string_end(text, i)
+            continue
+        if text.startswith("//", i) or text.startswith("/*", i):
+            i = _comment_end(text, i)
+            continue
+        if char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    raise ValueError("Unterminated JSON value.")
+
+
+def _string_end(text: str, i: int) -> int:
+    """Returns the position after the end of the string that starts at position `i`."""
+    i += 1
+    while i < len(text):
+        if text[i] == "\\":
+            i += 2
+        elif text[i] == '"':
+            return i + 1
+        else:
+            i += 1
+    raise ValueError("Unterminated string.")
+
+
+def _comment_end(text: str, i: int) -> int:
+    if text.startswith("//", i):
+        end = text.find("\n", i)
+        return len(text) if end == -1 else end
+    end = text.find("*/", i + 2)
+    return len(text) if end == -1 else end + 2
+
+
+def _skip_ignored(text: str, i: int) -> int:
+    """Skips the whitespace and comments starting at position `i`."""
+    while i < len(text):
+        if text[i].isspace():
+            i += 1
+        elif text.startswith("//", i) or text.startswith("/*", i):
+            i = _comment_end(text, i)
+        else:
+            break
+    return i
+
+
+def _detect_indent(text: str) -> str:
+    for line in text.splitlines()[1:]:
+        if line.strip() and (indent := line[: len(line) - len(line.lstrip())]):
+            return indent
+    return " " * 2
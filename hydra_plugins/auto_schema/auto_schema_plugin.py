@@ -1,8 +1,14 @@
 import importlib
 import logging
+import multiprocessing.spawn
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
 import typing
 from pathlib import Path
-from typing import ClassVar
+from typing import Any, Callable, ClassVar, Literal, Sequence
 import warnings
 
 import hydra.core.plugins
@@ -11,22 +17,65 @@ from hydra.core.config_search_path import ConfigSearchPath
 from hydra.core.config_store import ConfigStore  # noqa
 from hydra.plugins.search_path_plugin import SearchPathPlugin
 
-from hydra_auto_schema.auto_schema import add_schemas_to_all_hydra_configs, logger
+# NOTE: `hydra_auto_schema.auto_schema` (and pydantic, etc.) is only imported when the schemas need
+# to be updated, so that the plugin doesn't slow down the start of the app when nothing changed.
+from hydra_auto_schema import client
+from hydra_auto_schema.config_store import _iter_config_store_nodes
+from hydra_auto_schema.manifest import (
+    Manifest,
+    get_tree_fingerprint,
+    load_tree_fingerprint,
+    save_tree_fingerprint,
+)
 
 # TODO: Perhaps this should be a different kind of plugin, one that has access to the structured
 # schemas within the hydra app, so it could be executed later when calling the `hydra.main`
 # function?
 
+logger = logging.getLogger("hydra_auto_schema.auto_schema")
+
 
 def register_auto_schema_plugin():
     hydra.core.plugins.Plugins.instance().register(AutoSchemaPlugin)
 
 
+def add_schemas_to_all_hydra_configs(
+    repo_root: Path,
+    configs_dir: Path,
+    schemas_dir: Path | None = None,
+    regen_schemas: bool = False,
+    stop_on_error: bool = False,
+    quiet: bool = False,
+    add_headers: bool | None = False,
+    config_store: ConfigStore | None = None,
+    jobs: int | Literal["auto"] = 1,
+    changed_files: Sequence[Path] | None = None,
+    vscode_associations: Literal["files", "globs"] = "files",
+    shared_target_schemas: bool = False,
+):
+    """Same as `hydra_auto_schema.auto_schema.add_schemas_to_all_hydra_configs`, which is only
+    imported when this is called."""
+    # NOTE: The signature is written out (rather than copied from the real function) so that the
+    # config of the plugin can be created without importing it. The tests check that both match.
+    kwargs = locals()
+    from hydra_auto_schema.auto_schema import (
+        add_schemas_to_all_hydra_configs as _add_schemas_to_all_hydra_configs,
+    )
+
+    _add_schemas_to_all_hydra_configs(**kwargs)
+
+
 @hydra_zen.hydrated_dataclass(
     add_schemas_to_all_hydra_configs,
     populate_full_signature=True,
     zen_partial=True,
-    zen_meta={"verbose": False, "disable": False},
+    zen_meta={
+        "verbose": False,
+        "disable": False,
+        "background": False,
+        "daemon": True,
+        "daemon_timeout": client.DEFAULT_TIMEOUT,
+    },
 )
 class AutoSchemaPluginConfig:
     """Config for the AutoSchemaPlugin."""
@@ -37,9 +86,15 @@ class AutoSchemaPluginConfig:
     quiet: bool = True
     add_headers: bool | None = False
     if typing.TYPE_CHECKING:
-        # These two fields are created by hydra-zen, but aren't passed to the function.
+        # These fields are created by hydra-zen, but aren't passed to the function.
         verbose: bool = False
         disable: bool = False
+        background: bool = False
+        """Generate the schemas in a separate process, without delaying the start of the app."""
+        daemon: bool = True
+        """Let the daemon of the repo (`hydra-auto-schema-serve`) do it, if it is running."""
+        daemon_timeout: float = client.DEFAULT_TIMEOUT
+        """Seconds to wait for the daemon, before adding the schemas without it."""
 
 
 config: AutoSchemaPluginConfig | None
@@ -68,16 +123,13 @@ class AutoSchemaPlugin(SearchPathPlugin):
         super().__init__()
         global config
         self.config = config if config is not None else AutoSchemaPluginConfig()
-        self.fn = hydra_zen.instantiate(self.config)
         self.cs = ConfigStore.instance()
 
         logger.debug(
             f"The AutoSchemaPlugin is being instantiated with the following config: {self.config}"
         )
         if self.config.verbose:
-            from hydra_auto_schema.auto_schema import logger as _logger
-
-            _logger.setLevel(logging.INFO)
+            logger.setLevel(logging.INFO)
 
     def manipulate_search_path(self, search_path: ConfigSearchPath) -> None:
         # IDEA: Try to get the configs dir and the repo root from the search path, and call the
@@ -145,8 +197,207 @@ class AutoSchemaPlugin(SearchPathPlugin):
                     f"and the configs directory at {configs_dir}!\n"
                     f"({repo_root.is_dir()=} and {configs_dir.is_dir()=})"
                 )
-            self.fn(
+            schemas_dir = self.config.schemas_dir or repo_root / ".schemas"
+            options = repr(self.config)
+            if not self.config.regen_schemas and load_tree_fingerprint(
+                schemas_dir
+            ) == get_tree_fingerprint(
+                configs_dir, schemas_dir, repo_root=repo_root, options=options
+            ):
+                # Fast path: Nothing changed since the last run, so the schemas are up to date.
+                logger.debug(f"No changes in {configs_dir} since the last run.")
+                continue
+
+            fn = hydra_zen.instantiate(self.config)
+            if self.config.background:
+                pid = _run_in_background(
+                    _add_schemas,
+                    fn=fn,
+                    repo_root=repo_root,
+                    configs_dir=configs_dir,
+                    schemas_dir=schemas_dir,
+                    options=options,
+                    use_daemon=self.config.daemon,
+                    daemon_timeout=self.config.daemon_timeout,
+                )
+                logger.debug(f"Generating the schemas in background process {pid}.")
+                continue
+            _add_schemas(
+                fn,
                 repo_root=repo_root,
                 configs_dir=configs_dir,
+                schemas_dir=schemas_dir,
+                options=options,
                 config_store=self.cs,
+                use_daemon=self.config.daemon,
+                daemon_timeout=self.config.daemon_timeout,
             )
+
+
+def _add_schemas(
+    fn: Callable[..., Any],
+    repo_root: Path,
+    configs_dir: Path,
+    schemas_dir: Path,
+    options: str,
+    config_store: ConfigStore | None = None,
+    use_daemon: bool = False,
+    daemon_timeout: float | None = None,
+) -> None:
+    """Adds the schemas, then saves the fingerprint of the configs for the fast path of next runs.
+
+    The fingerprint isn't saved if some schemas are partial, so they are retried next time. It also
+    isn't saved if a config file was modified while the schemas were being generated, so that the
+    modified config isn't skipped next time.
+    """
+    # NOTE: Taken before the schemas are generated: if nothing changes during the run, the
+    # fingerprint is the same after it.
+    fingerprint = get_tree_fingerprint(
+        configs_dir, schemas_dir, repo_root=repo_root, options=options
+    )
+    if not (
+        use_daemon
+        and _add_schemas_with_daemon(
+            fn, repo_root=repo_root, configs_dir=configs_dir, timeout=daemon_timeout
+        )
+    ):
+        fn(repo_root=repo_root, configs_dir=configs_dir, config_store=config_store)
+    manifest = Manifest.load(schemas_dir)
+    if any(entry.status == "partial" for entry in manifest.entries.values()):
+        return
+    new_fingerprint = get_tree_fingerprint(
+        configs_dir, schemas_dir, repo_root=repo_root, options=options
+    )
+    # The fingerprint also changes when the run writes schemas, headers or vscode settings. The
+    # new fingerprint can only be used if the config files weren't modified since they were loaded.
+    if new_fingerprint != fingerprint and not manifest.matches_config_files(configs_dir):
+        logger.debug(f"Configs in {configs_dir} changed while adding the schemas.")
+        return
+    save_tree_fingerprint(schemas_dir, new_fingerprint)
+
+
+def _add_schemas_with_daemon(
+    fn: Callable[..., Any],
+    repo_root: Path,
+    configs_dir: Path,
+    timeout: float | None = None,
+) -> bool:
+    """Asks the daemon of the repo to add the schemas, if it is running.
+
+    Returns:
+        Whether the daemon did it.
+    """
+    kwargs = {
+        key: client.to_json(value)
+        for key, value in getattr(fn, "keywords", {}).items()
+        if key not in ("config_store", "quiet")
+    }
+    handled, result = client.try_call(
+        repo_root,
+        "add_schemas",
+        timeout=timeout,
+        configs_dir=str(configs_dir),
+        # The daemon declines the request if it doesn't have the structured configs of the app.
+        config_store_nodes=[
+            path for path, _ in _iter_config_store_nodes(ConfigStore.instance().repo)
+        ],
+        **kwargs,
+    )
+    if handled:
+        logger.debug(f"The schemas were updated by the daemon in {result['elapsed']:.3f}s.")
+    return handled
+
+
+def _run_in_background(fn: Callable[..., Any], /, **kwargs) -> int | None:
+    """Calls `fn(**kwargs)` in a detached process, without waiting for it to finish.
+
+    The process has its own copy of the Hydra ConfigStore as it is at the time of this call, so
+    the Hydra app and the schema generation can't affect each other. The app doesn't wait for the
+    process when it exits. Background runs of different apps (or of the jobs of a multirun) take
+    turns, since they lock the schemas directory while generating the schemas.
+
+    Returns:
+        The process id of the background process, or None if this is already a background process.
+    """
+    if os.environ.get(_IN_BACKGROUND_PROCESS_ENV_VAR):
+        # The main module of the app is imported in the background process, which can run the app
+        # again if it isn't guarded with `if __name__ == "__main__":`.
+        logger.debug("Not starting a background process from a background process.")
+        return None
+    # NOTE: A new interpreter is started rather than a `multiprocessing` process, since
+    # multiprocessing joins its processes when the app exits (or terminates them if they are
+    # daemonic). Like with the "spawn" start method, the app can already have threads, so it isn't
+    # forked, and the process gets the `sys.path`, working directory and main module of the app
+    # before the arguments are unpickled (see `_background_main`).
+    # Only the ConfigStore is sent to the process: the rest of the Hydra state (plugins, config
+    # sources, OmegaConf resolvers) can't be pickled, and is recreated as needed in the process.
+    preparation_data = multiprocessing.spawn.get_preparation_data("hydra-auto-schema")
+    # The process doesn't connect back to the app, so it doesn't need the (unpicklable) authkey.
+    preparation_data.pop("authkey", None)
+    with tempfile.NamedTemporaryFile(
+        "wb", prefix="hydra-auto-schema-", suffix=".pkl", delete=False
+    ) as payload_file:
+        try:
+            pickle.dump(preparation_data, payload_file)
+            pickle.dump((ConfigStore.instance(), logger.level, fn, kwargs), payload_file)
+        except BaseException:
+            os.remove(payload_file.name)
+            raise
+    process = subprocess.Popen(
+        [sys.executable, "-c", _BACKGROUND_COMMAND, payload_file.name],
+        stdin=subprocess.DEVNULL,
+        env={**os.environ, _IN_BACKGROUND_PROCESS_ENV_VAR: "1"},
+        start_new_session=True,
+    )
+    _background_runs.append(process)
+    return process.pid
+
+
+_IN_BACKGROUND_PROCESS_ENV_VAR = "HYDRA_AUTO_SCHEMA_BACKGROUND_PROCESS"
+
+_BACKGROUND_COMMAND = (
+    "import sys; "
+    "from hydra_plugins.auto_schema.auto_schema_plugin import _background_main; "
+    "_background_main(sys.argv[1])"
+)
+
+
+def _background_main(payload_file: str) -> None:
+    """Entry point of the background process started by `_run_in_background`."""
+    try:
+        with open(payload_file, "rb") as f:
+            multiprocessing.spawn.prepare(pickle.load(f))
+            config_store, log_level, fn, kwargs = pickle.load(f)
+    finally:
+        os.remove(payload_file)
+    _run_with_config_store(config_store, log_level, fn, kwargs)
+
+
+def _run_with_config_store(
+    config_store: ConfigStore, log_level: int, fn: Callable[..., Any], kwargs: dict
+) -> None:
+    """Runs `fn(**kwargs)` in the background process, with the ConfigStore of the app."""
+    from hydra.core.singleton import Singleton  # noqa
+
+    from hydra_auto_schema.auto_schema import _get_hydra_state
+
+    Singleton.set_state(_get_hydra_state(config_store))
+    logger.setLevel(log_level)
+    try:
+        fn(**kwargs)
+    except Exception as err:
+        logger.error(f"Unable to add schemas to the Hydra configs: {err}")
+        raise SystemExit(1)
+
+
+def _wait_for_background_runs(timeout: float | None = None) -> None:
+    """Waits until the background processes started by the plugin are done."""
+    while _background_runs:
+        _background_runs.pop().wait(timeout)
+
+
+# HACK: Like `config` above, don't lose track of the running processes when Hydra re-executes this
+# module.
+if "_background_runs" not in globals():
+    _background_runs: list[subprocess.Popen] = []
+    """The background processes started by `_run_in_background`."""
@@ -1,20 +1,32 @@
+import copy
 import json
 import os
 import shutil
 import subprocess
 from pathlib import Path
+from unittest.mock import Mock
 
 import pytest
 import yaml
+from hydra.core.config_search_path import ConfigSearchPath
 from hydra.core.config_store import ConfigStore
+from hydra.core.plugins import Plugins
+from hydra.core.singleton import Singleton
+from hydra.plugins.search_path_plugin import SearchPathPlugin
 from pytest_regressions.file_regression import FileRegressionFixture
 
+from hydra_auto_schema import auto_schema
 from hydra_auto_schema.auto_schema import (
     _add_schema_header,
+    _build_config_search_path,
+    _create_config_search_path,
     _create_schema_for_config,
+    _target_schema_cache_scope,
     _try_to_install_yaml_vscode_extension,
     add_schemas_to_all_hydra_configs,
+    get_schema_file_path,
 )
+from hydra_auto_schema.hydra_schema import HYDRA_CONFIG_SCHEMA
 
 REPO_ROOTDIR = Path.cwd()
 IN_GITHUB_CI = "GITHUB_ACTIONS" in os.environ
@@ -86,8 +98,18 @@ def test_raises_when_no_config_files_found_and_stop_on_error(tmp_path: Path):
         )
 
 
+@pytest.fixture
+def isolated_vscode(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Forget whether the yaml extension was installed, and use an empty vscode extensions dir."""
+    extensions_dir = tmp_path / "vscode_extensions"
+    extensions_dir.mkdir()
+    monkeypatch.setenv("VSCODE_EXTENSIONS", str(extensions_dir))
+    monkeypatch.setattr(auto_schema, "_yaml_vscode_extension_installed", False)
+    return extensions_dir
+
+
 def test_doesnt_raise_when_vscode_isnt_installed(
-    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, isolated_vscode: Path
 ):
     assert _try_to_install_yaml_vscode_extension() == bool(shutil.which("code"))
 
@@ -101,4 +123,294 @@ def test_doesnt_raise_when_vscode_isnt_installed(
     monkeypatch.setattr(
         subprocess, subprocess.check_output.__name__, _mock_check_output
     )
+    # Forget about the previous installation.
+    monkeypatch.setattr(auto_schema, "_yaml_vscode_extension_installed", False)
+    monkeypatch.setattr(
+        auto_schema, "_get_yaml_vscode_extension_marker_file", lambda: tmp_path / "x"
+    )
     assert _try_to_install_yaml_vscode_extension() is False
+
+
+def _fake_code_command(monkeypatch: pytest.MonkeyPatch) -> list[str]:
+    """Pretends that vscode is installed, and records the `code` commands that are run."""
+    commands: list[str] = []
+
+    def _getstatusoutput(command: str) -> tuple[int, str]:
+        commands.append(command)
+        return 0, ""
+
+    monkeypatch.setattr(shutil, "which", lambda name: f"/usr/bin/{name}")
+    monkeypatch.setattr(subprocess, "getstatusoutput", _getstatusoutput)
+    return commands
+
+
+def test_yaml_vscode_extension_is_detected_without_running_code(
+    monkeypatch: pytest.MonkeyPatch, isolated_vscode: Path
+):
+    commands = _fake_code_command(monkeypatch)
+    (isolated_vscode / "redhat.vscode-yaml-1.15.0").mkdir()
+
+    assert _try_to_install_yaml_vscode_extension() is True
+    assert commands == []
+
+
+def test_yaml_vscode_extension_is_installed_in_background_once(
+    monkeypatch: pytest.MonkeyPatch, isolated_vscode: Path
+):
+    commands = _fake_code_command(monkeypatch)
+
+    assert _try_to_install_yaml_vscode_extension(background=True) is True
+    thread = auto_schema._yaml_vscode_extension_install_thread
+    assert thread is not None
+    # The app doesn't wait for the installation when it exits.
+    assert thread.daemon
+    thread.join()
+    assert commands == ["code --install-extension redhat.vscode-yaml"]
+
+    # Detected with the marker file in the cache directory, even in a new process.
+    monkeypatch.setattr(auto_schema, "_yaml_vscode_extension_installed", False)
+    assert _try_to_install_yaml_vscode_extension() is True
+    assert len(commands) == 1
+
+
+def test_schemas_are_the_same_with_multiple_jobs(tmp_path: Path, tmp_configs_dir: Path):
+    """Check that creating the schemas in a process pool gives the same results as serially."""
+
+    def _schemas(schemas_dir: Path) -> dict[str, str]:
+        return {p.name: p.read_text() for p in schemas_dir.glob("*.json")}
+
+    add_schemas_to_all_hydra_configs(
+        repo_root=tmp_path,
+        configs_dir=tmp_configs_dir,
+        schemas_dir=tmp_path / "serial",
+        add_headers=True,
+        jobs=1,
+    )
+    add_schemas_to_all_hydra_configs(
+        repo_root=tmp_path,
+        configs_dir=tmp_configs_dir,
+        schemas_dir=tmp_path / "parallel",
+        add_headers=True,
+        jobs=2,
+    )
+    serial_schemas = _schemas(tmp_path / "serial")
+    assert serial_schemas
+    assert _schemas(tmp_path / "parallel") == serial_schemas
+
+
+def test_hydra_config_schema_template_is_not_modified(
+    tmp_path: Path, tmp_configs_dir: Path
+):
+    """The base schema is shared between the schemas of the configs, and must stay unchanged."""
+    template = copy.deepcopy(HYDRA_CONFIG_SCHEMA)
+    (tmp_configs_dir / "broken.yaml").write_text("_target_: does.not.Exist\n")
+    add_schemas_to_all_hydra_configs(
+        repo_root=tmp_path,
+        configs_dir=tmp_configs_dir,
+        schemas_dir=tmp_path / "schemas",
+        regen_schemas=True,
+    )
+    assert HYDRA_CONFIG_SCHEMA == template
+
+    def _schema(config_name: str) -> dict:
+        schema_file = get_schema_file_path(
+            tmp_configs_dir / config_name, tmp_path / "schemas"
+        )
+        return json.loads(schema_file.read_text())
+
+    assert _schema("broken.yaml")["title"] == "Partial schema for broken.yaml"
+    # Properties of one config don't leak into the schema of another.
+    assert "a" in _schema("nested.yaml")["properties"]
+    assert "a" not in _schema("config.yaml")["properties"]
+
+
+def test_target_schemas_are_reused_within_a_run(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+):
+    import hydra_zen
+
+    mock_builds = Mock(spec=hydra_zen.builds, wraps=hydra_zen.builds)
+    monkeypatch.setattr(hydra_zen, hydra_zen.builds.__name__, mock_builds)
+
+    def _schema(config: dict):
+        return _create_schema_for_config(
+            config,
+            config_file=tmp_path / "config.yaml",
+            configs_dir=tmp_path,
+            repo_root=tmp_path,
+            config_store=None,
+        )
+
+    config = {
+        "a": {"_target_": "hydra_auto_schema.auto_schema_test.Foo", "bar": "a"},
+        "b": {"_target_": "hydra_auto_schema.auto_schema_test.Foo", "bar": "b"},
+    }
+    partial_config = {"_target_": "hydra_auto_schema.auto_schema_test.Foo", "_partial_": True}
+
+    expected_schema = _schema(config)
+    expected_partial_schema = _schema(partial_config)
+    assert mock_builds.call_count == 3
+    mock_builds.reset_mock()
+
+    with _target_schema_cache_scope():
+        schema = _schema(config)
+        # The partial target has a different schema (no required fields).
+        partial_schema = _schema(partial_config)
+        assert mock_builds.call_count == 2
+        # The cached schemas are not modified by the callers.
+        assert _schema(config) == schema
+        assert mock_builds.call_count == 2
+    assert schema == expected_schema
+    assert partial_schema == expected_partial_schema
+
+    # Outside of the block, the schemas are created again.
+    _schema(config)
+    assert mock_builds.call_count == 4
+
+
+def test_customizations_fingerprint_is_computed_once_per_scope(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+):
+    get_fingerprint = Mock(wraps=auto_schema._get_registries_fingerprint)
+    monkeypatch.setattr(auto_schema, "_get_registries_fingerprint", get_fingerprint)
+    config = {
+        "a": {"_target_": "hydra_auto_schema.auto_schema_test.Foo", "bar": "a"},
+        "b": {"_target_": "hydra_auto_schema.auto_schema_test.Foo", "_partial_": True},
+    }
+    with _target_schema_cache_scope():
+        for _ in range(2):
+            _create_schema_for_config(
+                config,
+                config_file=tmp_path / "config.yaml",
+                configs_dir=tmp_path,
+                repo_root=tmp_path,
+                config_store=None,
+            )
+    assert get_fingerprint.call_count == 1
+
+
+def test_shared_target_schemas(tmp_path: Path, tmp_configs_dir: Path):
+    """The schemas of nested targets are written once and referenced with `$ref`."""
+    (tmp_configs_dir / "two_foos.yaml").write_text(
+        "a:\n"
+        "  _target_: hydra_auto_schema.auto_schema_test.Foo\n"
+        "b:\n"
+        "  _target_: hydra_auto_schema.auto_schema_test.Foo\n"
+    )
+    schemas_dir = tmp_path / ".schemas"
+    add_schemas_to_all_hydra_configs(
+        repo_root=tmp_path,
+        configs_dir=tmp_configs_dir,
+        schemas_dir=schemas_dir,
+        add_headers=True,
+        stop_on_error=True,
+        shared_target_schemas=True,
+    )
+    ref = "targets/hydra_auto_schema.auto_schema_test.Foo.json"
+    schema = json.loads((schemas_dir / "configs_two_foos_schema.json").read_text())
+    assert schema["properties"]["a"] == {"$ref": ref}
+    assert schema["properties"]["b"] == {"$ref": ref}
+    target_schema = json.loads((schemas_dir / ref).read_text())
+    assert (
+        target_schema["properties"]["_target_"]["const"]
+        == "hydra_auto_schema.auto_schema_test.Foo"
+    )
+
+    # The schema of a target at the top-level of a config is still merged into it.
+    schema = json.loads((schemas_dir / "configs_with_target_schema.json").read_text())
+    assert "$ref" not in schema
+    assert "_target_" in schema["properties"]
+
+
+def test_shared_target_schemas_with_nested_targets(tmp_path: Path, tmp_configs_dir: Path):
+    """Targets that contain other targets are embedded, since keywords next to `$ref` are ignored."""
+    (tmp_configs_dir / "nested_foos.yaml").write_text(
+        "a:\n"
+        "  _target_: hydra_auto_schema.auto_schema_test.Bar\n"
+        "  b:\n"
+        "    _target_: hydra_auto_schema.auto_schema_test.Foo\n"
+        "    c:\n"
+        "      _target_: hydra_auto_schema.auto_schema_test.Foo\n"
+        "    bar:\n"
+        "      _target_: hydra_auto_schema.auto_schema_test.Foo\n"
+    )
+    schemas_dir = tmp_path / ".schemas"
+    add_schemas_to_all_hydra_configs(
+        repo_root=tmp_path,
+        configs_dir=tmp_configs_dir,
+        schemas_dir=schemas_dir,
+        add_headers=True,
+        stop_on_error=True,
+        shared_target_schemas=True,
+    )
+    schema = json.loads((schemas_dir / "configs_nested_foos_schema.json").read_text())
+    a_schema = schema["properties"]["a"]
+    assert "$ref" not in a_schema
+    assert (
+        a_schema["properties"]["_target_"]["const"]
+        == "hydra_auto_schema.auto_schema_test.Bar"
+    )
+    a_b_schema = a_schema["properties"]["b"]
+    assert "$ref" not in a_b_schema
+    assert (
+        a_b_schema["properties"]["_target_"]["const"]
+        == "hydra_auto_schema.auto_schema_test.Foo"
+    )
+    # The innermost targets don't contain any other target, so they can be referenced, unless the
+    # schema of the parent target already has this property (here the `bar` argument of `Foo`).
+    ref = "targets/hydra_auto_schema.auto_schema_test.Foo.json"
+    assert a_b_schema["properties"]["c"] == {"$ref": ref}
+    assert "$ref" not in a_b_schema["properties"]["bar"]
+    assert (
+        a_b_schema["properties"]["bar"]["properties"]["_target_"]["const"]
+        == "hydra_auto_schema.auto_schema_test.Foo"
+    )
+    assert (schemas_dir / ref).exists()
+
+
+class CountingSearchPathPlugin(SearchPathPlugin):
+    instances = 0
+
+    def __init__(self) -> None:
+        type(self).instances += 1
+
+    def manipulate_search_path(self, search_path: ConfigSearchPath) -> None:
+        search_path.append("counting", "file:///does/not/exist")
+
+
+@pytest.fixture
+def counting_search_path_plugin():
+    state = Singleton.get_state()
+    _build_config_search_path.cache_clear()
+    CountingSearchPathPlugin.instances = 0
+    Plugins.instance().register(CountingSearchPathPlugin)
+    yield CountingSearchPathPlugin
+    Singleton.set_state(state)
+    _build_config_search_path.cache_clear()
+
+
+def test_search_path_is_created_once_per_run(
+    tmp_path: Path, tmp_configs_dir: Path, counting_search_path_plugin
+):
+    add_schemas_to_all_hydra_configs(
+        repo_root=tmp_path,
+        configs_dir=tmp_configs_dir,
+        schemas_dir=tmp_path / ".schemas",
+    )
+    assert len(list((tmp_path / ".schemas").glob("*.json"))) > 1
+    assert counting_search_path_plugin.instances == 1
+
+
+def test_search_path_is_invalidated_when_plugins_change(counting_search_path_plugin):
+    before = _create_config_search_path("/configs")
+    assert counting_search_path_plugin.instances == 1
+    # Modifying the returned search path doesn't affect the cached one.
+    before.append("extra", "file:///extra")
+    assert "extra" not in str(_create_config_search_path("/configs"))
+    assert counting_search_path_plugin.instances == 1
+
+    plugins = Plugins.instance().plugin_type_to_subclass_list[SearchPathPlugin]
+    plugins.remove(counting_search_path_plugin)
+    after = _create_config_search_path("/configs")
+    assert "counting" not in str(after)
+    assert counting_search_path_plugin.instances == 1
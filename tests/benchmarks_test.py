@@ -0,0 +1,58 @@
+from pathlib import Path
+
+from benchmarks.corpus import SCALES, generate_corpus
+from benchmarks.suite import SCENARIOS, compare, run_suite
+from hydra_auto_schema.dependencies import DependencyGraph
+
+
+def test_generate_corpus(tmp_path: Path):
+    spec = SCALES["tiny"]
+    configs_dir = generate_corpus(tmp_path, spec)
+    config_files = sorted(configs_dir.rglob("*.yaml"))
+    assert len(config_files) == spec.num_configs
+    assert (tmp_path / "bench_targets" / "__init__.py").exists()
+
+    graph = DependencyGraph.build(config_files, configs_dir=configs_dir)
+    # The first option of a group is in the defaults of the next ones and of the primary config
+    # (so also of the `@package _global_` experiments).
+    assert set(graph.get_dependents([configs_dir / "group_0" / "option_0.yaml"])) == {
+        configs_dir / "config.yaml",
+        configs_dir / "experiment" / "experiment_0.yaml",
+        configs_dir / "group_0" / "option_1.yaml",
+    }
+
+
+def test_run_suite(tmp_path: Path):
+    results = run_suite(["tiny"], workdir=tmp_path)
+    assert [result["scenario"] for result in results["results"]] == list(SCENARIOS)
+    for result in results["results"]:
+        assert result["wall_time"] > 0
+        assert result["peak_rss_mb"] > 0
+        assert result["num_partial_schemas"] == 0
+    assert len(compare(results, results)) == len(SCENARIOS)
+
+
+def test_merge_benchmark():
+    from benchmarks.merge import format_results, get_scenarios, run_merge_benchmark
+    from hydra_auto_schema.auto_schema import _overwrite
+    from hydra_auto_schema.customize import schema_conflict_handlers
+    from hydra_auto_schema.utils import merge_dicts
+
+    results = run_merge_benchmark(repeat=1)
+    assert len(format_results(results)) == 3
+    peak_bytes = {
+        (result["scenario"], result["implementation"]): result["peak_bytes"]
+        for result in results
+    }
+    # The schemas that don't need to be merged aren't copied.
+    assert peak_bytes["nested", "shared"] < peak_bytes["nested", "copy"]
+    a, b = get_scenarios()["target"]
+    merged = merge_dicts(
+        a, b, conflict_handler=_overwrite, conflict_handlers=schema_conflict_handlers
+    )
+    assert merged["properties"] is not b["properties"]
+    assert all(
+        merged["properties"][name] is b["properties"][name]
+        for name in b["properties"]
+        if name not in a["properties"]
+    )
@@ -1,5 +1,10 @@
+import io
+import json
+import pstats
 import shlex
+import shutil
 import subprocess
+import sys
 import warnings
 from pathlib import Path
 
@@ -8,7 +13,7 @@ import hydra.errors
 import pytest
 from hydra.plugins.search_path_plugin import SearchPathPlugin
 
-from hydra_auto_schema.__main__ import main
+from hydra_auto_schema.__main__ import main, schema_for
 from hydra_plugins.auto_schema.auto_schema_plugin import (
     AutoSchemaPlugin,
 )
@@ -33,14 +38,16 @@ structured_app_dir = this_dir / "structured_app"
         f"{structured_app_dir} --stop-on-error --regen-schemas -vvv",
     ],
 )
-def test_run_via_cli_without_errors(args: str):
+def test_run_via_cli_without_errors(args: str, tmp_path: Path):
     """Checks that the command completes without errors."""
     # Run programmatically instead of with a subprocess so we can get nice coverage stats.
     # assuming we're at the project root directory.
     from hydra.core.config_store import ConfigStore
 
     warnings.warn(RuntimeWarning(ConfigStore.instance().repo.keys()))
-    main(shlex.split(args))
+    # NOTE: Not in the default schemas directory (in the current directory), since the schemas
+    # directory is locked (and created) even if the run fails.
+    main(shlex.split(args) + [f"--schemas-dir={tmp_path / '.schemas'}"])
 
 
 @pytest.mark.skip(reason="Shouldn't really be run as a uv tool anyway.")
@@ -97,3 +104,140 @@ def test_plugin_is_discoverable(monkeypatch: pytest.MonkeyPatch):
     plugins = hydra.core.plugins.Plugins.instance().discover(SearchPathPlugin)
     # assert AutoSchemaPlugin in plugins
     assert AutoSchemaPlugin.__name__ in [p.__name__ for p in plugins]
+
+
+@pytest.fixture
+def configs_repo(tmp_path: Path) -> Path:
+    configs_dir = tmp_path / "configs"
+    (configs_dir / "db").mkdir(parents=True)
+    (configs_dir / "db" / "base.yaml").write_text("host: localhost\n")
+    (configs_dir / "db" / "mysql.yaml").write_text("defaults:\n  - base\n  - _self_\n")
+    (configs_dir / "other.yaml").write_text("a: 1\n")
+    return tmp_path
+
+
+def _schemas(repo: Path) -> list[str]:
+    schemas_dir = repo / ".schemas"
+    return sorted(
+        p.relative_to(schemas_dir).as_posix() for p in schemas_dir.rglob("*.json")
+    )
+
+
+def test_files_from_stdin(configs_repo: Path, monkeypatch: pytest.MonkeyPatch):
+    stdin = io.TextIOWrapper(io.BytesIO(b"configs/db/base.yaml\0README.md\0"))
+    monkeypatch.setattr(sys, "stdin", stdin)
+    monkeypatch.chdir(configs_repo)
+    main(
+        [str(configs_repo), "--configs_dir=configs", "--add-headers", "--files", "-"]
+        + [f"--schemas-dir={configs_repo / '.schemas'}"]
+    )
+    assert _schemas(configs_repo) == [
+        "db_base_schema.json",
+        "db_mysql_schema.json",
+    ]
+
+
+def test_files_before_repo_root(
+    configs_repo: Path, tmp_path_factory: pytest.TempPathFactory, monkeypatch: pytest.MonkeyPatch
+):
+    # The repo root shouldn't be taken as one of the files, and the current directory used instead.
+    monkeypatch.chdir(tmp_path_factory.mktemp("elsewhere"))
+    main(
+        ["--files", str(configs_repo / "configs" / "db" / "base.yaml")]
+        + ["--files", str(configs_repo / "configs" / "other.yaml")]
+        + [str(configs_repo), "--configs_dir=configs", "--add-headers"]
+        + [f"--schemas-dir={configs_repo / '.schemas'}"]
+    )
+    assert _schemas(configs_repo) == [
+        "configs_other_schema.json",
+        "db_base_schema.json",
+        "db_mysql_schema.json",
+    ]
+
+
+def test_since_git_ref(configs_repo: Path):
+    def _git(*args: str):
+        subprocess.run(
+            ["git", *args], cwd=configs_repo, check=True, capture_output=True
+        )
+
+    _git("init", "-q")
+    _git("add", ".")
+    _git("-c", "user.name=test", "-c", "user.email=test@test", "commit", "-qm", "init")
+    (configs_repo / "configs" / "db" / "base.yaml").write_text("host: example.com\n")
+    (configs_repo / "configs" / "new.yaml").write_text("b: 2\n")
+
+    main(
+        [str(configs_repo), "--configs_dir=configs", "--add-headers", "--since=HEAD"]
+        + [f"--schemas-dir={configs_repo / '.schemas'}"]
+    )
+    assert _schemas(configs_repo) == [
+        "configs_new_schema.json",
+        "db_base_schema.json",
+        "db_mysql_schema.json",
+    ]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_profile(configs_repo: Path, jobs: int, capsys: pytest.CaptureFixture):
+    (configs_repo / "configs" / "model.yaml").write_text(
+        "_target_: hydra_auto_schema.auto_schema_test.Bar\n"
+    )
+    report = configs_repo / "profile.json"
+    main(
+        [str(configs_repo), "--configs_dir=configs", "--add-headers", f"-j={jobs}"]
+        + [f"--schemas-dir={configs_repo / '.schemas'}", "--profile-top=2"]
+        + [f"--profile-json={report}"]
+        + [f"--profile-cprofile-dir={configs_repo / 'prof'}"]
+    )
+    stdout = capsys.readouterr().out
+    assert "Slowest configs" in stdout and "Slowest targets" in stdout
+
+    data = json.loads(report.read_text())
+    assert len(data["configs"]) == 4
+    assert {"discovery", "load_config", "builds", "json_schema", "write"} <= set(
+        data["phases"]
+    )
+    assert len(data["slowest_targets"]) <= 2
+    assert any(
+        "hydra_auto_schema.auto_schema_test.Bar" in config["targets"]
+        for config in data["configs"]
+    )
+    # Only the stats of the slowest configs are written.
+    stats_files = list((configs_repo / "prof").glob("*.prof"))
+    assert len(stats_files) == 2
+    assert pstats.Stats(str(stats_files[0])).total_calls > 0
+
+
+def test_repo_root_named_like_a_command(
+    configs_repo: Path, monkeypatch: pytest.MonkeyPatch
+):
+    repo = configs_repo / "serve"
+    shutil.copytree(configs_repo / "configs", repo / "configs")
+    monkeypatch.chdir(configs_repo)
+    main(
+        ["serve", "--configs_dir=configs", "--add-headers", "--no-daemon"]
+        + [f"--schemas-dir={repo / '.schemas'}"]
+    )
+    assert "db_mysql_schema.json" in _schemas(repo)
+
+
+def test_schema_for(configs_repo: Path, capsys: pytest.CaptureFixture):
+    (configs_repo / "configs" / "model.yaml").write_text(
+        "_target_: hydra_auto_schema.auto_schema_test.Bar\n"
+    )
+    schema_for([str(configs_repo / "configs" / "model.yaml")])
+    schema = json.loads(capsys.readouterr().out)
+    assert set(schema["properties"]) >= {"_target_", "bar", "baz"}
+
+    output = configs_repo / "model_schema.json"
+    schema_for(
+        [str(configs_repo / "configs" / "db" / "mysql.yaml")]
+        + [f"--repo-root={configs_repo}", f"--output={output}"]
+    )
+    assert json.loads(output.read_text())["title"] == (
+        "Auto-generated schema for db/mysql.yaml"
+    )
+    # Nothing else is written.
+    assert not (configs_repo / ".schemas").exists()
+    assert not (configs_repo / ".vscode").exists()
@@ -0,0 +1,144 @@
+import copy
+import dataclasses
+import json
+from pathlib import Path
+from typing import Callable
+
+import omegaconf
+import pytest
+from hydra.core.config_store import ConfigStore
+from hydra.core.singleton import Singleton
+
+from hydra_auto_schema import auto_schema
+from hydra_auto_schema.auto_schema import (
+    _config_loader_scope,
+    get_schema_file_path,
+    load_config,
+)
+
+
+@pytest.fixture
+def configs_dir(tmp_path: Path):
+    configs_dir = tmp_path / "configs"
+    (configs_dir / "shared").mkdir(parents=True)
+    (configs_dir / "shared" / "base.yaml").write_text("a: 1\n")
+    for name in ["foo", "bar"]:
+        (configs_dir / f"{name}.yaml").write_text(
+            f"defaults:\n  - shared@shared: base\n  - _self_\nname: {name}\n"
+        )
+    return configs_dir
+
+
+@pytest.fixture
+def loaded_files(spy: Callable[..., list]) -> list[str]:
+    """Records the config files that are parsed."""
+    return spy(omegaconf.OmegaConf, "load", key=lambda file_: getattr(file_, "name", str(file_)))
+
+
+def _load(config_file: Path, configs_dir: Path):
+    return load_config(
+        config_file,
+        configs_dir=configs_dir,
+        repo_root=configs_dir.parent,
+        config_store=ConfigStore.instance(),
+    )
+
+
+def test_shared_configs_are_loaded_once(configs_dir: Path, loaded_files: list[str]):
+    with _config_loader_scope():
+        foo = _load(configs_dir / "foo.yaml", configs_dir)
+        n_loaded = len(loaded_files)
+        bar = _load(configs_dir / "bar.yaml", configs_dir)
+    assert foo["name"] == "foo" and bar["name"] == "bar"
+    assert foo["shared"] == bar["shared"] == {"a": 1}
+    base = str(configs_dir / "shared" / "base.yaml")
+    assert loaded_files.count(base) == 1
+    # Only `bar.yaml` had to be loaded the second time.
+    assert loaded_files[n_loaded:] == [str(configs_dir / "bar.yaml")]
+
+
+def test_changed_configs_are_loaded_again(configs_dir: Path, loaded_files: list[str]):
+    config_loaders: dict = {}
+    with _config_loader_scope(config_loaders):
+        assert _load(configs_dir / "foo.yaml", configs_dir)["shared"] == {"a": 1}
+
+    (configs_dir / "shared" / "base.yaml").write_text("a: 123\n")
+    loaded_files.clear()
+    with _config_loader_scope(config_loaders):
+        assert _load(configs_dir / "foo.yaml", configs_dir)["shared"] == {"a": 123}
+    assert loaded_files == [str(configs_dir / "shared" / "base.yaml")]
+
+
+def test_loaded_configs_are_not_shared_without_scope(
+    configs_dir: Path, loaded_files: list[str]
+):
+    _load(configs_dir / "foo.yaml", configs_dir)
+    _load(configs_dir / "bar.yaml", configs_dir)
+    assert loaded_files.count(str(configs_dir / "shared" / "base.yaml")) == 2
+
+
+@dataclasses.dataclass
+class StoredConfig:
+    a: int = 1
+
+
+@pytest.fixture
+def config_store():
+    config_store = ConfigStore.instance()
+    for i in range(3):
+        config_store.store(name=f"stored_{i}", node=StoredConfig, group="stored")
+    return config_store
+
+
+def test_config_store_is_indexed_once(configs_dir: Path, config_store: ConfigStore):
+    _load(configs_dir / "foo.yaml", configs_dir)
+    index = auto_schema._get_config_store_index(ConfigStore.instance())
+    assert "stored/stored_0.yaml" in index.nodes
+
+    # The index is reused as long as the contents of the ConfigStore don't change, even if the
+    # ConfigStore is replaced with a copy (as is done after each config).
+    Singleton.set_state(Singleton.get_state())
+    assert ConfigStore.instance() is not config_store
+    _load(configs_dir / "bar.yaml", configs_dir)
+    assert auto_schema._get_config_store_index(ConfigStore.instance()) is index
+
+    ConfigStore.instance().store(name="new", node=StoredConfig, group="stored")
+    new_index = auto_schema._get_config_store_index(ConfigStore.instance())
+    assert new_index is not index
+    assert new_index.targets["stored/new.yaml"] == (
+        f"{StoredConfig.__module__}.{StoredConfig.__qualname__}"
+    )
+
+
+def test_structured_configs_get_a_target(configs_dir: Path, config_store: ConfigStore):
+    (configs_dir / "uses_stored.yaml").write_text(
+        "defaults:\n  - stored@stored: stored_1\n  - _self_\n"
+    )
+    with _config_loader_scope():
+        for _ in range(2):
+            config = _load(configs_dir / "uses_stored.yaml", configs_dir)
+            assert config["stored"]["_target_"] == (
+                f"{StoredConfig.__module__}.{StoredConfig.__qualname__}"
+            )
+            # The state of Hydra is restored after each config in a run.
+            Singleton.set_state(Singleton.get_state())
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_passed_config_store_is_used(
+    add_schemas: Callable[..., Path], configs_dir: Path, jobs: int
+):
+    config_store = copy.deepcopy(ConfigStore.instance())
+    config_store.store(name="only_in_copy", node=StoredConfig, group="copied")
+    (configs_dir / "uses_copy.yaml").write_text(
+        "defaults:\n  - copied@copied: only_in_copy\n  - _self_\n"
+    )
+    schemas_dir = add_schemas(
+        configs_dir, stop_on_error=True, config_store=config_store, jobs=jobs
+    )
+    schema = json.loads(
+        get_schema_file_path(configs_dir / "uses_copy.yaml", schemas_dir).read_text()
+    )
+    assert "a" in schema["properties"]["copied"]["properties"]
+    # The ConfigStore of Hydra isn't modified.
+    assert "copied" not in ConfigStore.instance().repo
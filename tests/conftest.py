@@ -1,6 +1,15 @@
+import shutil
+from pathlib import Path
+from typing import Any, Callable
+
 import pytest
 from hydra.core.singleton import Singleton
 
+from hydra_auto_schema import auto_schema
+from hydra_auto_schema.auto_schema import add_schemas_to_all_hydra_configs
+
+config_dir = Path(__file__).parent / "configs"
+
 
 @pytest.fixture(autouse=True)
 def reset_singletons_between_tests():
@@ -9,3 +18,78 @@ def reset_singletons_between_tests():
     yield
 
     Singleton.set_state(state)
+
+
+@pytest.fixture(autouse=True)
+def isolated_target_schema_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Use a different (empty) persistent cache of target schemas for each test."""
+    cache_dir = tmp_path / "target_schema_cache"
+    monkeypatch.setenv("HYDRA_AUTO_SCHEMA_CACHE_DIR", str(cache_dir))
+    return cache_dir
+
+
+@pytest.fixture
+def tmp_configs_dir(tmp_path: Path):
+    configs_dir = tmp_path / "configs"
+    shutil.copytree(config_dir, configs_dir)
+    # TODO: The structured configs stuff isn't working outside of a Hydra app for now.
+    (configs_dir / "__init__.py").unlink()
+    (configs_dir / "with_structured_default.yaml").unlink()
+    return configs_dir
+
+
+@pytest.fixture
+def add_schemas(tmp_path: Path) -> Callable[..., Path]:
+    """Adds the schemas of the configs in a directory (with headers), in `tmp_path / ".schemas"`.
+
+    The keyword arguments are passed to `add_schemas_to_all_hydra_configs`. Returns the schemas
+    directory.
+    """
+
+    def _add_schemas(configs_dir: Path, **kwargs) -> Path:
+        schemas_dir = tmp_path / ".schemas"
+        add_schemas_to_all_hydra_configs(
+            repo_root=tmp_path,
+            configs_dir=configs_dir,
+            schemas_dir=schemas_dir,
+            add_headers=True,
+            quiet=True,
+            **kwargs,
+        )
+        return schemas_dir
+
+    return _add_schemas
+
+
+@pytest.fixture
+def spy(monkeypatch: pytest.MonkeyPatch) -> Callable[..., list]:
+    """Records the calls to a function of a module (or class).
+
+    `spy(module, name, key)` replaces the function, and returns the list to which `key(arg)` is
+    appended for the first argument of each call.
+    """
+
+    def _spy(owner: Any, name: str, key: Callable[[Any], Any] = lambda arg: arg) -> list:
+        calls = []
+        fn = getattr(owner, name)
+
+        def _recorded(arg, *args, **kwargs):
+            calls.append(key(arg))
+            return fn(arg, *args, **kwargs)
+
+        monkeypatch.setattr(owner, name, _recorded)
+        return calls
+
+    return _spy
+
+
+@pytest.fixture
+def created_schemas(spy: Callable[..., list]) -> list[Path]:
+    """Records the config files for which a schema is created."""
+    return spy(auto_schema, "_create_schema_for_config_file")
+
+
+@pytest.fixture
+def created_target_schemas(spy: Callable[..., list]) -> list[str]:
+    """Records the targets for which a schema is created."""
+    return spy(auto_schema, "_create_schema_from_target", key=lambda config: config["_target_"])
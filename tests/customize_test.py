@@ -1,6 +1,8 @@
 import enum
 import functools
+import importlib.metadata
 import json
+import sys
 import unittest
 import unittest.mock
 from dataclasses import dataclass
@@ -341,3 +343,62 @@ def test_use_custom_builds_kwargs_if_base_in_special_handlers(
     call_without_special_kwargs = mock_hydra_zen_builds.call_args_list[0]
     assert call_without_special_kwargs.args[0] is B
     assert call_without_special_kwargs.kwargs["zen_exclude"] == ["a"]
+
+
+def test_customizations_can_be_registered_by_name(monkeypatch: pytest.MonkeyPatch):
+    from hydra_auto_schema.customize import (
+        _find_customization,
+        custom_hydra_zen_builds_args,
+    )
+
+    assert _find_customization(custom_hydra_zen_builds_args, B) is None
+    # The name of a base class of the target.
+    monkeypatch.setitem(
+        custom_hydra_zen_builds_args, get_target_string(A), {"zen_exclude": ["a"]}
+    )
+    assert _find_customization(custom_hydra_zen_builds_args, B) == (
+        get_target_string(A),
+        {"zen_exclude": ["a"]},
+    )
+
+
+def test_customizations_can_be_registered_by_alias(monkeypatch: pytest.MonkeyPatch):
+    """A name where the class is re-exported (e.g. `torchvision.models.WeightsEnum`) also works."""
+    import types
+
+    from hydra_auto_schema.customize import _find_customization
+
+    registry = {"some_package.models.A": {"zen_exclude": ["a"]}}
+    # The module of the name was never imported, so this can't be the target.
+    assert _find_customization(registry, B) is None
+
+    module = types.ModuleType("some_package.models")
+    module.A = A  # type: ignore
+    monkeypatch.setitem(sys.modules, "some_package.models", module)
+    assert _find_customization(registry, B) == (
+        "some_package.models.A",
+        {"zen_exclude": ["a"]},
+    )
+
+
+def test_entry_points_are_only_loaded_if_their_name_matches(
+    monkeypatch: pytest.MonkeyPatch,
+):
+    from hydra_auto_schema import customize
+
+    matching = Mock(spec=importlib.metadata.EntryPoint)
+    matching.name = get_target_string(A)
+    matching.load.return_value = {"zen_exclude": ["a"]}
+    other = Mock(spec=importlib.metadata.EntryPoint)
+    other.name = "some_package.SomeClass"
+    monkeypatch.setattr(
+        customize,
+        customize._get_entry_points.__name__,
+        lambda group: (other, matching),
+    )
+
+    assert customize._find_customization(
+        {}, B, entry_point_group=customize.BUILDS_ARGS_ENTRY_POINT_GROUP
+    ) == (get_target_string(A), {"zen_exclude": ["a"]})
+    matching.load.assert_called_once()
+    other.load.assert_not_called()
@@ -0,0 +1,139 @@
+from pathlib import Path
+
+import pytest
+
+from hydra_auto_schema.dependencies import DependencyGraph, get_config_dependencies
+
+
+@pytest.mark.parametrize(
+    ("defaults", "expected"),
+    [
+        ("- _self_", []),
+        ("- base", ["db/base.yaml"]),
+        ("- /optimizer: adam", ["optimizer/adam.yaml"]),
+        ("- override /optimizer: sgd", ["optimizer/sgd.yaml"]),
+        ("- optional extra: thing", ["db/extra/thing.yaml"]),
+        (
+            "- /optimizer@opt: [adam, sgd]",
+            ["optimizer/adam.yaml", "optimizer/sgd.yaml"],
+        ),
+        ("- /optimizer: null", []),
+        ("- /optimizer: ???", []),
+        ("- /optimizer: does_not_exist", []),
+    ],
+)
+def test_get_config_dependencies(tmp_path: Path, defaults: str, expected: list[str]):
+    for path in [
+        "db/base.yaml",
+        "db/extra/thing.yml",
+        "optimizer/adam.yaml",
+        "optimizer/sgd.yaml",
+    ]:
+        (tmp_path / path).parent.mkdir(exist_ok=True, parents=True)
+        (tmp_path / path).write_text("a: 1\n")
+    (tmp_path / "db" / "extra" / "thing.yml").rename(
+        tmp_path / "db" / "extra" / "thing.yaml"
+    )
+    config_file = tmp_path / "db" / "mysql.yaml"
+    config_file.write_text(f"defaults:\n  {defaults}\n")
+
+    dependencies = get_config_dependencies(config_file, configs_dir=tmp_path)
+    assert dependencies == [tmp_path / p for p in expected]
+
+
+def test_recursive_dependencies(tmp_path: Path):
+    (tmp_path / "a.yaml").write_text("defaults:\n  - b\n")
+    (tmp_path / "b.yaml").write_text("defaults:\n  - c\n  - a\n")
+    (tmp_path / "c.yaml").write_text("c: 1\n")
+    assert get_config_dependencies(tmp_path / "a.yaml", tmp_path) == [
+        tmp_path / "b.yaml"
+    ]
+    assert get_config_dependencies(tmp_path / "a.yaml", tmp_path, recursive=True) == [
+        tmp_path / "b.yaml",
+        tmp_path / "c.yaml",
+    ]
+
+
+def test_package_global_config_depends_on_primary_config(tmp_path: Path):
+    (tmp_path / "config.yaml").write_text("a: 1\n")
+    (tmp_path / "experiment").mkdir()
+    (tmp_path / "experiment" / "foo.yaml").write_text("# @package _global_\na: 2\n")
+    assert get_config_dependencies(tmp_path / "experiment" / "foo.yaml", tmp_path) == [
+        tmp_path / "config.yaml"
+    ]
+
+
+@pytest.fixture
+def configs_dir(tmp_path: Path) -> Path:
+    configs_dir = tmp_path / "configs"
+    files = {
+        "config.yaml": "defaults:\n  - db: mysql\n  - _self_\n",
+        "db/base.yaml": "host: localhost\n",
+        "db/mysql.yaml": "defaults:\n  - base\n  - _self_\nport: 3306\n",
+        "db/postgresql.yaml": "defaults:\n  - base\n  - _self_\nport: 5432\n",
+        "experiment/fast.yaml": (
+            "# @package _global_\ndefaults:\n  - override /db: postgresql\n  - _self_\n"
+        ),
+        "other.yaml": "a: 1\n",
+    }
+    for path, contents in files.items():
+        (configs_dir / path).parent.mkdir(exist_ok=True, parents=True)
+        (configs_dir / path).write_text(contents)
+    return configs_dir
+
+
+def _relative(paths: list[Path], configs_dir: Path) -> list[str]:
+    return sorted(p.relative_to(configs_dir).as_posix() for p in paths)
+
+
+@pytest.mark.parametrize(
+    ("changed", "expected"),
+    [
+        ("other.yaml", ["other.yaml"]),
+        (
+            "db/base.yaml",
+            [
+                "config.yaml",
+                "db/base.yaml",
+                "db/mysql.yaml",
+                "db/postgresql.yaml",
+                "experiment/fast.yaml",
+            ],
+        ),
+        ("db/postgresql.yaml", ["db/postgresql.yaml", "experiment/fast.yaml"]),
+        # `@package _global_` configs depend on the primary config.
+        ("config.yaml", ["config.yaml", "experiment/fast.yaml"]),
+        ("../README.md", []),
+    ],
+)
+def test_get_affected_config_files(
+    configs_dir: Path, changed: str, expected: list[str]
+):
+    graph = DependencyGraph.build(sorted(configs_dir.rglob("*.yaml")), configs_dir)
+    affected = graph.get_affected([configs_dir / changed])
+    assert _relative(affected, configs_dir) == expected
+
+
+def test_dependency_graph_updates(configs_dir: Path):
+    graph = DependencyGraph.build(sorted(configs_dir.rglob("*.yaml")), configs_dir)
+
+    # A config that now depends on another.
+    (configs_dir / "other.yaml").write_text("defaults:\n  - db/base\n  - _self_\n")
+    graph.update(configs_dir / "other.yaml")
+    assert "other.yaml" in _relative(
+        graph.get_dependents([configs_dir / "db/base.yaml"]), configs_dir
+    )
+
+    # Deleting a config still affects the configs that refer to it.
+    (configs_dir / "db/postgresql.yaml").unlink()
+    graph.remove(configs_dir / "db/postgresql.yaml")
+    assert _relative(
+        graph.get_affected([configs_dir / "db/postgresql.yaml"]), configs_dir
+    ) == ["experiment/fast.yaml"]
+
+    # A new config that was referred to before it existed.
+    (configs_dir / "db/postgresql.yaml").write_text("port: 5432\n")
+    graph.update(configs_dir / "db/postgresql.yaml")
+    assert _relative(
+        graph.get_affected([configs_dir / "db/postgresql.yaml"]), configs_dir
+    ) == ["db/postgresql.yaml", "experiment/fast.yaml"]
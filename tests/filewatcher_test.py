@@ -101,6 +101,7 @@ def filewatcher(
 
     observer.schedule(mock_handler, str(configs_dir), recursive=True)
     yield mock_handler
+    real_handler.stop()
 
 
 def _get_all_schema_files(schemas_dir: Path) -> list[Path]:
@@ -122,6 +123,7 @@ def test_on_created(
     new_file.write_text("foo: bar")
 
     time.sleep(0.5)
+    filewatcher.wait(timeout=30)
 
     filewatcher.dispatch.assert_any_call(  # type: ignore
         FileCreatedEvent(
@@ -148,6 +150,7 @@ def test_on_modified(
 
     existing_file.write_text(existing_file.read_text() + "\n")
     time.sleep(0.5)
+    filewatcher.wait(timeout=30)
 
     filewatcher.dispatch.assert_any_call(  # type: ignore
         FileModifiedEvent(
@@ -173,6 +176,7 @@ def test_on_deleted(
 
     existing_file.unlink()
     time.sleep(0.5)
+    filewatcher.wait(timeout=30)
 
     filewatcher.dispatch.assert_any_call(  # type: ignore
         FileDeletedEvent(
@@ -204,6 +208,7 @@ def test_on_moved(
 
     old_file.rename(new_file)
     time.sleep(0.5)
+    filewatcher.wait(timeout=30)
 
     filewatcher.dispatch.assert_any_call(  # type: ignore
         FileMovedEvent(
@@ -217,3 +222,62 @@ def test_on_moved(
     assert set(schemas_after) == (set(schemas_before) - {old_file_schema}) | {
         new_file_schema
     }
+
+
+@xfail_on_macos
+def test_dependents_are_updated(
+    filewatcher: AutoSchemaEventHandler, configs_dir: Path, schemas_dir: Path
+):
+    """When a config changes, the schemas of the configs that use it are also updated."""
+    dependent_schema = get_schema_file_path(
+        configs_dir / "with_defaults.yaml", schemas_dir
+    )
+    assert "baz" not in dependent_schema.read_text()
+
+    (configs_dir / "with_target.yaml").write_text(
+        "_target_: hydra_auto_schema.auto_schema_test.Bar\n"
+    )
+    time.sleep(0.5)
+    filewatcher.wait(timeout=30)
+
+    assert "baz" in dependent_schema.read_text()
+
+
+def test_events_are_coalesced(
+    repo_root: Path,
+    configs_dir: Path,
+    schemas_dir: Path,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """A burst of changes (e.g. a `git checkout`) is processed as a single batch."""
+    batches: list[list[Path]] = []
+    _process = AutoSchemaEventHandler._process
+
+    def _record_batch(self: AutoSchemaEventHandler, changed_files: list[Path]):
+        batches.append(changed_files)
+        return _process(self, changed_files)
+
+    monkeypatch.setattr(AutoSchemaEventHandler, "_process", _record_batch)
+    handler = AutoSchemaEventHandler(
+        repo_root=repo_root,
+        configs_dir=configs_dir,
+        schemas_dir=schemas_dir,
+        regen_schemas=False,
+        stop_on_error=True,
+        quiet=True,
+        add_headers=True,
+    )
+    new_files = [configs_dir / f"new_{i}.yaml" for i in range(20)]
+    try:
+        for i, new_file in enumerate(new_files):
+            new_file.write_text(f"foo: {i}\n")
+            handler.schedule(new_file)
+            # Same file changed again before it was processed.
+            handler.schedule(new_file)
+        assert handler.wait(timeout=30)
+    finally:
+        handler.stop()
+
+    assert batches == [new_files]
+    for new_file in new_files:
+        assert get_schema_file_path(new_file, schemas_dir).exists()
@@ -0,0 +1,268 @@
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+from hydra_auto_schema import auto_schema
+from hydra_auto_schema.auto_schema import (
+    add_schemas_to_all_hydra_configs,
+    get_schema_file_path,
+)
+from hydra_auto_schema.manifest import (
+    MANIFEST_FILE_NAME,
+    Manifest,
+    get_tree_fingerprint,
+    load_tree_fingerprint,
+    lock_schemas_dir,
+    save_tree_fingerprint,
+)
+
+
+def test_manifest_is_written(
+    tmp_path: Path, tmp_configs_dir: Path, add_schemas: Callable[..., Path]
+):
+    add_schemas(tmp_configs_dir)
+    assert (tmp_path / ".schemas" / MANIFEST_FILE_NAME).exists()
+    manifest = Manifest.load(tmp_path / ".schemas")
+    assert set(manifest.entries) == {p.name for p in tmp_configs_dir.glob("*.yaml")}
+    with_defaults = manifest.entries["with_defaults.yaml"]
+    assert with_defaults.status == "complete"
+    assert list(with_defaults.dependencies) == ["with_target.yaml"]
+    assert (
+        "hydra_auto_schema.auto_schema_test.Foo"
+        in manifest.entries["with_target.yaml"].targets
+    )
+
+
+def test_up_to_date_schemas_are_skipped(
+    tmp_configs_dir: Path,
+    add_schemas: Callable[..., Path],
+    created_schemas: list[Path],
+):
+    add_schemas(tmp_configs_dir)
+    assert set(created_schemas) == set(tmp_configs_dir.glob("*.yaml"))
+
+    created_schemas.clear()
+    add_schemas(tmp_configs_dir)
+    # NOTE: The headers that were added to the config files don't count as modifications.
+    assert created_schemas == []
+
+    created_schemas.clear()
+    add_schemas(tmp_configs_dir, regen_schemas=True)
+    assert set(created_schemas) == set(tmp_configs_dir.glob("*.yaml"))
+
+
+def test_changing_a_default_regenerates_the_schema(
+    tmp_configs_dir: Path,
+    add_schemas: Callable[..., Path],
+    created_schemas: list[Path],
+):
+    add_schemas(tmp_configs_dir)
+    created_schemas.clear()
+
+    with_target = tmp_configs_dir / "with_target.yaml"
+    with_target.write_text(with_target.read_text().replace("bob", "bobby"))
+    add_schemas(tmp_configs_dir)
+    assert set(created_schemas) == {with_target, tmp_configs_dir / "with_defaults.yaml"}
+
+
+def test_changes_made_while_the_schema_is_created_are_not_missed(
+    tmp_configs_dir: Path,
+    add_schemas: Callable[..., Path],
+    created_schemas: list[Path],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    with_target = tmp_configs_dir / "with_target.yaml"
+    load_config = auto_schema.load_config
+
+    def _load_config_then_edit(config_file: Path, *args, **kwargs):
+        config = load_config(config_file, *args, **kwargs)
+        if config_file == with_target:
+            # Saved in an editor after the config was loaded, but before the schema is written.
+            with_target.write_text(with_target.read_text().replace("bob", "bobby"))
+        return config
+
+    monkeypatch.setattr(auto_schema, "load_config", _load_config_then_edit)
+    add_schemas(tmp_configs_dir)
+    monkeypatch.setattr(auto_schema, "load_config", load_config)
+    created_schemas.clear()
+
+    add_schemas(tmp_configs_dir)
+    assert with_target in created_schemas
+
+
+def test_deleted_schema_is_regenerated(
+    tmp_path: Path,
+    tmp_configs_dir: Path,
+    add_schemas: Callable[..., Path],
+    created_schemas: list[Path],
+):
+    add_schemas(tmp_configs_dir)
+    created_schemas.clear()
+
+    config_file = tmp_configs_dir / "config.yaml"
+    get_schema_file_path(config_file, tmp_path / ".schemas").unlink()
+    add_schemas(tmp_configs_dir)
+    assert created_schemas == [config_file]
+
+
+def test_unchanged_schemas_are_not_rewritten(
+    tmp_path: Path,
+    tmp_configs_dir: Path,
+    add_schemas: Callable[..., Path],
+    caplog: pytest.LogCaptureFixture,
+):
+    add_schemas(tmp_configs_dir)
+    schema_files = sorted((tmp_path / ".schemas").glob("*.json"))
+    stamps = {p: p.stat().st_mtime_ns for p in schema_files}
+    # The output doesn't depend on the order in which the targets were processed.
+    for schema_file in schema_files:
+        schema = json.loads(schema_file.read_text())
+        assert list(schema.get("$defs", {})) == sorted(schema.get("$defs", {}))
+
+    with caplog.at_level(logging.INFO, logger=auto_schema.logger.name):
+        add_schemas(tmp_configs_dir, regen_schemas=True)
+    assert {p: p.stat().st_mtime_ns for p in schema_files} == stamps
+    assert f"0 schemas written, {len(schema_files)} unchanged." in caplog.text
+
+
+def test_only_the_root_definitions_are_sorted():
+    schema = {
+        "properties": {"definitions": {"properties": {"b": {}, "a": {}}}},
+        "$defs": {"b": {"properties": {"$defs": {"d": {}, "c": {}}}}, "a": {}},
+    }
+    sorted_schema = auto_schema._sort_definitions(schema)
+    assert sorted_schema == schema
+    assert list(sorted_schema["$defs"]) == ["a", "b"]
+    assert list(sorted_schema["$defs"]["b"]["properties"]["$defs"]) == ["d", "c"]
+    assert list(sorted_schema["properties"]["definitions"]["properties"]) == ["b", "a"]
+
+
+def test_tree_fingerprint(tmp_configs_dir: Path, tmp_path: Path):
+    schemas_dir = tmp_path / "schemas"
+    add_schemas_to_all_hydra_configs(
+        repo_root=tmp_path,
+        configs_dir=tmp_configs_dir,
+        schemas_dir=schemas_dir,
+        stop_on_error=True,
+        quiet=True,
+        add_headers=True,
+    )
+
+    def get_fingerprint(options: str = "") -> str:
+        return get_tree_fingerprint(
+            tmp_configs_dir, schemas_dir, repo_root=tmp_path, options=options
+        )
+
+    fingerprint = get_fingerprint()
+    save_tree_fingerprint(schemas_dir, fingerprint)
+    assert load_tree_fingerprint(schemas_dir) == fingerprint
+    assert get_fingerprint() == fingerprint
+    assert get_fingerprint(options="regen_schemas=True") != fingerprint
+
+    # Modifying a config file changes the fingerprint.
+    config_file = next(tmp_configs_dir.rglob("*.yaml"))
+    config_file.write_text(config_file.read_text() + "\n# comment\n")
+    assert get_fingerprint() != fingerprint
+    fingerprint = get_fingerprint()
+
+    # So does adding a config file (in a new directory), or removing a schema.
+    (tmp_configs_dir / "new_group").mkdir()
+    (tmp_configs_dir / "new_group" / "new.yaml").write_text("a: 1\n")
+    assert get_fingerprint() != fingerprint
+    fingerprint = get_fingerprint()
+
+    next(schemas_dir.glob("*.json")).unlink()
+    assert get_fingerprint() != fingerprint
+
+
+def test_runs_wait_until_the_schemas_dir_is_unlocked(
+    tmp_path: Path, tmp_configs_dir: Path, add_schemas: Callable[..., Path]
+):
+    schemas_dir = tmp_path / ".schemas"
+    run = threading.Thread(target=add_schemas, args=(tmp_configs_dir,))
+    # For example another process (the daemon) that is generating the schemas.
+    with lock_schemas_dir(schemas_dir):
+        run.start()
+        run.join(timeout=1)
+        assert run.is_alive()
+        assert not (schemas_dir / MANIFEST_FILE_NAME).exists()
+    run.join(timeout=60)
+    assert not run.is_alive()
+    assert (schemas_dir / MANIFEST_FILE_NAME).exists()
+
+
+def test_shared_target_schemas_are_tracked(
+    tmp_path: Path,
+    tmp_configs_dir: Path,
+    add_schemas: Callable[..., Path],
+    created_schemas: list[Path],
+):
+    two_foos = tmp_configs_dir / "two_foos.yaml"
+    two_foos.write_text(
+        "a:\n"
+        "  _target_: hydra_auto_schema.auto_schema_test.Foo\n"
+        "b:\n"
+        "  _target_: hydra_auto_schema.auto_schema_test.Foo\n"
+    )
+    schemas_dir = tmp_path / ".schemas"
+    add_schemas(tmp_configs_dir, shared_target_schemas=True)
+    target_schema_file = (
+        schemas_dir / "targets" / "hydra_auto_schema.auto_schema_test.Foo.json"
+    )
+    target_schema = target_schema_file.read_text()
+    manifest = Manifest.load(schemas_dir)
+    assert (
+        "targets/hydra_auto_schema.auto_schema_test.Foo.json"
+        in manifest.entries["two_foos.yaml"].target_schemas
+    )
+
+    def get_fingerprint() -> str:
+        return get_tree_fingerprint(tmp_configs_dir, schemas_dir, repo_root=tmp_path)
+
+    fingerprint = get_fingerprint()
+    # Editing or deleting a target schema regenerates the schemas that refer to it.
+    for change in [
+        lambda: target_schema_file.write_text("{}\n"),
+        target_schema_file.unlink,
+    ]:
+        created_schemas.clear()
+        change()
+        assert get_fingerprint() != fingerprint
+        add_schemas(tmp_configs_dir, shared_target_schemas=True)
+        assert two_foos in created_schemas
+        assert target_schema_file.read_text() == target_schema
+        fingerprint = get_fingerprint()
+
+    # Target schemas that are not referenced anymore are removed.
+    unused_target_schema_file = schemas_dir / "targets" / "unused.json"
+    unused_target_schema_file.write_text("{}\n")
+    add_schemas(tmp_configs_dir, shared_target_schemas=True)
+    assert not unused_target_schema_file.exists()
+    assert target_schema_file.exists()
+
+    two_foos.unlink()
+    add_schemas(tmp_configs_dir, shared_target_schemas=True)
+    assert not target_schema_file.exists()
+
+
+def test_toggling_shared_target_schemas_regenerates_the_schemas(
+    tmp_path: Path,
+    tmp_configs_dir: Path,
+    add_schemas: Callable[..., Path],
+    created_schemas: list[Path],
+):
+    schemas_dir = tmp_path / ".schemas"
+    nested_schema_file = get_schema_file_path(tmp_configs_dir / "nested.yaml", schemas_dir)
+    for shared_target_schemas in [False, True, False]:
+        created_schemas.clear()
+        add_schemas(tmp_configs_dir, shared_target_schemas=shared_target_schemas)
+        assert set(created_schemas) == set(tmp_configs_dir.glob("*.yaml"))
+        assert ('"$ref": "targets/' in nested_schema_file.read_text()) == (
+            shared_target_schemas
+        )
+        manifest = Manifest.load(schemas_dir)
+        assert manifest.entries["nested.yaml"].shared_target_schemas == shared_target_schemas
@@ -0,0 +1,225 @@
+import io
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+
+from hydra_auto_schema import client
+from hydra_auto_schema.__main__ import main, schema_for
+from hydra_auto_schema.server import SchemaServer, serve, serve_stdio
+
+
+@pytest.fixture
+def configs_repo(tmp_path: Path) -> Path:
+    configs_dir = tmp_path / "configs"
+    (configs_dir / "db").mkdir(parents=True)
+    (configs_dir / "db" / "base.yaml").write_text("host: localhost\n")
+    (configs_dir / "db" / "mysql.yaml").write_text("defaults:\n  - base\n  - _self_\n")
+    (configs_dir / "model.yaml").write_text(
+        "_target_: hydra_auto_schema.auto_schema_test.Bar\n"
+    )
+    return tmp_path
+
+
+def _request(method: str, request_id: int = 1, **params) -> bytes:
+    return (
+        json.dumps(
+            {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+        ).encode()
+        + b"\n"
+    )
+
+
+def test_stdio(configs_repo: Path):
+    configs_dir = configs_repo / "configs"
+    stdin = io.BytesIO(
+        _request("ping", 1)
+        + _request(
+            "add_schemas",
+            2,
+            repo_root=str(configs_repo),
+            configs_dir=str(configs_dir),
+            add_headers=True,
+        )
+        + _request(
+            "schema_for",
+            3,
+            repo_root=str(configs_repo),
+            configs_dir=str(configs_dir),
+            config_file=str(configs_dir / "model.yaml"),
+        )
+        + _request("unknown", 4)
+        + _request("add_schemas", 5, foo=1)
+        + b"not json\n"
+        + _request("shutdown", 6)
+        + _request("ping", 7)
+    )
+    stdout = io.BytesIO()
+    server = SchemaServer(configs_repo)
+    serve_stdio(server, stdin=stdin, stdout=stdout)
+
+    responses = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    # Stops after the `shutdown` request.
+    assert [r["id"] for r in responses] == [1, 2, 3, 4, 5, None, 6]
+    assert responses[0]["result"]["protocol"] == client.PROTOCOL_VERSION
+    assert "elapsed" in responses[1]["result"]
+    assert (configs_repo / ".schemas" / "configs_model_schema.json").exists()
+    schema = responses[2]["result"]["schema"]
+    assert responses[2]["result"]["error"] is None
+    assert "baz" in schema["properties"]
+    assert responses[3]["error"]["code"] == client.METHOD_NOT_FOUND
+    assert responses[4]["error"]["code"] == client.INVALID_PARAMS
+    assert responses[5]["error"]["code"] == client.PARSE_ERROR
+    # The target schemas are kept in memory between requests.
+    assert server._target_schemas
+
+
+def test_cli_uses_daemon(configs_repo: Path):
+    server = SchemaServer(configs_repo)
+    add_schemas = server._methods["add_schemas"] = Mock(wraps=server.add_schemas)
+    thread = threading.Thread(target=serve, args=(server,), daemon=True)
+    thread.start()
+    socket_path = client.get_socket_path(configs_repo)
+    try:
+        while not socket_path.exists():
+            thread.join(0.01)
+        main(
+            [str(configs_repo), "--configs_dir=configs", "--add-headers"]
+            + [f"--schemas-dir={configs_repo / '.schemas'}"]
+        )
+        assert add_schemas.call_count == 1
+        assert (configs_repo / ".schemas" / "db_mysql_schema.json").exists()
+
+        main(
+            [str(configs_repo), "--configs_dir=configs", "--add-headers"]
+            + [f"--schemas-dir={configs_repo / '.schemas'}", "--no-daemon"]
+        )
+        assert add_schemas.call_count == 1
+
+        server_schema_for = server._methods["schema_for"] = Mock(wraps=server.schema_for)
+        schema_for(
+            [str(configs_repo / "configs" / "model.yaml")]
+            + [f"--repo-root={configs_repo}"]
+        )
+        assert server_schema_for.call_count == 1
+    finally:
+        client.call(socket_path, "shutdown", timeout=10)
+        thread.join(10)
+    assert not socket_path.exists()
+    # The command-line does the work itself when the daemon isn't running.
+    assert client.try_call(configs_repo, "ping") == (False, None)
+
+
+def test_cli_doesnt_wait_for_a_stuck_daemon(
+    configs_repo: Path, monkeypatch: pytest.MonkeyPatch
+):
+    # NOTE: Not in `tmp_path`, whose path is too long for a Unix socket.
+    temp_dir = tempfile.mkdtemp()
+    monkeypatch.setenv("XDG_RUNTIME_DIR", temp_dir)
+    socket_path = client.get_socket_path(configs_repo)
+    # A daemon that accepts the connections, but never responds.
+    stuck_daemon = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        stuck_daemon.bind(str(socket_path))
+        stuck_daemon.listen()
+        assert client.try_call(configs_repo, "ping", timeout=0.1) == (False, None)
+
+        main(
+            [str(configs_repo), "--configs_dir=configs", "--add-headers"]
+            + [f"--schemas-dir={configs_repo / '.schemas'}", "--daemon-timeout=0.1"]
+        )
+        assert (configs_repo / ".schemas" / "db_mysql_schema.json").exists()
+    finally:
+        stuck_daemon.close()
+        shutil.rmtree(temp_dir)
+
+
+def test_declines_when_a_module_changed(
+    configs_repo: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    module_file = tmp_path / "some_targets_module.py"
+    module_file.write_text("class A:\n    pass\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    import some_targets_module  # noqa
+
+    try:
+        server = SchemaServer(configs_repo)
+        params = {
+            "repo_root": str(configs_repo),
+            "configs_dir": str(configs_repo / "configs"),
+        }
+        assert "result" in server.handle(_request("add_schemas", **params))
+
+        module_file.write_text("class A:\n    def __init__(self, a: int = 1): ...\n")
+        response = server.handle(_request("add_schemas", **params))
+    finally:
+        sys.modules.pop("some_targets_module", None)
+    assert response is not None
+    assert response["error"]["code"] == client.DECLINED
+    assert server.restart
+
+
+def test_declines_when_configs_are_missing_from_the_config_store(configs_repo: Path):
+    server = SchemaServer(configs_repo)
+    response = server.handle(
+        _request(
+            "add_schemas",
+            repo_root=str(configs_repo),
+            configs_dir=str(configs_repo / "configs"),
+            config_store_nodes=["db/not_in_the_daemon.yaml"],
+        )
+    )
+    assert response is not None
+    assert response["error"]["code"] == client.DECLINED
+    assert not server.restart
+
+
+def test_socket_is_only_accessible_by_the_user(
+    configs_repo: Path, monkeypatch: pytest.MonkeyPatch
+):
+    # NOTE: Not in `tmp_path`, whose path is too long for a Unix socket.
+    temp_dir = tempfile.mkdtemp()
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    monkeypatch.setattr(client.tempfile, "gettempdir", lambda: temp_dir)
+    socket_path = client.get_socket_path(configs_repo)
+    assert socket_path.parent != Path(temp_dir)
+
+    server = SchemaServer(configs_repo)
+    thread = threading.Thread(target=serve, args=(server,), daemon=True)
+    thread.start()
+    try:
+        while not socket_path.exists() and thread.is_alive():
+            thread.join(0.01)
+        assert socket_path.exists()
+        assert socket_path.parent.stat().st_mode & 0o777 == 0o700
+        assert socket_path.stat().st_mode & 0o777 == 0o600
+        assert client.try_call(configs_repo, "ping")[0]
+
+        # The socket of another user isn't trusted.
+        other_uid = os.getuid() + 1
+        monkeypatch.setattr(client.os, "getuid", lambda: other_uid)
+        assert client.try_call(configs_repo, "ping") == (False, None)
+        monkeypatch.undo()
+    finally:
+        if socket_path.exists():
+            client.call(socket_path, "shutdown", timeout=10)
+        thread.join(10)
+        shutil.rmtree(temp_dir)
+
+
+def test_doesnt_serve_in_a_directory_that_other_users_can_access(
+    configs_repo: Path, tmp_path: Path
+):
+    socket_dir = tmp_path / "sockets"
+    socket_dir.mkdir(mode=0o777)
+    socket_dir.chmod(0o777)
+    with pytest.raises(PermissionError):
+        serve(SchemaServer(configs_repo), socket_path=socket_dir / "daemon.sock")
+    assert not (socket_dir / "daemon.sock").exists()
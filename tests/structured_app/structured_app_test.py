@@ -1,16 +1,21 @@
 """ TODO: Tests for getting the schema from structured configs. """
 
+import inspect
+import os
 import shlex
 import shutil
+import subprocess
 from pathlib import Path
 import sys
 import warnings
+from unittest.mock import Mock
 
 import pytest
 from pytest_regressions.file_regression import FileRegressionFixture
 
 from hydra_plugins.auto_schema import auto_schema_plugin
 import hydra.errors
+import hydra_zen
 
 structured_app_dir = Path(__file__).parent
 
@@ -216,3 +221,182 @@ def test_disable_option(
             extension=".json",
             fullpath=structured_app_dir / ".schemas" / file.name,
         )
+
+
+@pytest.mark.parametrize(cli_args.__name__, [""], indirect=True)
+def test_background_option(
+    cli_args,
+    new_repo_root: Path,
+    new_schemas_dir: Path,
+    schemas_already_exist: bool,
+    file_regression: FileRegressionFixture,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.syspath_prepend(str(new_repo_root.parent))
+    monkeypatch.setenv("HYDRA_FULL_ERROR", "1")
+    from structured_app import app
+
+    monkeypatch.setattr(
+        auto_schema_plugin,
+        "config",
+        auto_schema_plugin.AutoSchemaPluginConfig(
+            schemas_dir=new_schemas_dir,
+            add_headers=True,
+            regen_schemas=True,
+            stop_on_error=True,
+            quiet=True,
+            background=True,
+        ),
+    )
+    background_pids: list[int | None] = []
+    run_in_background = auto_schema_plugin._run_in_background
+    monkeypatch.setattr(
+        auto_schema_plugin,
+        auto_schema_plugin._run_in_background.__name__,
+        lambda *args, **kwargs: background_pids.append(
+            run_in_background(*args, **kwargs)
+        ),
+    )
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", category=RuntimeWarning)
+        app.register_configs()
+        app.my_app()
+
+    # The schemas are generated by another process.
+    assert len(background_pids) == 1 and background_pids[0] != os.getpid()
+    # The process is detached: the app doesn't wait for it when it exits.
+    assert [p.pid for p in auto_schema_plugin._background_runs] == background_pids
+    auto_schema_plugin._wait_for_background_runs(timeout=60)
+
+    files = list(new_schemas_dir.glob("*.json"))
+    assert files
+    for file in files:
+        file_regression.check(
+            (new_schemas_dir / file.name).read_text().rstrip(),
+            extension=".json",
+            fullpath=structured_app_dir / ".schemas" / file.name,
+        )
+
+
+def test_background_process_doesnt_start_another_one(monkeypatch: pytest.MonkeyPatch):
+    # For example when the main module of the app is imported in the background process, and it
+    # runs the app again.
+    monkeypatch.setenv(auto_schema_plugin._IN_BACKGROUND_PROCESS_ENV_VAR, "1")
+    assert auto_schema_plugin._run_in_background(print) is None
+    assert not auto_schema_plugin._background_runs
+
+
+def test_nothing_is_done_if_nothing_changed(
+    new_repo_root: Path, new_schemas_dir: Path, monkeypatch: pytest.MonkeyPatch
+):
+    from hydra._internal.config_search_path_impl import ConfigSearchPathImpl
+
+    monkeypatch.syspath_prepend(str(new_repo_root.parent))
+    from structured_app import app
+
+    app.register_configs()
+    monkeypatch.setattr(
+        auto_schema_plugin,
+        "config",
+        auto_schema_plugin.AutoSchemaPluginConfig(
+            schemas_dir=new_schemas_dir, add_headers=True, stop_on_error=True
+        ),
+    )
+    # NOTE: Hydra re-executes the plugin module when scanning for plugins, so we can't patch the
+    # functions of the plugin module itself.
+    instantiate = Mock(wraps=hydra_zen.instantiate)
+    monkeypatch.setattr(hydra_zen, "instantiate", instantiate)
+    search_path = ConfigSearchPathImpl()
+    search_path.append("main", str(new_repo_root / "conf"))
+    plugin = auto_schema_plugin.AutoSchemaPlugin()
+
+    plugin.run(search_path)
+    assert instantiate.call_count == 1
+    plugin.run(search_path)
+    assert instantiate.call_count == 1
+
+    config_file = new_repo_root / "conf" / "db" / "mysql.yaml"
+    config_file.write_text(config_file.read_text() + "# comment\n")
+    plugin.run(search_path)
+    assert instantiate.call_count == 2
+
+
+def test_configs_modified_during_the_run_are_not_skipped(
+    new_repo_root: Path, new_schemas_dir: Path, monkeypatch: pytest.MonkeyPatch
+):
+    from hydra._internal.config_search_path_impl import ConfigSearchPathImpl
+
+    monkeypatch.syspath_prepend(str(new_repo_root.parent))
+    from structured_app import app
+
+    app.register_configs()
+    monkeypatch.setattr(
+        auto_schema_plugin,
+        "config",
+        auto_schema_plugin.AutoSchemaPluginConfig(
+            schemas_dir=new_schemas_dir, add_headers=True, stop_on_error=True
+        ),
+    )
+    config_file = new_repo_root / "conf" / "db" / "mysql.yaml"
+    instantiate = hydra_zen.instantiate
+
+    def _edit_config_during_the_run(config):
+        fn = instantiate(config)
+
+        def _fn(**kwargs):
+            fn(**kwargs)
+            config_file.write_text(config_file.read_text() + "# comment\n")
+
+        return _fn
+
+    monkeypatch.setattr(hydra_zen, "instantiate", Mock(wraps=_edit_config_during_the_run))
+    search_path = ConfigSearchPathImpl()
+    search_path.append("main", str(new_repo_root / "conf"))
+    plugin = auto_schema_plugin.AutoSchemaPlugin()
+
+    plugin.run(search_path)
+    assert hydra_zen.instantiate.call_count == 1
+    # The schemas are updated again, since the config was modified after it was loaded.
+    plugin.run(search_path)
+    assert hydra_zen.instantiate.call_count == 2
+
+
+def test_plugin_doesnt_import_the_schema_generation():
+    # Importing `hydra_auto_schema.auto_schema` (and pydantic, etc) would slow down the start of
+    # the app even when the schemas are up to date.
+    subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys; import hydra_plugins.auto_schema.auto_schema_plugin; "
+            "assert 'hydra_auto_schema.auto_schema' not in sys.modules, 'imported'",
+        ],
+        check=True,
+    )
+
+
+def test_asking_the_daemon_doesnt_import_the_schema_generation(tmp_path: Path):
+    # The daemon is there so that the app doesn't need to import the schema generation.
+    subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, functools; from pathlib import Path; "
+            "from hydra_plugins.auto_schema.auto_schema_plugin import _add_schemas_with_daemon; "
+            f"assert not _add_schemas_with_daemon(functools.partial(print), Path({str(tmp_path)!r}), "
+            f"Path({str(tmp_path / 'configs')!r})); "
+            "assert 'hydra_auto_schema.auto_schema' not in sys.modules, 'imported'",
+        ],
+        check=True,
+    )
+
+
+def test_plugin_target_has_the_same_signature():
+    from hydra_auto_schema.auto_schema import add_schemas_to_all_hydra_configs
+
+    # NOTE: The annotations of the real function are strings (it uses `from __future__ import
+    # annotations`).
+    assert inspect.signature(
+        auto_schema_plugin.add_schemas_to_all_hydra_configs, eval_str=True
+    ) == inspect.signature(add_schemas_to_all_hydra_configs, eval_str=True)
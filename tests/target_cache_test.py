@@ -0,0 +1,168 @@
+import subprocess
+import sys
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+
+@pytest.fixture
+def target_module(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    """A module with a class to use as a target, that isn't imported yet."""
+    module_dir = tmp_path / "src"
+    module_dir.mkdir()
+    module_file = module_dir / "my_cached_module.py"
+    module_file.write_text(
+        "class Foo:\n"
+        "    def __init__(self, bar: int = 1):\n"
+        "        self.bar = bar\n"
+    )
+    monkeypatch.syspath_prepend(str(module_dir))
+    yield module_file
+    sys.modules.pop("my_cached_module", None)
+
+
+@pytest.fixture
+def configs_dir(tmp_path: Path, target_module: Path):
+    configs_dir = tmp_path / "configs"
+    configs_dir.mkdir()
+    (configs_dir / "foo.yaml").write_text("_target_: my_cached_module.Foo\nbar: 2\n")
+    return configs_dir
+
+
+def _foo_schema(schemas_dir: Path) -> str:
+    return (schemas_dir / "configs_foo_schema.json").read_text()
+
+
+def test_target_schemas_are_reused_across_runs(
+    add_schemas: Callable[..., Path],
+    configs_dir: Path,
+    created_target_schemas: list[str],
+    isolated_target_schema_cache: Path,
+):
+    first_schema = _foo_schema(add_schemas(configs_dir))
+    assert "my_cached_module.Foo" in created_target_schemas
+    assert isolated_target_schema_cache.exists()
+
+    # Make the config file look modified, and forget about the target module.
+    created_target_schemas.clear()
+    sys.modules.pop("my_cached_module")
+    (configs_dir / "foo.yaml").write_text("_target_: my_cached_module.Foo\nbar: 3\n")
+
+    assert _foo_schema(add_schemas(configs_dir)) == first_schema
+    assert "my_cached_module.Foo" not in created_target_schemas
+    # The target didn't even need to be imported.
+    assert "my_cached_module" not in sys.modules
+
+
+def test_target_schema_is_recreated_when_source_changes(
+    add_schemas: Callable[..., Path],
+    configs_dir: Path,
+    target_module: Path,
+    created_target_schemas: list[str],
+):
+    first_schema = _foo_schema(add_schemas(configs_dir))
+    created_target_schemas.clear()
+
+    sys.modules.pop("my_cached_module")
+    target_module.write_text(target_module.read_text().replace("bar: int", "bar: str"))
+    (configs_dir / "foo.yaml").write_text("_target_: my_cached_module.Foo\nbar: '3'\n")
+
+    second_schema = _foo_schema(add_schemas(configs_dir))
+    assert "my_cached_module.Foo" in created_target_schemas
+    assert second_schema != first_schema
+    assert '"type": "string"' in second_schema
+
+
+def test_target_schema_is_recreated_when_customizations_change(
+    add_schemas: Callable[..., Path],
+    configs_dir: Path,
+    created_target_schemas: list[str],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    from hydra_auto_schema.customize import custom_hydra_zen_builds_args
+
+    add_schemas(configs_dir)
+    created_target_schemas.clear()
+
+    import my_cached_module  # type: ignore
+
+    monkeypatch.setitem(
+        custom_hydra_zen_builds_args, my_cached_module.Foo, {"zen_exclude": ["bar"]}
+    )
+    # Make the config file look modified, so its schema is regenerated.
+    (configs_dir / "foo.yaml").write_text("_target_: my_cached_module.Foo\n")
+    schema = _foo_schema(add_schemas(configs_dir))
+    assert "my_cached_module.Foo" in created_target_schemas
+    assert '"bar"' not in schema
+
+
+def test_regen_schemas_ignores_the_cache(
+    add_schemas: Callable[..., Path], configs_dir: Path, created_target_schemas: list[str]
+):
+    add_schemas(configs_dir)
+    created_target_schemas.clear()
+    add_schemas(configs_dir, regen_schemas=True)
+    assert "my_cached_module.Foo" in created_target_schemas
+
+
+def test_target_schema_is_recreated_when_an_annotated_class_changes(
+    add_schemas: Callable[..., Path],
+    configs_dir: Path,
+    target_module: Path,
+    created_target_schemas: list[str],
+):
+    """The schema of a dataclass parameter, defined in another module, is part of the schema."""
+    params_module = target_module.parent / "my_cached_params.py"
+    params_module.write_text(
+        "import dataclasses\n\n"
+        "@dataclasses.dataclass\n"
+        "class Params:\n"
+        "    lr: int = 1\n"
+    )
+    target_module.write_text(
+        "from my_cached_params import Params\n\n"
+        "class Foo:\n"
+        "    def __init__(self, bar: int = 1, params: Params | None = None):\n"
+        "        self.bar = bar\n"
+    )
+    try:
+        first_schema = _foo_schema(add_schemas(configs_dir))
+        created_target_schemas.clear()
+
+        sys.modules.pop("my_cached_module")
+        sys.modules.pop("my_cached_params")
+        params_module.write_text(
+            params_module.read_text().replace("lr: int", "lr: str")
+        )
+        (configs_dir / "foo.yaml").write_text(
+            "_target_: my_cached_module.Foo\nbar: 3\n"
+        )
+
+        second_schema = _foo_schema(add_schemas(configs_dir))
+    finally:
+        sys.modules.pop("my_cached_params", None)
+    assert "my_cached_module.Foo" in created_target_schemas
+    assert second_schema != first_schema
+
+
+def test_customizations_fingerprint_is_the_same_in_every_process():
+    """Classes and functions in the values of the registries don't change the fingerprint."""
+    script = (
+        "import pathlib\n"
+        "from hydra_auto_schema.customize import custom_hydra_zen_builds_args\n"
+        "from hydra_auto_schema.target_cache import _get_registries_fingerprint\n"
+        "def wrapper(fn):\n"
+        "    return fn\n"
+        "custom_hydra_zen_builds_args['foo.Bar'] = {\n"
+        "    'zen_wrappers': wrapper, 'builds_bases': (pathlib.Path,), 'zen_exclude': ['a']\n"
+        "}\n"
+        "print(_get_registries_fingerprint())\n"
+    )
+    fingerprints = {
+        subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True, check=True
+        ).stdout
+        for _ in range(2)
+    }
+    assert len(fingerprints) == 1
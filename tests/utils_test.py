@@ -0,0 +1,127 @@
+import random
+from typing import Any, Callable, Mapping
+
+import pytest
+
+from hydra_auto_schema.utils import _ConflictHandlers, merge_dicts
+
+
+def _merge_dicts_reference(
+    a: Mapping,
+    b: Mapping,
+    conflict_handler: Callable | None = None,
+    conflict_handlers: dict[str, Callable] | None = None,
+    _path: list[str] = [],
+) -> dict:
+    """Previous implementation, which recomputed the handlers at each level."""
+    conflict_handlers = conflict_handlers or {}
+    out = dict(a)
+    for key in b:
+        b_val = b[key]
+        if key not in a:
+            out[key] = b_val
+            continue
+        a_val = a[key]
+        if isinstance(a_val, Mapping) and isinstance(b_val, Mapping):
+            out[key] = _merge_dicts_reference(
+                a_val,
+                b_val,
+                conflict_handler=conflict_handler,
+                conflict_handlers={
+                    k.removeprefix(f"{key}."): v for k, v in conflict_handlers.items()
+                },
+                _path=_path + [str(key)],
+            )
+        elif a_val != b_val:
+            if specific_conflict_handler := conflict_handlers.get(str(key)):
+                out[key] = specific_conflict_handler(a_val, b_val)
+            elif conflict_handler:
+                out[key] = conflict_handler(a_val, b_val)
+            else:
+                raise Exception("Conflict at " + ".".join(_path + [str(key)]))
+    return out
+
+
+_KEYS = ["a", "b", "c", "d"]
+
+
+def _random_dict(rng: random.Random, depth: int) -> dict[str, Any]:
+    return {
+        key: (
+            _random_dict(rng, depth - 1)
+            if depth and rng.random() < 0.5
+            else rng.randint(0, 2)
+        )
+        for key in rng.sample(_KEYS, rng.randint(1, len(_KEYS)))
+    }
+
+
+def _handler(name: str) -> Callable[[Any, Any], Any]:
+    return lambda a, b: f"{name}({a}, {b})"
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_merge_dicts_conflict_handlers_match_reference(seed: int):
+    rng = random.Random(seed)
+    a, b = _random_dict(rng, depth=3), _random_dict(rng, depth=3)
+    # Key-only handlers and dotted paths, some of which overlap once prefixes are removed.
+    paths = {
+        ".".join(rng.choices(_KEYS, k=rng.randint(1, 3)))
+        for _ in range(rng.randint(0, 6))
+    }
+    conflict_handlers = {path: _handler(path) for path in sorted(paths)}
+
+    def _merge(merge: Callable) -> Any:
+        try:
+            return merge(
+                a,
+                b,
+                conflict_handler=_handler("default") if seed % 2 else None,
+                conflict_handlers=conflict_handlers,
+            )
+        except Exception as err:
+            return str(err)
+
+    assert _merge(merge_dicts) == _merge(_merge_dicts_reference)
+
+
+def test_key_only_and_full_path_handlers():
+    a = {"a": {"b": 1, "c": 1}, "x": {"b": 1, "c": 1, "a": {"b": 1}}}
+    b = {"a": {"b": 2, "c": 2}, "x": {"b": 2, "c": 2, "a": {"b": 2}}}
+    merged = merge_dicts(
+        a,
+        b,
+        conflict_handler=lambda a, b: b,
+        conflict_handlers={"a.b": lambda a, b: a + b, "c": lambda a, b: a - b},
+    )
+    assert merged == {
+        "a": {"b": 3, "c": -1},
+        "x": {"b": 2, "c": -1, "a": {"b": 3}},
+    }
+
+
+def test_conflict_error_has_the_full_path():
+    with pytest.raises(Exception, match=r"^Conflict at x\.y\.z$"):
+        merge_dicts({"x": {"y": {"z": 1}}}, {"x": {"y": {"z": 2}}})
+
+
+def test_conflict_handlers_are_only_recomputed_for_prefixes():
+    handlers = _ConflictHandlers({"c": _handler("c"), "a.b": _handler("a.b")})
+    # The nested dicts whose key doesn't start any path have the same handlers.
+    assert handlers.child("properties") is handlers
+    child = handlers.child("a")
+    assert child is not handlers
+    assert set(child.handlers) == {"c", "b"}
+    assert handlers.child("a") is child
+
+
+def test_unhashable_conflict_handlers():
+    class _Sum:
+        __hash__ = None  # type: ignore
+
+        def __call__(self, a, b):
+            return a + b
+
+    assert merge_dicts(
+        {"a": {"b": 1}}, {"a": {"b": 2}}, conflict_handlers={"a.b": _Sum()}
+    ) == {"a": {"b": 3}}
@@ -0,0 +1,174 @@
+from pathlib import Path
+
+import pytest
+
+from hydra_auto_schema.auto_schema import (
+    _remove_schema_headers,
+    add_schemas_to_all_hydra_configs,
+)
+from hydra_auto_schema.vscode_settings import VscodeSettingsFile, loads_jsonc
+
+SETTINGS_WITH_COMMENTS = """\
+{
+    // The python interpreter.
+    "python.defaultInterpreterPath": "/some path/with spaces/python",
+    /* Block comment, with a "string" */
+    "editor.rulers": [
+        100,
+    ],
+}
+"""
+
+
+@pytest.fixture
+def repo_root(tmp_path: Path) -> Path:
+    (tmp_path / "configs").mkdir()
+    (tmp_path / "schemas").mkdir()
+    return tmp_path
+
+
+def _write_settings(repo_root: Path, text: str) -> Path:
+    settings_file = repo_root / ".vscode" / "settings.json"
+    settings_file.parent.mkdir(exist_ok=True)
+    settings_file.write_text(text)
+    return settings_file
+
+
+def test_loads_jsonc():
+    assert loads_jsonc(SETTINGS_WITH_COMMENTS) == {
+        "python.defaultInterpreterPath": "/some path/with spaces/python",
+        "editor.rulers": [100],
+    }
+    assert loads_jsonc('{"url": "http://a//b", /* x */ "b": "/* y */",}') == {
+        "url": "http://a//b",
+        "b": "/* y */",
+    }
+
+
+def test_comments_and_formatting_are_preserved(repo_root: Path):
+    settings_file = _write_settings(repo_root, SETTINGS_WITH_COMMENTS)
+    config_file = repo_root / "configs" / "config.yaml"
+    schema_file = repo_root / "schemas" / "configs_config_schema.json"
+
+    settings = VscodeSettingsFile.for_repo(repo_root)
+    settings.add_schemas({config_file: schema_file})
+    assert settings.flush()
+
+    text = settings_file.read_text()
+    assert text.startswith(SETTINGS_WITH_COMMENTS.rstrip().removesuffix("}"))
+    assert loads_jsonc(text) == {
+        "python.defaultInterpreterPath": "/some path/with spaces/python",
+        "editor.rulers": [100],
+        "redhat.telemetry.enabled": False,
+        "yaml.schemas": {"schemas/configs_config_schema.json": str(config_file)},
+    }
+
+
+def test_changes_are_batched_and_only_written_if_needed(repo_root: Path):
+    settings_file = _write_settings(repo_root, "{}")
+    config_files = [repo_root / "configs" / f"config_{i}.yaml" for i in range(3)]
+    settings = VscodeSettingsFile.for_repo(repo_root)
+    for config_file in config_files:
+        settings.add_schemas(
+            {config_file: repo_root / "schemas" / f"{config_file.stem}.json"}
+        )
+    assert settings.flush()
+    assert len(loads_jsonc(settings_file.read_text())["yaml.schemas"]) == 3
+
+    stamp = settings_file.stat().st_mtime_ns
+    settings.add_schemas({config_files[0]: repo_root / "schemas" / "config_0.json"})
+    assert not settings.flush()
+    # A new instance (e.g. in the next run) doesn't write the file either.
+    settings = VscodeSettingsFile.for_repo(repo_root)
+    settings.add_schemas({config_files[1]: repo_root / "schemas" / "config_1.json"})
+    assert not settings.flush()
+    assert settings_file.stat().st_mtime_ns == stamp
+
+
+def test_external_changes_are_picked_up(repo_root: Path):
+    settings_file = _write_settings(repo_root, "{}")
+    config_file = repo_root / "configs" / "config.yaml"
+    schema_file = repo_root / "schemas" / "config.json"
+    settings = VscodeSettingsFile.for_repo(repo_root)
+    settings.add_schemas({config_file: schema_file})
+    settings.flush()
+
+    settings_file.write_text(
+        settings_file.read_text().replace("{", '{\n  "editor.tabSize": 4,', 1)
+    )
+    settings.remove_schemas({config_file: schema_file})
+    assert settings.flush()
+    assert loads_jsonc(settings_file.read_text()) == {
+        "editor.tabSize": 4,
+        "redhat.telemetry.enabled": False,
+        "yaml.schemas": {},
+    }
+
+
+def test_only_config_files_with_a_header_are_rewritten(repo_root: Path):
+    with_header = repo_root / "configs" / "with_header.yaml"
+    with_header.write_text("# yaml-language-server: $schema=foo.json\nfoo: bar\n")
+    without_header = repo_root / "configs" / "without_header.yaml"
+    without_header.write_text("foo: bar\n")
+    stamp = without_header.stat().st_mtime_ns
+
+    _remove_schema_headers([with_header, without_header])
+
+    assert with_header.read_text() == "foo: bar\n"
+    assert without_header.stat().st_mtime_ns == stamp
+
+
+def test_glob_associations(repo_root: Path):
+    configs_dir = repo_root / "configs"
+    (configs_dir / "config.yaml").write_text("defaults:\n  - optimizer: adam\n")
+    (configs_dir / "optimizer").mkdir()
+    (configs_dir / "optimizer" / "adam.yaml").write_text("lr: 0.1\n")
+    (configs_dir / "optimizer" / "sgd.yaml").write_text("lr: 0.1\n")
+    (configs_dir / "model").mkdir()
+    (configs_dir / "model" / "a.yaml").write_text("hidden_size: 1\n")
+    (configs_dir / "model" / "b.yaml").write_text(
+        "_target_: hydra_auto_schema.auto_schema_test.Bar\n"
+    )
+    schemas_dir = repo_root / "schemas"
+    settings_file = _write_settings(repo_root, "{}")
+
+    add_schemas_to_all_hydra_configs(
+        repo_root=repo_root,
+        configs_dir=configs_dir,
+        schemas_dir=schemas_dir,
+        stop_on_error=True,
+        quiet=True,
+        vscode_associations="globs",
+    )
+    yaml_schemas = loads_jsonc(settings_file.read_text())["yaml.schemas"]
+    patterns = {
+        pattern
+        for patterns in yaml_schemas.values()
+        for pattern in ([patterns] if isinstance(patterns, str) else patterns)
+    }
+    # All the optimizer configs have the same schema, but not the model configs.
+    assert patterns == {
+        "configs/*.yaml",
+        "configs/optimizer/*.yaml",
+        "configs/model/a.yaml",
+        "configs/model/b.yaml",
+    }
+    assert all(
+        (repo_root / schema_file).parent == schemas_dir for schema_file in yaml_schemas
+    )
+
+    # One of the configs in the group now has a different schema.
+    (configs_dir / "optimizer" / "sgd.yaml").write_text(
+        "_target_: hydra_auto_schema.auto_schema_test.Bar\n"
+    )
+    add_schemas_to_all_hydra_configs(
+        repo_root=repo_root,
+        configs_dir=configs_dir,
+        schemas_dir=schemas_dir,
+        stop_on_error=True,
+        quiet=True,
+        vscode_associations="globs",
+    )
+    yaml_schemas = loads_jsonc(settings_file.read_text())["yaml.schemas"]
+    assert "configs/optimizer/*.yaml" not in str(yaml_schemas)
+    assert "configs/optimizer/sgd.yaml" in str(yaml_schemas)